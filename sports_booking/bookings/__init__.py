@@ -1,2 +0,0 @@
-from __future__ import absolute_import, unicode_literals
-from . import tasks
@@ -1,3 +1,45 @@
 from django.contrib import admin
+from django.db import connection, transaction
+from django.utils import timezone
+from sports_booking.admin import LargeTableAdminMixin
+from .models import Booking
+from .signals import bookings_changed
 
-# Register your models here.
+
+def set_status(queryset, new_status, confirmed_at, skip_statuses):
+    """
+    Move the selected bookings to `new_status` in a single UPDATE, whether the
+    selection is a page of ids or every row matching the changelist filters.
+    """
+    selected, params = queryset.order_by().values('pk').query.sql_with_params()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {Booking._meta.db_table} SET status = %s, confirmed_at = %s '
+            f'WHERE id IN ({selected}) AND status <> ALL(%s) RETURNING sports_class_id',
+            [new_status, confirmed_at, *params, skip_statuses],
+        )
+        class_ids = [row[0] for row in cursor.fetchall()]
+        if class_ids:
+            bookings_changed.send(sender=Booking, class_ids=list(set(class_ids)))
+    return len(class_ids)
+
+
+@admin.register(Booking)
+class BookingAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'sports_class', 'status', 'created_at', 'confirmed_at')
+    list_select_related = ('user', 'sports_class')
+    list_filter = ('venue', 'status')
+    autocomplete_fields = ('user', 'sports_class')
+    readonly_fields = ('created_at',)
+    actions = ('cancel_bookings', 'confirm_bookings')
+
+    @admin.action(description="Cancel selected bookings", permissions=['change'])
+    def cancel_bookings(self, request, queryset):
+        updated = set_status(queryset, Booking.STATUS_CANCELED, None, [Booking.STATUS_CANCELED])
+        self.message_user(request, f"Canceled {updated} booking(s).")
+
+    @admin.action(description="Confirm selected bookings", permissions=['change'])
+    def confirm_bookings(self, request, queryset):
+        updated = set_status(queryset, Booking.STATUS_CONFIRMED, timezone.now(),
+                             [Booking.STATUS_CONFIRMED, Booking.STATUS_CANCELED])
+        self.message_user(request, f"Confirmed {updated} booking(s).")
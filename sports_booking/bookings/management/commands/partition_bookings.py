@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from bookings import partitions
+
+
+class Command(BaseCommand):
+    help = "Convert the bookings table to one LIST-partitioned by venue, with a partition per venue"
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Partitioning is only available on PostgreSQL.")
+        with transaction.atomic(), connection.cursor() as cursor:
+            if partitions.is_partitioned(cursor):
+                raise CommandError("Bookings are already partitioned by venue.")
+            count = partitions.partition(cursor)
+        self.stdout.write(f"Partitioned bookings into {count} venue partitions plus {partitions.DEFAULT_PARTITION}")
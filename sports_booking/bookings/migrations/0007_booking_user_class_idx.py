@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_alter_booking_status'),
+        ('classes', '0004_class_time_span'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'sports_class'], name='booking_user_class_idx'),
+        ),
+    ]
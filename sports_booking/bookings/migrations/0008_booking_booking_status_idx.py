@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_user_class_idx'),
+        ('classes', '0007_class_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', '-id'], name='booking_status_idx'),
+        ),
+    ]
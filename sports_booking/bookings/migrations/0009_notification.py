@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_booking_booking_status_idx'),
+        ('classes', '0007_class_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('booking', 'Booking'), ('cancellation', 'Cancellation'), ('reminder', 'Reminder')], max_length=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sports_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='classes.class')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='notification_user_created_idx')],
+            },
+        ),
+    ]
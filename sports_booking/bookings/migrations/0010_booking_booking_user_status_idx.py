@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_notification'),
+        ('classes', '0007_class_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'status', 'sports_class'], name='booking_user_status_idx'),
+        ),
+    ]
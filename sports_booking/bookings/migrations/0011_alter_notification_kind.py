@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_booking_booking_user_status_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(choices=[('booking', 'Booking'), ('cancellation', 'Cancellation'), ('reminder', 'Reminder'), ('class_canceled', 'Class canceled')], max_length=14),
+        ),
+    ]
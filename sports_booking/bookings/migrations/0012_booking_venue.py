@@ -0,0 +1,31 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_alter_notification_kind'),
+        ('classes', '0009_venue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='venue',
+            field=models.ForeignKey(null=True, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='bookings', to='classes.venue'),
+        ),
+        migrations.RunSQL(
+            'UPDATE bookings_booking b SET venue_id = c.venue_id FROM classes_class c WHERE c.id = b.sports_class_id',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='venue',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='bookings', to='classes.venue'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['venue', 'status', 'created_at'], name='booking_venue_status_idx'),
+        ),
+    ]
@@ -1,27 +1,90 @@
 from django.db import models
+from django.db.models import Subquery
 from users.models import User
-from classes.models import Class
+from classes.models import Class, Venue
 from django.utils import timezone
 
+
+class BookingQuerySet(models.QuerySet):
+    """
+    Keeps the copied venue in step with the class on the writes that skip
+    Booking.save. A write that sets the venue itself is taken as is.
+    """
+
+    def update(self, **kwargs):
+        for field in ('sports_class', 'sports_class_id'):
+            if field not in kwargs or {'venue', 'venue_id'} & kwargs.keys():
+                continue
+            target = kwargs[field]
+            if isinstance(target, Class):
+                kwargs['venue_id'] = target.venue_id
+            elif isinstance(target, int):
+                kwargs['venue_id'] = Subquery(Class.objects.filter(pk=target).values('venue_id'))
+            else:
+                raise TypeError("Bookings can only be moved to a given class, whose venue they take.")
+        return super().update(**kwargs)
+
+    update.alters_data = True
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        fields = set(fields)
+        if fields & {'sports_class', 'sports_class_id'}:
+            objs = list(objs)
+            venues = dict(Class.objects.filter(pk__in={obj.sports_class_id for obj in objs})
+                          .values_list('id', 'venue_id'))
+            for obj in objs:
+                obj.venue_id = venues.get(obj.sports_class_id)
+            fields.add('venue')
+        return super().bulk_update(objs, fields, batch_size=batch_size)
+
+    bulk_update.alters_data = True
+
+
 class Booking(models.Model):
     STATUS_PENDING = 'pending'
     STATUS_CONFIRMED = 'confirmed'
     STATUS_CANCELED = 'canceled'
+    STATUS_NO_SHOW = 'no_show'
     STATUS_CHOICES = [
         (STATUS_PENDING, 'Pending'),
         (STATUS_CONFIRMED, 'Confirmed'),
         (STATUS_CANCELED, 'Canceled'),
+        (STATUS_NO_SHOW, 'No-show'),
     ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
     sports_class = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='bookings')
+    # The class's venue, copied on save so venue queries (and venue partitions,
+    # see partitions.py) never have to join classes.
+    venue = models.ForeignKey(Venue, on_delete=models.PROTECT, related_name='bookings', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
     confirmed_at = models.DateTimeField(null=True, blank=True)
 
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sports_class'], name='booking_user_class_idx'),
+            # Admin changelist: filtered by status, newest first.
+            models.Index(fields=['status', '-id'], name='booking_status_idx'),
+            # Upcoming/past listings: a user's class ids per status without touching the table.
+            models.Index(fields=['user', 'status', 'sports_class'], name='booking_user_status_idx'),
+            # Per-venue maintenance: a venue's pending bookings by age.
+            models.Index(fields=['venue', 'status', 'created_at'], name='booking_venue_status_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user.username} booked {self.sports_class.name}'
 
+    def save(self, *args, **kwargs):
+        if self.venue_id is None or Booking.sports_class.is_cached(self):
+            self.venue_id = self.sports_class.venue_id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'sports_class' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'venue'}
+        super().save(*args, **kwargs)
+
     def is_expired(self):
         """ Check if booking is older than 15 minutes and still pending """
         return self.status == self.STATUS_PENDING and (timezone.now() - self.created_at).total_seconds() > 900
@@ -29,3 +92,30 @@ class Booking(models.Model):
     def can_book(self):
         """ Ensure booking is at least one hour before the class starts """
         return (self.sports_class.date_time - timezone.now()).total_seconds() > 3600
+
+
+class Notification(models.Model):
+    """ A booking event waiting to go out in the user's next digest email """
+    KIND_BOOKING = 'booking'
+    KIND_CANCELLATION = 'cancellation'
+    KIND_REMINDER = 'reminder'
+    KIND_CLASS_CANCELED = 'class_canceled'
+    KIND_CHOICES = [
+        (KIND_BOOKING, 'Booking'),
+        (KIND_CANCELLATION, 'Cancellation'),
+        (KIND_REMINDER, 'Reminder'),
+        (KIND_CLASS_CANCELED, 'Class canceled'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pending_notifications')
+    sports_class = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=14, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='notification_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} for {self.user_id}'
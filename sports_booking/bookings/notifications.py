@@ -0,0 +1,178 @@
+import logging
+import smtplib
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from classes.models import Class
+from sports_booking.metrics import EMAIL_LATENCY, TASK_ROWS
+from users.models import User
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+FROM_EMAIL = 'noreply@example.com'
+SUBJECTS = {
+    Notification.KIND_BOOKING: "Booking Confirmation",
+    Notification.KIND_CANCELLATION: "Booking Canceled",
+    Notification.KIND_REMINDER: "Class Reminder",
+    Notification.KIND_CLASS_CANCELED: "Class Canceled",
+}
+# EMAIL_LATENCY label of a single-notification email; digests are 'notification_digest'.
+METRIC_KINDS = {
+    Notification.KIND_BOOKING: 'booking_confirmation',
+    Notification.KIND_CANCELLATION: 'booking_cancellation',
+    Notification.KIND_REMINDER: 'class_reminder',
+    Notification.KIND_CLASS_CANCELED: 'class_cancellation',
+}
+LINES = {
+    Notification.KIND_BOOKING: "You have successfully booked the class: {name} ({when})",
+    Notification.KIND_CANCELLATION: "Your booking was canceled: {name} ({when})",
+    Notification.KIND_REMINDER: "Reminder: your class '{name}' is scheduled within the next 24 hours ({when})",
+    Notification.KIND_CLASS_CANCELED: "The trainer canceled the class {name} ({when}); your booking is canceled",
+}
+
+
+def notify(notifications, immediate=False):
+    """
+    Deliver unsaved Notifications: queued for the next digest, or sent right
+    away for users who asked for immediate delivery and when `immediate` is set.
+    Each notification's user must be loaded.
+    """
+    now, queued = [], []
+    for notification in notifications:
+        if immediate or notification.user.notification_delivery == User.DELIVERY_IMMEDIATE:
+            now.append(notification)
+        else:
+            queued.append(notification)
+    Notification.objects.bulk_create(queued)
+    if now:
+        missing = {n.sports_class_id for n in now if not Notification.sports_class.is_cached(n)}
+        classes = Class.objects.in_bulk(missing) if missing else {}
+        for notification in now:
+            if notification.sports_class_id in classes:
+                notification.sports_class = classes[notification.sports_class_id]
+        with get_connection() as connection:
+            send(connection, build_messages(now))
+
+
+def by_user(notifications):
+    """ Each user's notifications, in the order they were given """
+    # A stable sort: each user's notifications stay in the order they were given.
+    ordered = sorted(notifications, key=attrgetter('user_id'))
+    return [list(events) for _, events in groupby(ordered, key=attrgetter('user_id'))]
+
+
+def build_message(events):
+    """ The (metric label, email) pair listing one user's notifications """
+    lines = [
+        LINES[event.kind].format(
+            name=event.sports_class.name,
+            when=timezone.localtime(event.sports_class.date_time).strftime('%a %d %b %H:%M'),
+        )
+        for event in events
+    ]
+    if len(events) == 1:
+        kind, subject, body = METRIC_KINDS[events[0].kind], SUBJECTS[events[0].kind], lines[0]
+    else:
+        kind, subject = 'notification_digest', f"Your booking updates ({len(events)})"
+        body = '\n'.join(f"- {line}" for line in lines)
+    return kind, EmailMessage(subject, body, FROM_EMAIL, [events[0].user.email])
+
+
+def build_messages(notifications):
+    """ One (metric label, email) pair per user, listing all of their notifications in order """
+    return [build_message(events) for events in by_user(notifications)]
+
+
+def send(connection, messages):
+    """ Send (metric label, email) pairs one after another over an open connection """
+    for kind, message in messages:
+        with EMAIL_LATENCY.labels(kind).time():
+            connection.send_messages([message])
+
+
+def send_dequeued(connection, notifications):
+    """
+    Send notifications already deleted from the queue, one email per user, and
+    return the number sent. The notifications of an email that fails go back
+    on the queue for the next run, so a failure never resends what went out.
+    """
+    sent, failed = 0, []
+    for events in by_user(notifications):
+        kind, message = build_message(events)
+        try:
+            send(connection, [(kind, message)])
+        except (smtplib.SMTPException, OSError):
+            logger.exception("Sending %s to user %s failed; requeued", kind, events[0].user_id)
+            failed.extend(events)
+        else:
+            sent += 1
+    Notification.objects.bulk_create([
+        Notification(user_id=n.user_id, sports_class_id=n.sports_class_id, kind=n.kind) for n in failed
+    ])
+    return sent
+
+
+def send_digests():
+    """
+    Send one digest to every user whose oldest queued notification has waited
+    NOTIFICATION_DIGEST_WINDOW seconds, over a single SMTP connection, and
+    return the number of digests sent. Each batch is taken off the queue with
+    SKIP LOCKED, so concurrent workers never pick the same notification, and
+    is sent after that transaction commits.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW)
+    batch_size = settings.NOTIFICATION_DIGEST_BATCH
+    sent = 0
+    with get_connection() as connection:
+        while True:
+            with transaction.atomic():
+                due = list(
+                    Notification.objects.values('user_id')
+                    .annotate(first=Min('created_at'))
+                    .filter(first__lte=cutoff)
+                    .order_by('first')
+                    .values_list('user_id', flat=True)[:batch_size]
+                )
+                pending = list(
+                    Notification.objects.filter(user_id__in=due)
+                    .select_related('user', 'sports_class')
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .order_by('created_at')
+                )
+                Notification.objects.filter(pk__in=[n.pk for n in pending]).delete()
+            if pending:
+                sent += send_dequeued(connection, pending)
+                TASK_ROWS.labels('send_notification_digests').inc(len(pending))
+            if not pending or len(due) < batch_size:
+                return sent
+
+
+def send_class_notices(class_id, kind=Notification.KIND_CLASS_CANCELED):
+    """
+    Send the queued notifications of one kind for one class right away,
+    whatever the users' digest preference, NOTIFICATION_DIGEST_BATCH at a time
+    over a single SMTP connection. Returns the number of emails sent. Like
+    send_digests, each batch is taken off the queue before it is sent; what
+    fails is requeued with a later created_at and left for the next run.
+    """
+    queryset = Notification.objects.filter(sports_class_id=class_id, kind=kind, created_at__lte=timezone.now())
+    sent = 0
+    with get_connection() as connection:
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    queryset.select_related('user', 'sports_class')
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .order_by('id')[:settings.NOTIFICATION_DIGEST_BATCH]
+                )
+                Notification.objects.filter(pk__in=[n.pk for n in batch]).delete()
+            if not batch:
+                return sent
+            sent += send_dequeued(connection, batch)
+            TASK_ROWS.labels('send_class_notices').inc(len(batch))
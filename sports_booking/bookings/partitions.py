@@ -0,0 +1,78 @@
+from classes.models import Venue
+from .models import Booking
+
+# Optional LIST partitioning of bookings by venue: one partition per venue plus a
+# default one, so a busy venue's scans, vacuums and index maintenance stay inside
+# its own partition. Classes stay a plain table; the trainer overlap constraint
+# and the foreign keys into it span venues.
+
+TABLE = Booking._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def partition_name(venue_id):
+    return f'{TABLE}_venue_{int(venue_id)}'
+
+
+def is_partitioned(cursor):
+    cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [TABLE])
+    return cursor.fetchone() is not None
+
+
+def create_partition(cursor, venue_id):
+    """ Give a venue its own partition; a new venue has no rows in the default one yet """
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {partition_name(venue_id)} '
+                   f'PARTITION OF {TABLE} FOR VALUES IN ({int(venue_id)})')
+
+
+def partition(cursor):
+    """
+    Rebuild the bookings table as a table partitioned by venue, keeping its
+    rows, ids, indexes, foreign keys and triggers. The primary key becomes
+    (id, venue_id), as PostgreSQL requires of a partitioned table; ids stay
+    unique through the shared identity sequence. Run it in a transaction.
+    Returns the number of venue partitions.
+    """
+    cursor.execute(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+    # Deferred foreign key checks still queued on the old table would block dropping it.
+    cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    # Definitions are read before the rename, so they still name the original table.
+    cursor.execute(
+        'SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass',
+        [TABLE],
+    )
+    constraints = cursor.fetchall()
+    primary_key = next(name for name, kind, _ in constraints if kind == 'p')
+    cursor.execute(
+        'SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass '
+        'AND indexrelid NOT IN (SELECT conindid FROM pg_constraint WHERE conrelid = %s::regclass)',
+        [TABLE, TABLE],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute('SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal',
+                   [TABLE])
+    triggers = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_unpartitioned')
+    cursor.execute(f'CREATE TABLE {TABLE} (LIKE {TABLE}_unpartitioned INCLUDING DEFAULTS INCLUDING IDENTITY) '
+                   'PARTITION BY LIST (venue_id)')
+    venue_ids = list(Venue.objects.order_by('pk').values_list('pk', flat=True))
+    for venue_id in venue_ids:
+        create_partition(cursor, venue_id)
+    cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+
+    cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {TABLE}_unpartitioned')
+    cursor.execute(f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+                   f"coalesce(max(id), 0) + 1, false) FROM {TABLE}")
+    cursor.execute(f'DROP TABLE {TABLE}_unpartitioned')
+    cursor.execute(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")
+    cursor.execute(f'ALTER SEQUENCE {cursor.fetchone()[0]} RENAME TO {TABLE}_id_seq')
+
+    # Indexes are built after the copy, once per partition.
+    cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {primary_key} PRIMARY KEY (id, venue_id)')
+    for name, kind, definition in constraints:
+        if kind != 'p':
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+    for definition in indexes + triggers:
+        cursor.execute(definition)
+    return len(venue_ids)
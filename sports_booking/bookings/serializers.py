@@ -1,31 +1,88 @@
 from rest_framework import serializers
 from .models import Booking
-from classes.models import Class
+from classes.models import Class, ClassSeries
 from django.utils import timezone
+from sports_booking.metrics import BOOKING_OUTCOMES
+from sports_booking.sparse_fields import DynamicFieldsMixin
+from classes.constraints import trainer_overlap_as_validation_error
+
+class BookingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # "<series id>:<index>" of a series occurrence, as listed by /api/classes/occurrences/.
+    occurrence = serializers.CharField(write_only=True, required=False)
 
-class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
-        fields = ['id', 'user', 'sports_class', 'status', 'created_at', 'confirmed_at']
+        fields = ['id', 'user', 'sports_class', 'venue', 'occurrence', 'status', 'created_at', 'confirmed_at']
         read_only_fields = ['user', 'status', 'confirmed_at']
+        extra_kwargs = {'sports_class': {'required': False}}
+        expandable_fields = {
+            'user': 'users.serializers.UserSerializer',
+            'sports_class': 'classes.serializers.ClassSerializer',
+        }
+
+    def validate_occurrence(self, value):
+        """ Resolve to the occurrence's class, unsaved if nobody booked or edited it yet """
+        try:
+            series_id, index = (int(part) for part in value.split(':'))
+            series = ClassSeries.objects.get(pk=series_id)
+        except (ValueError, ClassSeries.DoesNotExist):
+            raise serializers.ValidationError("Unknown occurrence.")
+        if not series.has_occurrence(index):
+            raise serializers.ValidationError("Unknown occurrence.")
+        return series.occurrences.filter(series_index=index).first() or series.occurrence(index)
 
     def validate(self, attrs):
         user = self.context['request'].user
+        if 'occurrence' in attrs:
+            attrs['sports_class'] = attrs.pop('occurrence')
         sports_class = attrs.get('sports_class')
+        if sports_class is None:
+            raise serializers.ValidationError({"sports_class": "This field is required."})
+
+        if sports_class.canceled_at:
+            BOOKING_OUTCOMES.labels('canceled').inc()
+            raise serializers.ValidationError("This class has been canceled.")
 
         # Check if booking is within the allowed timeframe (at least 1 hour before class starts)
         if (sports_class.date_time - timezone.now()).total_seconds() < 3600:
+            BOOKING_OUTCOMES.labels('too_late').inc()
             raise serializers.ValidationError("You can only book a class at least one hour in advance.")
 
-        # Check if the user has already booked the class
-        if Booking.objects.filter(user=user, sports_class=sports_class).exists():
+        # Check if the user has already booked the class (a virtual occurrence has no bookings yet)
+        if sports_class.pk and Booking.objects.filter(user=user, sports_class=sports_class).exists():
+            BOOKING_OUTCOMES.labels('duplicate').inc()
             raise serializers.ValidationError("You have already booked this class.")
 
+        # Check if the user already holds a booking for a class overlapping this one
+        if Booking.objects.filter(
+            user=user, sports_class__time_span__overlap=sports_class.time_span
+        ).exclude(status=Booking.STATUS_CANCELED).exists():
+            BOOKING_OUTCOMES.labels('overlap').inc()
+            raise serializers.ValidationError("You already have a booking for a class at this time.")
+
         # Check if the class is full
-        if sports_class.bookings.filter(status='confirmed').count() >= sports_class.max_participants:
+        confirmed = sports_class.bookings.filter(status='confirmed').count() if sports_class.pk else 0
+        if confirmed >= sports_class.max_participants:
+            BOOKING_OUTCOMES.labels('full').inc()
             raise serializers.ValidationError("This class is fully booked.")
+
+        BOOKING_OUTCOMES.labels('success').inc()
         return attrs
 
+    def create(self, validated_data):
+        sports_class = validated_data['sports_class']
+        if sports_class.pk is None:
+            # First booking of a series occurrence: give it a real row now.
+            with trainer_overlap_as_validation_error():
+                validated_data['sports_class'] = sports_class.series.materialize(sports_class.series_index)
+        return super().create(validated_data)
+
 
 class ConfirmAttendanceSerializer(serializers.Serializer):
     booking_id = serializers.IntegerField()
+
+
+class TrainerCheckInSerializer(serializers.Serializer):
+    class_id = serializers.IntegerField()
+    booking_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=[Booking.STATUS_CONFIRMED, Booking.STATUS_NO_SHOW])
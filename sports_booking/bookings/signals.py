@@ -0,0 +1,26 @@
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from classes.models import Venue
+from .models import Booking
+from . import partitions
+
+# Sent whenever bookings of some classes change, including bulk UPDATEs that
+# bypass Model.save(). Receivers get `class_ids` and run inside the
+# transaction that made the change.
+bookings_changed = Signal()
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def forward_booking_change(sender, instance, **kwargs):
+    bookings_changed.send(sender=Booking, class_ids=[instance.sports_class_id])
+
+
+@receiver(post_save, sender=Venue)
+def create_venue_partition(sender, instance, created, **kwargs):
+    """ Once bookings are partitioned, every new venue gets its own partition """
+    if created and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            if partitions.is_partitioned(cursor):
+                partitions.create_partition(cursor, instance.pk)
@@ -1,31 +1,53 @@
 from __future__ import absolute_import, unicode_literals
 from celery import shared_task
 from django.utils import timezone
-from django.core.mail import send_mail
-from .models import Booking
+from sports_booking.metrics import TASK_ROWS, timed_task
+from .models import Booking, Notification
+from .notifications import notify, send_class_notices, send_digests
 
 @shared_task
-def auto_cancel_bookings():
-    """ Auto-cancel bookings that remain unconfirmed after 15 minutes """
-    expired_bookings = Booking.objects.filter(status='pending')
+@timed_task
+def auto_cancel_bookings(venue_id=None):
+    """ Auto-cancel bookings that remain unconfirmed after 15 minutes, at one venue or all """
+    expired_bookings = Booking.objects.filter(status='pending').select_related('user')
+    if venue_id is not None:
+        expired_bookings = expired_bookings.filter(venue_id=venue_id)
+    canceled = []
     for booking in expired_bookings:
+        TASK_ROWS.labels('auto_cancel_bookings').inc()
         if booking.is_expired():
             booking.status = 'canceled'
             booking.save()
+            canceled.append(Notification(user=booking.user, sports_class_id=booking.sports_class_id,
+                                         kind=Notification.KIND_CANCELLATION))
+    notify(canceled)
 
 @shared_task
-def send_class_reminders():
-    """ Send email reminders for upcoming classes scheduled within the next 24 hours """
+@timed_task
+def send_class_reminders(venue_id=None):
+    """ Send email reminders for upcoming classes scheduled within the next 24 hours, at one venue or all """
     upcoming_bookings = Booking.objects.filter(
         status='confirmed',
         sports_class__date_time__range=(timezone.now(), timezone.now() + timezone.timedelta(hours=24))
-    )
+    ).select_related('user', 'sports_class')
+    if venue_id is not None:
+        upcoming_bookings = upcoming_bookings.filter(venue_id=venue_id)
 
+    reminders = []
     for booking in upcoming_bookings:
-        send_mail(
-            "Class Reminder",
-            f"Reminder: Your class '{booking.sports_class.name}' is scheduled within the next 24 hours.",
-            "noreply@example.com",
-            [booking.user.email],
-            fail_silently=True,
-        )
+        TASK_ROWS.labels('send_class_reminders').inc()
+        reminders.append(Notification(user=booking.user, sports_class=booking.sports_class,
+                                      kind=Notification.KIND_REMINDER))
+    notify(reminders)
+
+@shared_task
+@timed_task
+def send_notification_digests():
+    """ Send the queued notifications of every user whose digest window has passed """
+    return send_digests()
+
+@shared_task
+@timed_task
+def send_class_cancellation(class_id):
+    """ Tell everyone whose booking was canceled with the class, in one job """
+    return send_class_notices(class_id)
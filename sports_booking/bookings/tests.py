@@ -1,10 +1,11 @@
-from django.test import TestCase
+from django.test import Client, TestCase
 from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
 from users.models import User
-from classes.models import Class
-from bookings.models import Booking
+from classes.models import Class, ClassSeries
+from bookings.models import Booking, Notification
+from bookings.signals import bookings_changed
 from datetime import timedelta
 
 
@@ -138,3 +139,593 @@ class BookingViewTest(BaseTestCase):
         response = self.client.post("/confirm-attendance/", data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("Booking not found.", response.data["non_field_errors"])
+
+
+from unittest.mock import patch
+from django.core import mail
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from sports_booking.models import IdempotencyKey
+
+
+class TrainerClassTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser",
+                                             email="testuser@example.com",
+                                             password="password")
+        self.trainer = User.objects.create_user(username="trainer",
+                                                email="trainer@example.com",
+                                                password="password",
+                                                role=User.TRAINER)
+        self.client.force_authenticate(user=self.user)
+        self.sports_class = Class.objects.create(
+            name="Yoga Class",
+            description="A relaxing yoga session.",
+            date_time=timezone.now() + timedelta(hours=2),
+            duration=60,
+            max_participants=10,
+            trainer=self.trainer
+        )
+
+    def use_digests(self, *users):
+        for user in users:
+            user.notification_delivery = User.DELIVERY_DIGEST
+            user.save(update_fields=["notification_delivery"])
+
+
+class IdempotencyKeyTest(TrainerClassTestCase):
+    def test_retry_replays_first_response(self):
+        data = {"sports_class": self.sports_class.id}
+        headers = {"Idempotency-Key": "booking-1"}
+        first = self.client.post("/api/bookings/", data, headers=headers)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(1):
+            retry = self.client.post("/api/bookings/", data, headers=headers)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(Notification.objects.filter(kind=Notification.KIND_BOOKING).count(), 1)
+
+    def test_key_reused_with_other_payload(self):
+        headers = {"Idempotency-Key": "booking-1"}
+        self.client.post("/api/bookings/", {"sports_class": self.sports_class.id},
+                         headers=headers)
+        response = self.client.post("/api/bookings/", {"sports_class": 0},
+                                    headers=headers)
+        self.assertEqual(response.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_concurrent_duplicate_is_rejected(self):
+        IdempotencyKey.objects.create(user=self.user, path="/api/bookings/confirm-attendance/",
+                                      key="confirm-1", fingerprint="")
+        response = self.client.post("/api/bookings/confirm-attendance/",
+                                    {"booking_id": 1},
+                                    headers={"Idempotency-Key": "confirm-1"})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_abandoned_claim_is_taken_over(self):
+        claim = IdempotencyKey.objects.create(user=self.user, path="/api/bookings/",
+                                              key="booking-1", fingerprint="")
+        IdempotencyKey.objects.filter(pk=claim.pk).update(created_at=timezone.now() - timedelta(minutes=1))
+        response = self.client.post("/api/bookings/", {"sports_class": self.sports_class.id},
+                                    headers={"Idempotency-Key": "booking-1"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        stored = IdempotencyKey.objects.get(user=self.user, key="booking-1")
+        self.assertEqual(stored.status, status.HTTP_201_CREATED)
+
+    def test_confirmation_error_is_replayed(self):
+        headers = {"Idempotency-Key": "confirm-1"}
+        first = self.client.post("/api/bookings/confirm-attendance/",
+                                 {"booking_id": 0}, headers=headers)
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        with patch("bookings.views.Booking.objects") as objects:
+            retry = self.client.post("/api/bookings/confirm-attendance/",
+                                     {"booking_id": 0}, headers=headers)
+        objects.get.assert_not_called()
+        self.assertEqual(retry.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(retry.data, first.data)
+
+
+class TrainerCheckInTest(TrainerClassTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.trainer)
+        self.present = Booking.objects.create(user=self.user,
+                                              sports_class=self.sports_class)
+        self.canceled = Booking.objects.create(user=self.trainer,
+                                               sports_class=self.sports_class,
+                                               status=Booking.STATUS_CANCELED)
+
+    def test_check_in_confirms_in_one_update(self):
+        data = {"class_id": self.sports_class.id,
+                "booking_ids": [self.present.id, self.canceled.id, 0],
+                "status": Booking.STATUS_CONFIRMED}
+        response = self.client.post("/api/bookings/check-in/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [
+            {"booking_id": self.present.id, "status": Booking.STATUS_CONFIRMED},
+            {"booking_id": self.canceled.id, "status": Booking.STATUS_CANCELED},
+            {"booking_id": 0, "status": "not_found"},
+        ])
+        self.present.refresh_from_db()
+        self.assertEqual(self.present.status, Booking.STATUS_CONFIRMED)
+        self.assertIsNotNone(self.present.confirmed_at)
+        self.canceled.refresh_from_db()
+        self.assertEqual(self.canceled.status, Booking.STATUS_CANCELED)
+
+    def test_check_in_stops_at_capacity(self):
+        Class.objects.filter(pk=self.sports_class.pk).update(max_participants=2)
+        first, second = (User.objects.create_user(username=f"member{i}", password="password") for i in range(2))
+        confirmed = Booking.objects.create(user=first, sports_class=self.sports_class,
+                                           status=Booking.STATUS_CONFIRMED)
+        late = Booking.objects.create(user=second, sports_class=self.sports_class)
+        data = {"class_id": self.sports_class.id,
+                "booking_ids": [late.id, confirmed.id, self.present.id],
+                "status": Booking.STATUS_CONFIRMED}
+        response = self.client.post("/api/bookings/check-in/", data, format="json")
+        self.assertEqual(response.data["results"], [
+            {"booking_id": late.id, "status": "class_full"},
+            {"booking_id": confirmed.id, "status": Booking.STATUS_CONFIRMED},
+            {"booking_id": self.present.id, "status": Booking.STATUS_CONFIRMED},
+        ])
+        self.assertEqual(self.sports_class.bookings.filter(status=Booking.STATUS_CONFIRMED).count(), 2)
+        late.refresh_from_db()
+        self.assertEqual(late.status, Booking.STATUS_PENDING)
+
+    def test_check_in_no_show(self):
+        data = {"class_id": self.sports_class.id,
+                "booking_ids": [self.present.id],
+                "status": Booking.STATUS_NO_SHOW}
+        response = self.client.post("/api/bookings/check-in/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.present.refresh_from_db()
+        self.assertEqual(self.present.status, Booking.STATUS_NO_SHOW)
+        self.assertIsNone(self.present.confirmed_at)
+
+    def test_check_in_by_other_user(self):
+        self.client.force_authenticate(user=self.user)
+        data = {"class_id": self.sports_class.id,
+                "booking_ids": [self.present.id],
+                "status": Booking.STATUS_CONFIRMED}
+        response = self.client.post("/api/bookings/check-in/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.present.refresh_from_db()
+        self.assertEqual(self.present.status, Booking.STATUS_PENDING)
+
+
+class BookingCancelTest(TrainerClassTestCase):
+    def setUp(self):
+        super().setUp()
+        self.booking = Booking.objects.create(user=self.user,
+                                              sports_class=self.sports_class)
+
+    def test_cancel_is_single_statement(self):
+        self.use_digests(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f"/api/bookings/{self.booking.id}/cancel/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        statements = [query["sql"] for query in queries
+                      if "SAVEPOINT" not in query["sql"]]
+        self.assertEqual(len(statements), 1)
+        self.assertIn("UPDATE", statements[0])
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, Booking.STATUS_CANCELED)
+
+    def test_cancel_refreshes_timetable(self):
+        with patch("classes.timetable.refresh_class") as refresh_class:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(f"/api/bookings/{self.booking.id}/cancel/")
+        refresh_class.assert_called_once_with(self.sports_class.id)
+
+    def test_cancel_twice(self):
+        self.client.delete(f"/api/bookings/{self.booking.id}/cancel/")
+        response = self.client.delete(f"/api/bookings/{self.booking.id}/cancel/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_cancel_other_users_booking(self):
+        self.client.force_authenticate(user=self.trainer)
+        response = self.client.delete(f"/api/bookings/{self.booking.id}/cancel/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, Booking.STATUS_PENDING)
+
+    def test_cancel_missing_booking(self):
+        response = self.client.delete("/api/bookings/0/cancel/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class OverlappingBookingTest(TrainerClassTestCase):
+    def create_class(self, name, start, duration=60):
+        trainer = User.objects.create_user(username=f"trainer-{name}",
+                                           password="password",
+                                           role=User.TRAINER)
+        return Class.objects.create(name=name, description="", date_time=start,
+                                    duration=duration, max_participants=10,
+                                    trainer=trainer)
+
+    def test_time_span_follows_class_time(self):
+        self.assertEqual(self.sports_class.time_span.lower, self.sports_class.date_time)
+        self.assertEqual(self.sports_class.time_span.upper,
+                         self.sports_class.date_time + timedelta(minutes=60))
+
+    def test_overlapping_booking_rejected(self):
+        Booking.objects.create(user=self.user, sports_class=self.sports_class)
+        overlapping = self.create_class("Pilates Class",
+                                        self.sports_class.date_time + timedelta(minutes=30))
+        response = self.client.post("/api/bookings/", {"sports_class": overlapping.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("You already have a booking for a class at this time.",
+                      response.data["non_field_errors"])
+
+    def test_back_to_back_and_canceled_bookings_allowed(self):
+        Booking.objects.create(user=self.user, sports_class=self.sports_class)
+        back_to_back = self.create_class("Pilates Class",
+                                         self.sports_class.date_time + timedelta(minutes=60))
+        response = self.client.post("/api/bookings/", {"sports_class": back_to_back.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        Booking.objects.filter(sports_class=back_to_back).update(status=Booking.STATUS_CANCELED)
+        overlapping = self.create_class("Spin Class",
+                                        back_to_back.date_time + timedelta(minutes=15))
+        response = self.client.post("/api/bookings/", {"sports_class": overlapping.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class SparseBookingFieldsTest(TrainerClassTestCase):
+    def test_nested_expand_uses_joins(self):
+        Booking.objects.create(user=self.user, sports_class=self.sports_class)
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/bookings/?fields=id,sports_class&expand=sports_class.trainer")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0]), {"id", "sports_class"})
+        self.assertEqual(response.data[0]["sports_class"]["name"], "Yoga Class")
+        self.assertEqual(response.data[0]["sports_class"]["trainer"]["username"], "trainer")
+
+    def test_unknown_names_are_ignored(self):
+        Booking.objects.create(user=self.user, sports_class=self.sports_class)
+        response = self.client.get("/api/bookings/?fields=id,nope&expand=nope")
+        self.assertEqual(response.data, [{"id": response.data[0]["id"]}])
+
+
+class SeriesOccurrenceBookingTest(TrainerClassTestCase):
+    def setUp(self):
+        super().setUp()
+        self.series = ClassSeries.objects.create(
+            name="Weekly Spin", description="Spin", trainer=self.trainer, duration=45, max_participants=12,
+            starts_at=self.sports_class.date_time + timedelta(days=1), interval_days=7,
+        )
+
+    def test_first_booking_materializes_occurrence(self):
+        occurrence = f"{self.series.id}:3"
+        response = self.client.post("/api/bookings/", {"occurrence": occurrence})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        sports_class = Class.objects.get(series=self.series)
+        self.assertEqual(response.data["sports_class"], sports_class.id)
+        self.assertEqual(sports_class.date_time, self.series.occurrence_start(3))
+
+        other = User.objects.create_user(username="other", email="other@example.com", password="password")
+        self.client.force_authenticate(user=other)
+        response = self.client.post("/api/bookings/", {"occurrence": occurrence})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Class.objects.filter(series=self.series).count(), 1)
+        self.assertEqual(sports_class.bookings.count(), 2)
+
+    def test_invalid_occurrence(self):
+        for occurrence in ("nonsense", f"{self.series.id}:-1", "0:1"):
+            response = self.client.post("/api/bookings/", {"occurrence": occurrence})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post("/api/bookings/", {})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Class.objects.filter(series=self.series).exists())
+
+
+class BookingAdminTest(TrainerClassTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(username="admin", email="admin@example.com", password="password")
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.add_bookings(3)
+
+    def add_bookings(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            user = User.objects.create_user(username=f"member{i}", email=f"member{i}@example.com", password="password")
+            Booking.objects.create(user=user, sports_class=self.sports_class)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get("/admin/bookings/booking/").status_code, status.HTTP_200_OK)
+        self.add_bookings(10)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get("/admin/bookings/booking/")
+        self.assertContains(response, "member12 booked Yoga Class")
+        self.assertEqual(len(many), len(few))
+        # The page count only; no second COUNT(*) for the unfiltered total.
+        self.assertEqual(len([query for query in many if "COUNT(*)" in query["sql"]]), 1)
+
+    def test_bulk_actions_run_one_update(self):
+        changed = []
+        receiver = lambda sender, class_ids, **kwargs: changed.append(class_ids)
+        bookings_changed.connect(receiver)
+        self.addCleanup(bookings_changed.disconnect, receiver)
+        first, second, third = Booking.objects.order_by("id")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post("/admin/bookings/booking/", {"action": "cancel_bookings",
+                                                          "_selected_action": [first.id, second.id]})
+        updates = [query["sql"] for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(changed, [[self.sports_class.id]])
+
+        self.client.post("/admin/bookings/booking/", {"action": "confirm_bookings", "select_across": 1,
+                                                      "_selected_action": [third.id]})
+        statuses = dict(Booking.objects.values_list("id", "status"))
+        self.assertEqual(statuses, {first.id: Booking.STATUS_CANCELED, second.id: Booking.STATUS_CANCELED,
+                                    third.id: Booking.STATUS_CONFIRMED})
+        third.refresh_from_db()
+        self.assertIsNotNone(third.confirmed_at)
+
+import smtplib
+from django.conf import settings
+from django.core.mail import get_connection
+from bookings.notifications import send_digests
+from bookings.tasks import send_class_reminders
+
+
+class NotificationDigestTest(TrainerClassTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_digests(self.user)
+        mail.outbox = []
+        self.classes = [self.sports_class] + [
+            Class.objects.create(name=f"Spin {i}", description="Spin", duration=45, max_participants=10,
+                                 date_time=self.sports_class.date_time + timedelta(days=i), trainer=self.trainer)
+            for i in range(1, 3)
+        ]
+
+    def book_all(self):
+        for sports_class in self.classes:
+            self.client.post("/api/bookings/", {"sports_class": sports_class.id})
+
+    def age_notifications(self):
+        Notification.objects.update(created_at=timezone.now() - timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW))
+
+    def test_events_are_coalesced_into_one_digest(self):
+        self.book_all()
+        booking = Booking.objects.filter(sports_class=self.classes[1]).get()
+        self.client.delete(f"/api/bookings/{booking.id}/cancel/")
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Notification.objects.count(), 4)
+        self.assertEqual(send_digests(), 0)
+
+        self.age_notifications()
+        self.assertEqual(send_digests(), 1)
+        [digest] = mail.outbox
+        self.assertEqual((digest.subject, digest.to), ("Your booking updates (4)", ["testuser@example.com"]))
+        self.assertEqual(digest.body.count("successfully booked"), 3)
+        self.assertIn("Your booking was canceled: Spin 1", digest.body)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(send_digests(), 0)
+
+    def test_digests_share_one_connection(self):
+        other = User.objects.create_user(username="other", email="other@example.com", password="password")
+        self.use_digests(other)
+        self.book_all()
+        self.client.force_authenticate(user=other)
+        self.client.post("/api/bookings/", {"sports_class": self.sports_class.id})
+        self.age_notifications()
+        with patch("bookings.notifications.get_connection", wraps=get_connection) as connections:
+            self.assertEqual(send_digests(), 2)
+        connections.assert_called_once_with()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         ["other@example.com", "testuser@example.com"])
+
+    def test_immediate_delivery_preference(self):
+        response = self.client.patch("/api/users/profile/notifications/",
+                                     {"notification_delivery": User.DELIVERY_IMMEDIATE})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(User.objects.create_user(username="new", password="password").notification_delivery,
+                         User.DELIVERY_DIGEST)
+        self.client.post("/api/bookings/", {"sports_class": self.sports_class.id})
+        self.assertEqual([message.subject for message in mail.outbox], ["Booking Confirmation"])
+        self.assertFalse(Notification.objects.exists())
+
+    def test_reminders_are_queued(self):
+        Booking.objects.create(user=self.user, sports_class=self.sports_class, status=Booking.STATUS_CONFIRMED)
+        send_class_reminders()
+        self.assertEqual(list(Notification.objects.values_list("kind", flat=True)), [Notification.KIND_REMINDER])
+        self.age_notifications()
+        send_digests()
+        self.assertEqual(mail.outbox[0].subject, "Class Reminder")
+
+    def test_failed_digest_is_requeued_not_resent(self):
+        other = User.objects.create_user(username="other", email="other@example.com", password="password")
+        self.use_digests(other)
+        self.book_all()
+        self.client.force_authenticate(user=other)
+        self.client.post("/api/bookings/", {"sports_class": self.sports_class.id})
+        self.age_notifications()
+
+        delivered = []
+
+        def send_messages(self, messages):
+            if messages[0].to == ["other@example.com"]:
+                raise smtplib.SMTPServerDisconnected("gone")
+            delivered.extend(messages)
+            return len(messages)
+
+        with patch("django.core.mail.backends.locmem.EmailBackend.send_messages", send_messages), \
+                self.assertLogs("bookings.notifications", "ERROR"):
+            self.assertEqual(send_digests(), 1)
+        self.assertEqual([message.to for message in delivered], [["testuser@example.com"]])
+        self.assertEqual(list(Notification.objects.values_list("user_id", flat=True)), [other.id])
+
+        self.age_notifications()
+        self.assertEqual(send_digests(), 1)
+        self.assertEqual(mail.outbox[-1].to, ["other@example.com"])
+        self.assertFalse(Notification.objects.exists())
+
+
+class ScopedBookingListTest(TrainerClassTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.upcoming = [self.sports_class] + [self.add_class(now + timedelta(days=days)) for days in (3, 1)]
+        self.past = [self.add_class(now - timedelta(days=days)) for days in (30, 2)]
+        for sports_class in self.upcoming + self.past:
+            Booking.objects.create(user=self.user, sports_class=sports_class, status=Booking.STATUS_CONFIRMED)
+        self.canceled = self.add_class(now + timedelta(hours=5))
+        Booking.objects.create(user=self.user, sports_class=self.canceled, status=Booking.STATUS_CANCELED)
+        other = User.objects.create_user(username="other", email="other@example.com", password="password")
+        Booking.objects.create(user=other, sports_class=self.upcoming[1])
+
+    def add_class(self, date_time):
+        return Class.objects.create(name=f"Class {date_time:%d %H}", description="Class", date_time=date_time,
+                                    duration=60, max_participants=10, trainer=self.trainer)
+
+    def class_ids(self, response):
+        return [booking["sports_class"] for booking in response.data["results"]]
+
+    def test_upcoming_in_class_order_without_canceled(self):
+        response = self.client.get("/api/bookings/upcoming/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.class_ids(response), [self.sports_class.id, self.upcoming[2].id, self.upcoming[1].id])
+
+        response = self.client.get("/api/bookings/upcoming/?status=canceled")
+        self.assertEqual(self.class_ids(response), [self.canceled.id])
+
+    def test_past_newest_first(self):
+        response = self.client.get("/api/bookings/past/")
+        self.assertEqual(self.class_ids(response), [self.past[1].id, self.past[0].id])
+
+    def test_pages_follow_the_cursor(self):
+        first = self.client.get("/api/bookings/upcoming/?page_size=2&status=confirmed,canceled")
+        self.assertEqual(self.class_ids(first), [self.sports_class.id, self.canceled.id])
+        second = self.client.get(first.data["next"])
+        self.assertEqual(self.class_ids(second), [self.upcoming[2].id, self.upcoming[1].id])
+        self.assertIsNone(second.data["next"])
+
+    def test_page_is_one_query_whatever_the_history(self):
+        for days in range(40, 60):
+            Booking.objects.create(user=self.user, sports_class=self.add_class(timezone.now() - timedelta(days=days)))
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/bookings/upcoming/?page_size=2")
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_unknown_status(self):
+        response = self.client.get("/api/bookings/past/?status=confirmed,lost")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from classes.models import DEFAULT_VENUE_ID, Venue
+from bookings import partitions
+from reports.models import ClassOccupancy
+from sports_booking.admin import estimated_count
+
+
+class VenueBookingTest(TrainerClassTestCase):
+    def setUp(self):
+        super().setUp()
+        self.venue = Venue.objects.create(name="Riverside", slug="riverside")
+        self.other_class = Class.objects.create(name="Spin", description="Spin", date_time=self.sports_class.date_time
+                                                + timedelta(hours=3), duration=60, max_participants=10,
+                                                trainer=self.trainer, venue=self.venue)
+
+    def test_booking_takes_the_class_venue(self):
+        self.client.post("/api/bookings/", {"sports_class": self.other_class.id})
+        self.assertEqual(Booking.objects.get(sports_class=self.other_class).venue, self.venue)
+        self.assertEqual(Booking.objects.create(user=self.trainer, sports_class=self.sports_class).venue_id,
+                         DEFAULT_VENUE_ID)
+
+    def test_venue_routes(self):
+        response = self.client.post("/api/venues/riverside/bookings/", {"sports_class": self.sports_class.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post("/api/venues/riverside/bookings/", {"sports_class": self.other_class.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["venue"], self.venue.id)
+        self.client.post("/api/bookings/", {"sports_class": self.sports_class.id})
+
+        response = self.client.get("/api/venues/riverside/bookings/")
+        self.assertEqual([booking["sports_class"] for booking in response.data], [self.other_class.id])
+        response = self.client.get("/api/venues/riverside/bookings/upcoming/")
+        self.assertEqual([booking["sports_class"] for booking in response.data["results"]], [self.other_class.id])
+        self.assertEqual(self.client.get("/api/venues/nowhere/bookings/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_writes_skipping_save_keep_the_venue(self):
+        booking = Booking.objects.create(user=self.user, sports_class=self.sports_class)
+        moved = Booking.objects.filter(pk=booking.pk)
+        moved.update(sports_class=self.other_class)
+        self.assertEqual(moved.get().venue, self.venue)
+        moved.update(sports_class_id=self.sports_class.id)
+        self.assertEqual(moved.get().venue_id, DEFAULT_VENUE_ID)
+
+        booking.sports_class_id = self.other_class.id
+        Booking.objects.bulk_update([booking], ["sports_class"])
+        self.assertEqual(moved.get().venue, self.venue)
+
+        with self.assertRaises(TypeError):
+            moved.update(sports_class=F("sports_class"))
+
+
+class PartitionBookingsTest(TrainerClassTestCase):
+    def setUp(self):
+        super().setUp()
+        self.venue = Venue.objects.create(name="Riverside", slug="riverside")
+        self.other_class = Class.objects.create(name="Spin", description="Spin", date_time=self.sports_class.date_time,
+                                                duration=60, max_participants=10, trainer=self.user, venue=self.venue)
+        self.bookings = [Booking.objects.create(user=self.trainer, sports_class=self.sports_class),
+                         Booking.objects.create(user=self.trainer, sports_class=self.other_class)]
+
+    def partition_of(self, booking_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT tableoid::regclass::text FROM {partitions.TABLE} WHERE id = %s", [booking_id])
+            return cursor.fetchone()[0]
+
+    def test_partition_keeps_rows_and_routes_by_venue(self):
+        out = StringIO()
+        call_command("partition_bookings", stdout=out)
+        self.assertIn("into 2 venue partitions", out.getvalue())
+        with connection.cursor() as cursor:
+            self.assertTrue(partitions.is_partitioned(cursor))
+        self.assertEqual(self.partition_of(self.bookings[1].id), partitions.partition_name(self.venue.id))
+        self.assertEqual(Booking.objects.count(), 2)
+
+        # Ids keep counting, and the rollup triggers came along.
+        booking = Booking.objects.create(user=self.user, sports_class=self.sports_class)
+        self.assertGreater(booking.id, self.bookings[1].id)
+        self.assertEqual(self.partition_of(booking.id), partitions.partition_name(DEFAULT_VENUE_ID))
+        self.assertEqual(ClassOccupancy.objects.get(sports_class=self.sports_class).pending, 2)
+
+        # A venue query reads its own partition only.
+        plan = Booking.objects.filter(venue=self.venue, status=Booking.STATUS_PENDING).explain()
+        self.assertIn(partitions.partition_name(self.venue.id), plan)
+        self.assertNotIn(partitions.partition_name(DEFAULT_VENUE_ID), plan)
+
+        # The admin's row estimate adds up the partitions' statistics.
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {partitions.TABLE}")
+        self.assertEqual(estimated_count(Booking.objects.all()), 3)
+
+    def test_new_venue_gets_a_partition(self):
+        call_command("partition_bookings", stdout=StringIO())
+        venue = Venue.objects.create(name="Harbour", slug="harbour")
+        sports_class = Class.objects.create(name="Swim", description="Swim", date_time=self.sports_class.date_time
+                                            + timedelta(hours=3), duration=60, max_participants=10,
+                                            trainer=self.user, venue=venue)
+        booking = Booking.objects.create(user=self.trainer, sports_class=sports_class)
+        self.assertEqual(self.partition_of(booking.id), partitions.partition_name(venue.id))
+
+        with self.assertRaises(CommandError):
+            call_command("partition_bookings", stdout=StringIO())
+
+        # Moving a booking to another venue's class moves its row to that partition.
+        Booking.objects.filter(pk=booking.pk).update(sports_class=self.sports_class)
+        self.assertEqual(self.partition_of(booking.id), partitions.partition_name(DEFAULT_VENUE_ID))
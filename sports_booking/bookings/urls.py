@@ -1,8 +1,15 @@
 from django.urls import path
-from .views import BookingListCreateView, BookingCancelView, ConfirmAttendanceView
+from .views import (
+    BookingListCreateView, BookingCancelView, ConfirmAttendanceView, PastBookingListView, TrainerCheckInView,
+    UpcomingBookingListView, booking_list_async
+)
 
 urlpatterns = [
     path('', BookingListCreateView.as_view(), name='booking-list-create'),
+    path('upcoming/', UpcomingBookingListView.as_view(), name='booking-list-upcoming'),
+    path('past/', PastBookingListView.as_view(), name='booking-list-past'),
     path('<int:pk>/cancel/', BookingCancelView.as_view(), name='booking-cancel'),
     path('confirm-attendance/', ConfirmAttendanceView.as_view(), name='confirm-attendance'),
+    path('check-in/', TrainerCheckInView.as_view(), name='trainer-check-in'),
+    path('async/', booking_list_async, name='booking-list-async'),
 ]
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import VenueBookingListCreateView, VenueUpcomingBookingListView
+
+urlpatterns = [
+    path('', VenueBookingListCreateView.as_view(), name='venue-booking-list-create'),
+    path('upcoming/', VenueUpcomingBookingListView.as_view(), name='venue-booking-list-upcoming'),
+]
@@ -1,47 +1,147 @@
+from django.views.decorators.http import require_GET
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied, ValidationError
-from django.core.mail import send_mail
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.pagination import CursorPagination
+from django.db import connection, transaction
+from django.db.models import F
 from django.utils import timezone
-from .models import Booking
-from .serializers import BookingSerializer, ConfirmAttendanceSerializer
+from classes.models import Class
+from classes.views import VenueScopedMixin
+from users.models import User
+from .models import Booking, Notification
+from .notifications import notify
+from .serializers import BookingSerializer, ConfirmAttendanceSerializer, TrainerCheckInSerializer
+from .signals import bookings_changed
 from rest_framework.permissions import IsAuthenticated
+from sports_booking.async_views import async_authenticated, json_response
+from sports_booking.idempotency import idempotent
+from sports_booking.sparse_fields import SparseFieldsViewMixin, requested_fields
+from sports_booking.throttling import WriteScopeMixin
 
-class BookingListCreateView(generics.ListCreateAPIView):
+class BookingListCreateView(WriteScopeMixin, SparseFieldsViewMixin, generics.ListCreateAPIView):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
+    write_throttle_scope = 'booking_write'
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user)
+        return super().get_queryset().filter(user=self.request.user)
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         booking = serializer.save(user=self.request.user)
-        self.send_booking_confirmation_email(booking)
+        notify([Notification(user=booking.user, sports_class=booking.sports_class, kind=Notification.KIND_BOOKING)])
+
+class UpcomingBookingsPagination(CursorPagination):
+    ordering = ('class_time', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+class PastBookingsPagination(UpcomingBookingsPagination):
+    ordering = ('-class_time', '-id')
+
+class ScopedBookingListView(SparseFieldsViewMixin, generics.ListAPIView):
+    """
+    The caller's bookings of classes on one side of now, in class time order
+    and cursor-paginated so a page reads only its own rows. ?status= takes
+    one or more comma-separated statuses.
+    """
+    queryset = Booking.objects.all()
+    serializer_class = BookingSerializer
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'read'
+    default_statuses = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset().filter(user=self.request.user).annotate(
+            class_time=F('sports_class__date_time'))
+        statuses = self.requested_statuses()
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        return self.scope(queryset, timezone.now())
+
+    def requested_statuses(self):
+        value = self.request.query_params.get('status')
+        if not value:
+            return self.default_statuses
+        statuses = [name for name in value.split(',') if name]
+        unknown = set(statuses) - {choice for choice, _ in Booking.STATUS_CHOICES}
+        if unknown:
+            raise ValidationError({'status': f"Unknown status: {', '.join(sorted(unknown))}."})
+        return statuses
+
+class UpcomingBookingListView(ScopedBookingListView):
+    pagination_class = UpcomingBookingsPagination
+    # "My upcoming classes" leaves out what the user has canceled unless asked for.
+    default_statuses = [Booking.STATUS_PENDING, Booking.STATUS_CONFIRMED]
+
+    def scope(self, queryset, now):
+        return queryset.filter(sports_class__date_time__gte=now)
+
+class PastBookingListView(ScopedBookingListView):
+    pagination_class = PastBookingsPagination
+
+    def scope(self, queryset, now):
+        return queryset.filter(sports_class__date_time__lt=now)
 
-    def send_booking_confirmation_email(self, booking):
-        """ Send email notification upon successful booking """
-        subject = "Booking Confirmation"
-        message = f"You have successfully booked the class: {booking.sports_class.name}"
-        recipient_list = [booking.user.email]
-        send_mail(subject, message, "noreply@example.com", recipient_list)
+class VenueBookingListCreateView(VenueScopedMixin, BookingListCreateView):
+    """ The user's bookings at one venue; new ones must be for that venue's classes """
+
+    def perform_create(self, serializer):
+        if serializer.validated_data['sports_class'].venue_id != self.venue.pk:
+            raise ValidationError({'sports_class': ["This class is at another venue."]})
+        super().perform_create(serializer)
+
+class VenueUpcomingBookingListView(VenueScopedMixin, UpcomingBookingListView):
+    pass
 
 class BookingCancelView(generics.DestroyAPIView):
     queryset = Booking.objects.all()
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'booking_write'
 
     def delete(self, request, *args, **kwargs):
-        booking = self.get_object()
-        if booking.user != request.user:
-            raise PermissionDenied("You do not have permission to cancel this booking.")
-        booking.status = Booking.STATUS_CANCELED
-        booking.save()
+        """
+        Cancel one of the caller's bookings with a single conditional UPDATE,
+        which also queues the cancellation for the user's next digest.
+        """
+        queue = request.user.notification_delivery == User.DELIVERY_DIGEST
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH canceled AS (UPDATE {Booking._meta.db_table} SET status = %s '
+                'WHERE id = %s AND user_id = %s AND status <> %s RETURNING sports_class_id), '
+                f'queued AS (INSERT INTO {Notification._meta.db_table} (user_id, sports_class_id, kind, created_at) '
+                'SELECT %s, sports_class_id, %s, %s FROM canceled WHERE %s) '
+                'SELECT sports_class_id FROM canceled',
+                [Booking.STATUS_CANCELED, kwargs['pk'], request.user.pk, Booking.STATUS_CANCELED,
+                 request.user.pk, Notification.KIND_CANCELLATION, timezone.now(), queue],
+            )
+            row = cursor.fetchone()
+            if row:
+                bookings_changed.send(sender=Booking, class_ids=[row[0]])
+
+        if row is None:
+            # Only the failure path pays for telling the cases apart.
+            owner_id = Booking.objects.filter(pk=kwargs['pk']).values_list('user_id', flat=True).first()
+            if owner_id is None:
+                raise NotFound("Booking not found.")
+            if owner_id != request.user.pk:
+                raise PermissionDenied("You do not have permission to cancel this booking.")
+        elif not queue:
+            notify([Notification(user=request.user, sports_class_id=row[0], kind=Notification.KIND_CANCELLATION)])
         return Response({"message": "Booking canceled successfully"}, status=status.HTTP_204_NO_CONTENT)
 
 class ConfirmAttendanceView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ConfirmAttendanceSerializer
+    throttle_scope = 'booking_write'
 
+    @idempotent
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
@@ -55,3 +155,76 @@ class ConfirmAttendanceView(generics.GenericAPIView):
             except Booking.DoesNotExist:
                 raise ValidationError("Booking not found.")
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TrainerCheckInView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = TrainerCheckInSerializer
+    throttle_scope = 'booking_write'
+
+    def post(self, request):
+        """
+        Confirm or mark as no-show many bookings of one class in a single UPDATE.
+        The class row is locked while the free seats are counted, and bookings
+        beyond them (earliest booked first) are reported as "class_full".
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        class_id = serializer.validated_data['class_id']
+        booking_ids = serializer.validated_data['booking_ids']
+        new_status = serializer.validated_data['status']
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            sports_class = Class.objects.select_for_update().filter(pk=class_id, trainer=request.user).first()
+            if sports_class is None:
+                raise PermissionDenied("Only the trainer of this class can check in its bookings.")
+            cursor.execute(
+                f'WITH requested AS ('
+                f'  SELECT id, status FROM {Booking._meta.db_table}'
+                f'  WHERE sports_class_id = %(class_id)s AND id = ANY(%(ids)s)'
+                f'), seats AS ('
+                f'  SELECT %(max)s - count(*) AS free FROM {Booking._meta.db_table}'
+                f'  WHERE sports_class_id = %(class_id)s AND status = %(confirmed)s'
+                f'), picked AS ('
+                f'  SELECT id FROM requested WHERE status = %(confirmed)s OR %(status)s <> %(confirmed)s'
+                f'  UNION ALL ('
+                f'    SELECT id FROM requested WHERE status NOT IN (%(confirmed)s, %(canceled)s)'
+                f'    AND %(status)s = %(confirmed)s ORDER BY id LIMIT GREATEST((SELECT free FROM seats), 0)'
+                f'  )'
+                f'), updated AS ('
+                f'  UPDATE {Booking._meta.db_table} SET status = %(status)s, confirmed_at = %(confirmed_at)s'
+                f'  WHERE id IN (SELECT id FROM picked) AND status <> %(canceled)s RETURNING id'
+                f') '
+                f'SELECT requested.id, requested.status, updated.id IS NOT NULL'
+                f' FROM requested LEFT JOIN updated USING (id)',
+                {
+                    'class_id': class_id, 'ids': booking_ids, 'max': sports_class.max_participants,
+                    'status': new_status, 'confirmed': Booking.STATUS_CONFIRMED, 'canceled': Booking.STATUS_CANCELED,
+                    'confirmed_at': timezone.now() if new_status == Booking.STATUS_CONFIRMED else None,
+                },
+            )
+            outcomes = {}
+            for booking_id, old_status, updated in cursor.fetchall():
+                if updated:
+                    outcomes[booking_id] = new_status
+                elif old_status == Booking.STATUS_CANCELED:
+                    outcomes[booking_id] = Booking.STATUS_CANCELED
+                else:
+                    outcomes[booking_id] = "class_full"
+            if new_status in outcomes.values():
+                bookings_changed.send(sender=Booking, class_ids=[class_id])
+
+        results = [
+            {"booking_id": booking_id, "status": outcomes.get(booking_id, "not_found")}
+            for booking_id in dict.fromkeys(booking_ids)
+        ]
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+@require_GET
+@async_authenticated
+async def booking_list_async(request):
+    """ Async counterpart of BookingListCreateView.get for the ASGI app """
+    queryset = BookingSerializer.sparse_queryset(Booking.objects.filter(user=request.user),
+                                                 *requested_fields(request))
+    bookings = [obj async for obj in queryset.aiterator()]
+    return json_response(BookingSerializer(bookings, many=True, context={'request': request}).data)
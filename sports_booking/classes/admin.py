@@ -1,3 +1,32 @@
 from django.contrib import admin
+from sports_booking.admin import LargeTableAdminMixin
+from .models import Class, ClassSeries, Venue
 
-# Register your models here.
+
+@admin.register(Venue)
+class VenueAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'slug')
+    search_fields = ('^name',)
+    prepopulated_fields = {'slug': ('name',)}
+
+
+@admin.register(Class)
+class ClassAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'name', 'date_time', 'duration', 'max_participants', 'trainer', 'venue', 'series')
+    list_select_related = ('trainer', 'venue', 'series')
+    list_filter = ('venue', ('date_time', admin.DateFieldListFilter))
+    search_fields = ('name__startswith',)
+    autocomplete_fields = ('trainer', 'series')
+    ordering = ('-date_time',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Bookings carry their class's venue, so a class stays where it was created.
+        return ('venue',) if obj else ()
+
+
+@admin.register(ClassSeries)
+class ClassSeriesAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'name', 'starts_at', 'interval_days', 'ends_on', 'trainer')
+    list_select_related = ('trainer',)
+    search_fields = ('^name',)
+    autocomplete_fields = ('trainer',)
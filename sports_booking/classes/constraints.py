@@ -0,0 +1,19 @@
+from contextlib import contextmanager
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from .models import TRAINER_OVERLAP_CONSTRAINT
+
+OVERLAP_MESSAGE = "This trainer already has a class at this time."
+
+
+@contextmanager
+def trainer_overlap_as_validation_error():
+    """ Turn a concurrent violation of the trainer overlap constraint into a 400 """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as exc:
+        diag = getattr(exc.__cause__, 'diag', None)
+        if getattr(diag, 'constraint_name', None) == TRAINER_OVERLAP_CONSTRAINT:
+            raise ValidationError({"non_field_errors": [OVERLAP_MESSAGE]})
+        raise
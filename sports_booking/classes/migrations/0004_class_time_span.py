@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:46
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0003_alter_class_duration_alter_class_trainer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='time_span',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            "UPDATE classes_class SET time_span = tstzrange(date_time, date_time + duration * interval '1 minute')",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='class',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['time_span'], name='class_time_span_gist'),
+        ),
+    ]
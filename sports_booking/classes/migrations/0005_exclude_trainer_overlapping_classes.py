@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:10
+
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+REPORTED_PAIRS = 50
+
+
+def check_no_overlaps(apps, schema_editor):
+    """ Stop with the clashing classes listed instead of a bare constraint violation """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT a.trainer_id, a.id, b.id FROM classes_class a JOIN classes_class b '
+            'ON a.trainer_id = b.trainer_id AND a.id < b.id AND a.time_span && b.time_span '
+            'ORDER BY a.trainer_id, a.id, b.id LIMIT %s',
+            [REPORTED_PAIRS + 1],
+        )
+        pairs = cursor.fetchall()
+    if pairs:
+        listed = '\n'.join(f'  trainer {trainer_id}: classes {first} and {second}'
+                            for trainer_id, first, second in pairs[:REPORTED_PAIRS])
+        more = '\n  ...' if len(pairs) > REPORTED_PAIRS else ''
+        raise RuntimeError(
+            'Trainers have overlapping classes, which the new exclusion constraint forbids:\n'
+            f'{listed}{more}\n'
+            'Move or delete one class of each pair (or give it to another trainer), then run migrate again.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0004_class_time_span'),
+    ]
+
+    operations = [
+        # Needed for the trainer equality part of the exclusion constraint.
+        BtreeGistExtension(),
+        migrations.RunPython(check_no_overlaps, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='class',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[('trainer', '='), ('time_span', '&&')], name='exclude_trainer_overlapping_classes'),
+        ),
+    ]
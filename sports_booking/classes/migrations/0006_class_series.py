@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0005_exclude_trainer_overlapping_classes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='series_index',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='ClassSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('starts_at', models.DateTimeField(help_text='Start of the first occurrence')),
+                ('duration', models.IntegerField(help_text='Duration in minutes')),
+                ('max_participants', models.IntegerField()),
+                ('interval_days', models.PositiveSmallIntegerField(default=7)),
+                ('ends_on', models.DateField(blank=True, help_text='Last day an occurrence may start on', null=True)),
+                ('trainer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='class_series', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'class series',
+            },
+        ),
+        migrations.AddField(
+            model_name='class',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='classes.classseries'),
+        ),
+        migrations.AddConstraint(
+            model_name='class',
+            constraint=models.UniqueConstraint(fields=('series', 'series_index'), name='unique_class_series_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='classseries',
+            index=models.Index(fields=['starts_at', 'ends_on'], name='class_series_window_idx'),
+        ),
+    ]
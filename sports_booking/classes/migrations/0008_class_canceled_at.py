@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0007_class_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='canceled_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
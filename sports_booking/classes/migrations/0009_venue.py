@@ -0,0 +1,40 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_default_venue(apps, schema_editor):
+    # The table is new, so this row gets id 1 (DEFAULT_VENUE_ID).
+    apps.get_model('classes', 'Venue').objects.create(name='Main', slug='main')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0008_class_canceled_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Venue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(unique=True)),
+            ],
+        ),
+        migrations.RunPython(create_default_venue, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='class',
+            name='venue',
+            field=models.ForeignKey(default=1, on_delete=django.db.models.deletion.PROTECT, related_name='classes', to='classes.venue'),
+        ),
+        migrations.AddField(
+            model_name='classseries',
+            name='venue',
+            field=models.ForeignKey(default=1, on_delete=django.db.models.deletion.PROTECT, related_name='series', to='classes.venue'),
+        ),
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['venue', 'date_time'], name='class_venue_time_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# time_span is derived in the database, so writes that skip Class.save
+# (QuerySet.update, raw SQL) can't leave it stale. A generated column won't do:
+# timestamptz + interval is only STABLE, and generated columns need IMMUTABLE.
+SPAN = "CASE WHEN {row}canceled_at IS NULL THEN tstzrange({row}date_time, {row}date_time + {row}duration * interval '1 minute') END"
+
+INSTALL = f"""
+UPDATE classes_class SET time_span = {SPAN.format(row='')}
+WHERE time_span IS DISTINCT FROM {SPAN.format(row='')};
+
+CREATE OR REPLACE FUNCTION classes_class_time_span() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.time_span := {SPAN.format(row='NEW.')};
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER classes_class_time_span
+BEFORE INSERT OR UPDATE OF date_time, duration, canceled_at, time_span ON classes_class
+FOR EACH ROW EXECUTE FUNCTION classes_class_time_span();
+"""
+
+UNINSTALL = """
+DROP TRIGGER IF EXISTS classes_class_time_span ON classes_class;
+DROP FUNCTION IF EXISTS classes_class_time_span();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0009_venue'),
+    ]
+
+    operations = [
+        migrations.RunSQL(INSTALL, UNINSTALL),
+    ]
@@ -1,7 +1,32 @@
+import itertools
+from datetime import datetime, time, timedelta
+from math import lcm
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.contrib.postgres.indexes import GistIndex
 from django.db import models
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.utils import timezone
 from users.models import User
 
 
+TRAINER_OVERLAP_CONSTRAINT = 'exclude_trainer_overlapping_classes'
+# Occurrences of a new or changed series checked against the trainer's other series.
+SERIES_CHECK_LIMIT = 520
+# Created by migration 0009; classes and series not given a venue land here, so
+# a single-gym deployment never has to mention venues.
+DEFAULT_VENUE_ID = 1
+
+
+class Venue(models.Model):
+    """ A gym; every class, and through it every booking, belongs to one """
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(unique=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Class(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
@@ -9,6 +34,197 @@ class Class(models.Model):
     duration = models.IntegerField(help_text="Duration in minutes")
     max_participants = models.IntegerField()
     trainer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='trainer_classes')
+    venue = models.ForeignKey(Venue, on_delete=models.PROTECT, default=DEFAULT_VENUE_ID, related_name='classes')
+    # [date_time, date_time + duration), or null once canceled, for range queries. Set by a
+    # database trigger (migration 0010) on every write; save() only mirrors it on the instance.
+    time_span = DateTimeRangeField(null=True, blank=True, editable=False)
+    # Set when the class is a materialized occurrence of a ClassSeries.
+    series = models.ForeignKey('ClassSeries', on_delete=models.SET_NULL, null=True, blank=True,
+                               related_name='occurrences')
+    series_index = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Set by the cancel endpoint. A canceled class has no time_span, which frees
+    # the trainer's slot under the overlap constraint.
+    canceled_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GistIndex(fields=['time_span'], name='class_time_span_gist'),
+            # Admin changelist ordering and date filter, and its name autocomplete.
+            models.Index(fields=['date_time'], name='class_date_time_idx'),
+            models.Index(fields=['name'], name='class_name_prefix_idx', opclasses=['varchar_pattern_ops']),
+            # Venue timetables and listings.
+            models.Index(fields=['venue', 'date_time'], name='class_venue_time_idx'),
+        ]
+        constraints = [
+            ExclusionConstraint(
+                name=TRAINER_OVERLAP_CONSTRAINT,
+                expressions=[('trainer', RangeOperators.EQUAL), ('time_span', RangeOperators.OVERLAPS)],
+            ),
+            models.UniqueConstraint(fields=['series', 'series_index'], name='unique_class_series_occurrence'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so a save knows which timetable day the class leaves.
+        instance._loaded_date_time = instance.__dict__.get('date_time')
+        return instance
+
+    @property
+    def occurrence_key(self):
+        return f'{self.series_id}:{self.series_index}' if self.series_id else None
+
+    @staticmethod
+    def span_for(date_time, duration):
+        return DateTimeTZRange(date_time, date_time + timedelta(minutes=duration))
+
+    def save(self, *args, **kwargs):
+        self.time_span = None if self.canceled_at else self.span_for(self.date_time, self.duration)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'date_time', 'duration'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'time_span'}
+        super().save(*args, **kwargs)
+
+
+class ClassSeries(models.Model):
+    """
+    A recurring class every `interval_days` from `starts_at`, up to `ends_on`
+    (or forever). Occurrences are computed on the fly and only become a Class
+    row, linked back through `series`/`series_index`, when they are first
+    booked or edited by the trainer.
+    """
+    name = models.CharField(max_length=100)
+    description = models.TextField()
+    starts_at = models.DateTimeField(help_text="Start of the first occurrence")
+    duration = models.IntegerField(help_text="Duration in minutes")
+    max_participants = models.IntegerField()
+    interval_days = models.PositiveSmallIntegerField(default=7)
+    ends_on = models.DateField(null=True, blank=True, help_text="Last day an occurrence may start on")
+    trainer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='class_series')
+    venue = models.ForeignKey(Venue, on_delete=models.PROTECT, default=DEFAULT_VENUE_ID, related_name='series')
+
+    class Meta:
+        verbose_name_plural = 'class series'
+        indexes = [
+            models.Index(fields=['starts_at', 'ends_on'], name='class_series_window_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+    def occurrence_start(self, index):
+        # Step in local wall-clock time so a weekly 18:00 class stays at 18:00 across DST.
+        first = timezone.localtime(self.starts_at)
+        return timezone.make_aware(first.replace(tzinfo=None) + timedelta(days=index * self.interval_days),
+                                   first.tzinfo)
+
+    def has_occurrence(self, index):
+        return index >= 0 and (
+            self.ends_on is None or timezone.localtime(self.occurrence_start(index)).date() <= self.ends_on
+        )
+
+    def indexes_between(self, start, end):
+        """ Indexes of the occurrences starting in [start, end), computed from the window alone """
+        # One step back absorbs the DST shift between UTC and wall-clock stepping.
+        index = max((start - self.starts_at) // timedelta(days=self.interval_days) - 1, 0)
+        while self.has_occurrence(index):
+            date_time = self.occurrence_start(index)
+            if date_time >= end:
+                break
+            if date_time >= start:
+                yield index
+            index += 1
+
+    def clashing_class(self):
+        """ The first class of the trainer, outside this series, that an occurrence would overlap """
+        length = timedelta(minutes=self.duration)
+        end = None
+        if self.ends_on:
+            end = timezone.make_aware(datetime.combine(self.ends_on + timedelta(days=1), time.min)) + length
+        classes = Class.objects.filter(
+            trainer_id=self.trainer_id, time_span__overlap=DateTimeTZRange(self.starts_at, end)
+        ).order_by('date_time')
+        if self.pk:
+            classes = classes.exclude(series=self)
+        for obj in classes.only('id', 'time_span'):
+            # Occurrences starting less than one length before the class overlap it.
+            for index in self.indexes_between(obj.time_span.lower - length, obj.time_span.upper):
+                if self.occurrence_start(index) + length > obj.time_span.lower:
+                    return obj
+        return None
+
+    def clashing_occurrence(self):
+        """
+        The first not yet materialized occurrence of another series of the
+        trainer that one of this series' occurrences would overlap, as
+        (series, index). Two schedules repeat together every lcm of their
+        intervals, so one such period from the later start covers them,
+        capped at SERIES_CHECK_LIMIT occurrences of this series.
+        """
+        others = ClassSeries.objects.filter(trainer_id=self.trainer_id)
+        if self.pk:
+            others = others.exclude(pk=self.pk)
+        others = list(others.only('starts_at', 'interval_days'))
+        if not others:
+            return None
+        period = timedelta(days=lcm(self.interval_days, *(other.interval_days for other in others)))
+        end = max(self.starts_at, *(other.starts_at for other in others)) + period + timedelta(days=1)
+        indexes = itertools.islice(self.indexes_between(self.starts_at, end), SERIES_CHECK_LIMIT)
+        length = timedelta(minutes=self.duration)
+        spans = [(start, start + length) for start in map(self.occurrence_start, indexes)]
+        return ClassSeries.occurrence_over(self.trainer_id, spans, exclude=self.pk)
+
+    @staticmethod
+    def occurrence_over(trainer_id, spans, exclude=None):
+        """
+        The first not yet materialized occurrence of the trainer's series
+        overlapping one of the (start, end) spans, as (series, index); real
+        classes, materialized occurrences included, are the exclusion
+        constraint's job.
+        """
+        if not spans:
+            return None
+        first = min(start for start, _ in spans)
+        series = ClassSeries.objects.filter(trainer_id=trainer_id, starts_at__lt=max(end for _, end in spans)).filter(
+            # An occurrence may run past midnight into the first span's day.
+            models.Q(ends_on__isnull=True) | models.Q(ends_on__gte=timezone.localtime(first).date() - timedelta(days=1))
+        )
+        if exclude:
+            series = series.exclude(pk=exclude)
+        candidates = []
+        for obj in series:
+            length = timedelta(minutes=obj.duration)
+            for start, end in spans:
+                candidates.extend(
+                    (obj, index) for index in obj.indexes_between(start - length, end)
+                    if obj.occurrence_start(index) + length > start
+                )
+        if not candidates:
+            return None
+        materialized = set(Class.objects.filter(
+            series_id__in={obj.pk for obj, _ in candidates}, series_index__in={index for _, index in candidates},
+        ).values_list('series_id', 'series_index'))
+        return next(((obj, index) for obj, index in candidates if (obj.pk, index) not in materialized), None)
+
+    def occurrence(self, index):
+        """ The unsaved Class for one occurrence """
+        date_time = self.occurrence_start(index)
+        return Class(
+            name=self.name, description=self.description, date_time=date_time, duration=self.duration,
+            max_participants=self.max_participants, trainer_id=self.trainer_id, venue_id=self.venue_id, series=self,
+            series_index=index, time_span=Class.span_for(date_time, self.duration),
+        )
+
+    def materialize(self, index):
+        """ Return the Class row for an occurrence, creating it on first use """
+        occurrence = self.occurrence(index)
+        obj, _ = Class.objects.get_or_create(series=self, series_index=index, defaults={
+            field: getattr(occurrence, field)
+            for field in ('name', 'description', 'date_time', 'duration', 'max_participants', 'trainer_id',
+                          'venue_id')
+        })
+        return obj
+
@@ -0,0 +1,35 @@
+from django.db.models import Q
+from django.utils import timezone
+from .models import Class, ClassSeries
+
+MAX_WINDOW_DAYS = 31
+
+
+def occurrences_between(start, end, trainer_id=None, venue_id=None):
+    """
+    Real classes plus the not yet materialized occurrences of every series,
+    starting in [start, end) and ordered by start time. Always three queries:
+    the work depends on the window, not on how long the series run.
+    """
+    classes = Class.objects.filter(date_time__gte=start, date_time__lt=end)
+    series = ClassSeries.objects.filter(starts_at__lt=end).filter(
+        Q(ends_on__isnull=True) | Q(ends_on__gte=timezone.localtime(start).date())
+    )
+    if trainer_id is not None:
+        classes = classes.filter(trainer_id=trainer_id)
+        series = series.filter(trainer_id=trainer_id)
+    if venue_id is not None:
+        classes = classes.filter(venue_id=venue_id)
+        series = series.filter(venue_id=venue_id)
+
+    wanted = {(obj.id, index): obj for obj in series for index in obj.indexes_between(start, end)}
+    materialized = set()
+    if wanted:
+        # Includes occurrences the trainer moved out of the window; their slot stays taken.
+        materialized = set(Class.objects.filter(
+            series_id__in={series_id for series_id, _ in wanted},
+            series_index__in={index for _, index in wanted},
+        ).values_list('series_id', 'series_index'))
+    virtual = [obj.occurrence(index) for (series_id, index), obj in wanted.items()
+               if (series_id, index) not in materialized]
+    return sorted([*classes, *virtual], key=lambda obj: (obj.date_time, obj.pk or 0))
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+import psycopg
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils.module_loading import import_string
+from . import timetable
+
+logger = logging.getLogger(__name__)
+
+# Classes with a feed open in some process, for PostgresBroker.has_subscribers.
+SUBSCRIBERS_KEY = 'seat_feed:subscribers:%s'
+SUBSCRIBERS_TIMEOUT = 30
+
+
+class InProcessBroker:
+    """
+    Fan seat updates out to subscribers living in this process.
+
+    Subscribers are asyncio queues bound to the event loop that created them;
+    publishing is thread-safe so sync request threads and signal handlers can
+    call it. Each queue only holds the latest update, since an idle client that
+    wakes up needs the current seat count, not the history.
+
+    Any object with the same `subscribe`/`unsubscribe`/`publish`/
+    `has_subscribers` methods can replace it through the SEAT_FEED_BROKER
+    setting. It only sees changes made in this process, so it suits a single
+    process serving both the API and the feed; see PostgresBroker otherwise.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, class_id):
+        queue = asyncio.Queue(maxsize=1)
+        with self._lock:
+            self._subscribers[class_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, class_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(class_id, set())
+            subscribers.difference_update({item for item in subscribers if item[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(class_id, None)
+
+    def publish(self, class_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(class_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_replace_latest, queue, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down.
+                self.unsubscribe(class_id, queue)
+
+    def has_subscribers(self, class_id):
+        with self._lock:
+            return bool(self._subscribers.get(class_id))
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Relay seat updates between processes over Postgres LISTEN/NOTIFY, so
+    changes made by WSGI workers and Celery reach the feed in ASGI workers.
+
+    Publishing is a NOTIFY on the current connection, delivered when its
+    transaction commits. A process runs one listener thread with its own
+    connection while it has subscribers, and hands what it hears to them.
+
+    Subscribers may live in any process, so each process marks the classes it
+    watches in the shared cache and the listener renews the marks. Writers
+    only query and publish seats for marked classes; a mark outlives its last
+    subscriber by at most SUBSCRIBERS_TIMEOUT.
+    """
+    channel = 'seat_feed'
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def subscribe(self, class_id):
+        queue = super().subscribe(class_id)
+        cache.set(SUBSCRIBERS_KEY % class_id, 1, SUBSCRIBERS_TIMEOUT)
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, args=[connection.get_connection_params()],
+                                                  name='seat-feed-listener', daemon=True)
+                self._listener.start()
+        return queue
+
+    def publish(self, class_id, message):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)',
+                           [self.channel, json.dumps({'class_id': class_id, 'message': message})])
+
+    def has_subscribers(self, class_id):
+        return cache.get(SUBSCRIBERS_KEY % class_id) is not None
+
+    def relay(self, payload):
+        """ Pass one notification on to the subscribers in this process """
+        payload = json.loads(payload)
+        super().publish(payload['class_id'], payload['message'])
+
+    def _listening(self):
+        """ Whether the calling listener thread should go on; it stops once nobody subscribes """
+        with self._lock:
+            if not self._subscribers and self._listener is threading.current_thread():
+                self._listener = None
+            return self._listener is threading.current_thread()
+
+    def _advertise(self):
+        """ Renew the marks of the classes subscribed to in this process """
+        with self._lock:
+            class_ids = list(self._subscribers)
+        if class_ids:
+            cache.set_many({SUBSCRIBERS_KEY % class_id: 1 for class_id in class_ids}, SUBSCRIBERS_TIMEOUT)
+
+    def _listen(self, params):
+        advertised = time.monotonic()
+        while self._listening():
+            try:
+                with psycopg.connect(**params, autocommit=True) as listener:
+                    listener.execute(f'LISTEN {self.channel}')
+                    while self._listening():
+                        if time.monotonic() - advertised > SUBSCRIBERS_TIMEOUT / 3:
+                            self._advertise()
+                            advertised = time.monotonic()
+                        for notify in listener.notifies(timeout=1):
+                            self.relay(notify.payload)
+            except psycopg.Error:
+                logger.exception("Seat feed listener lost its connection; reconnecting")
+                time.sleep(1)
+
+
+def _replace_latest(queue, message):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+@lru_cache(maxsize=None)
+def _broker(path):
+    return import_string(path)()
+
+
+def get_broker():
+    return _broker(settings.SEAT_FEED_BROKER)
+
+
+def seat_messages(class_ids):
+    """ Current free seats for the given classes, one query for all of them """
+    return {
+        obj.id: {'class_id': obj.id, 'free_seats': timetable.free_seats(obj)}
+        for obj in timetable.snapshot_queryset().filter(pk__in=class_ids)
+    }
+
+
+def publish_seats(class_ids):
+    """
+    Push the current seat count of each class that has listeners, or None for
+    a class that no longer exists so its streams end.
+    """
+    broker = get_broker()
+    class_ids = [class_id for class_id in set(class_ids) if broker.has_subscribers(class_id)]
+    if class_ids:
+        messages = seat_messages(class_ids)
+        for class_id in class_ids:
+            broker.publish(class_id, messages.get(class_id))
+
+
+def format_event(message):
+    return f'event: seats\ndata: {json.dumps(message)}\n\n'
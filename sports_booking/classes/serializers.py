@@ -1,8 +1,143 @@
+from bisect import bisect_left
+from copy import copy
+from django.db import transaction
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
 from rest_framework import serializers
-from .models import Class
+from sports_booking.sparse_fields import DynamicFieldsMixin
+from .constraints import OVERLAP_MESSAGE
+from .models import Class, ClassSeries, Venue
+from .occurrences import MAX_WINDOW_DAYS
+from . import timetable
 
-class ClassSerializer(serializers.ModelSerializer):
+
+class ClassListSerializer(serializers.ListSerializer):
+    """ Validates and inserts a batch of classes with one query each """
+
+    def validate(self, attrs):
+        request = self.context.get('request')
+        if not attrs or request is None:
+            return attrs
+
+        spans = sorted((Class.span_for(item['date_time'], item['duration']) for item in attrs),
+                       key=lambda span: span.lower)
+        for previous, current in zip(spans, spans[1:]):
+            if current.lower < previous.upper:
+                raise serializers.ValidationError("Classes in this request overlap each other.")
+
+        # Existing classes of one trainer never overlap each other, so sorted by
+        # start they are sorted by end too and a bisect finds the only candidate.
+        window = DateTimeTZRange(spans[0].lower, max(span.upper for span in spans))
+        existing = sorted(
+            Class.objects.filter(trainer=request.user, time_span__overlap=window).values_list('time_span', flat=True),
+            key=lambda span: span.lower,
+        )
+        starts = [span.lower for span in existing]
+        for span in spans:
+            index = bisect_left(starts, span.upper)
+            if index and existing[index - 1].upper > span.lower:
+                raise serializers.ValidationError(OVERLAP_MESSAGE)
+        if ClassSeries.occurrence_over(request.user.pk, [(span.lower, span.upper) for span in spans]) is not None:
+            raise serializers.ValidationError(OVERLAP_MESSAGE)
+        return attrs
+
+    def create(self, validated_data):
+        classes = Class.objects.bulk_create([
+            Class(**item, time_span=Class.span_for(item['date_time'], item['duration']))
+            for item in validated_data
+        ])
+        days = {timetable.class_day(obj.date_time) for obj in classes}
+        transaction.on_commit(lambda: timetable.invalidate_days(days))
+        return classes
+
+
+class VenueSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Venue
+        fields = ['id', 'name', 'slug']
+
+
+class ClassSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Class
-        fields = ['id', 'name', 'description', 'date_time', 'duration', 'max_participants', 'trainer']
+        fields = ['id', 'name', 'description', 'date_time', 'duration', 'max_participants', 'trainer', 'venue',
+                  'canceled_at']
+        read_only_fields = ['trainer', 'canceled_at']
+        list_serializer_class = ClassListSerializer
+        expandable_fields = {'trainer': 'users.serializers.PublicUserSerializer'}
+
+    def validate_venue(self, value):
+        # Its bookings carry the venue too, and may live in that venue's partition.
+        if self.instance is not None and value != self.instance.venue:
+            raise serializers.ValidationError("A class can't move to another venue.")
+        return value
+
+    def validate(self, attrs):
+        request = self.context.get('request')
+        if self.parent is not None or request is None:
+            # Batches are checked at once by ClassListSerializer.
+            return attrs
+
+        date_time = attrs.get('date_time', getattr(self.instance, 'date_time', None))
+        duration = attrs.get('duration', getattr(self.instance, 'duration', None))
+        if date_time is None or duration is None:
+            return attrs
+        trainer = self.instance.trainer if self.instance else request.user
+        span = Class.span_for(date_time, duration)
+        overlapping = Class.objects.filter(trainer=trainer, time_span__overlap=span)
+        if self.instance:
+            overlapping = overlapping.exclude(pk=self.instance.pk)
+        if overlapping.exists() or ClassSeries.occurrence_over(trainer.pk, [(span.lower, span.upper)]) is not None:
+            raise serializers.ValidationError(OVERLAP_MESSAGE)
+        return attrs
+
+
+class OccurrenceSerializer(ClassSerializer):
+    """ A real or virtual class in an occurrence listing; virtual ones have no id yet """
+    occurrence = serializers.CharField(source='occurrence_key', read_only=True)
+
+    class Meta(ClassSerializer.Meta):
+        fields = ClassSerializer.Meta.fields + ['series', 'occurrence']
+        read_only_fields = fields
+        list_serializer_class = serializers.ListSerializer
+
+
+class OccurrenceWindowSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    days = serializers.IntegerField(min_value=1, max_value=MAX_WINDOW_DAYS, default=7)
+    trainer = serializers.IntegerField(required=False)
+    venue = serializers.IntegerField(required=False)
+
+
+class ClassSeriesSerializer(serializers.ModelSerializer):
+    SCHEDULE_FIELDS = ('starts_at', 'interval_days', 'venue')
+    SPAN_FIELDS = ('starts_at', 'interval_days', 'ends_on', 'duration')
+
+    class Meta:
+        model = ClassSeries
+        fields = ['id', 'name', 'description', 'starts_at', 'duration', 'max_participants', 'interval_days',
+                  'ends_on', 'trainer', 'venue']
         read_only_fields = ['trainer']
+
+    def validate_interval_days(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Ensure this value is greater than or equal to 1.")
+        return value
+
+    def validate(self, attrs):
+        # Materialized occurrences are keyed by their index, which a new schedule would reassign.
+        if self.instance and any(
+            field in attrs and attrs[field] != getattr(self.instance, field) for field in self.SCHEDULE_FIELDS
+        ) and self.instance.occurrences.exists():
+            raise serializers.ValidationError(
+                "The schedule of a series with booked or edited occurrences can't change; end it and start a new one."
+            )
+
+        request = self.context.get('request')
+        if request is not None and (self.instance is None or any(field in attrs for field in self.SPAN_FIELDS)):
+            series = copy(self.instance) if self.instance else ClassSeries(trainer=request.user)
+            for field, value in attrs.items():
+                setattr(series, field, value)
+            if series.clashing_class() is not None or series.clashing_occurrence() is not None:
+                raise serializers.ValidationError(OVERLAP_MESSAGE)
+        return attrs
+
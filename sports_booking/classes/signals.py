@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from bookings.signals import bookings_changed
+from .models import Class
+from . import seat_feed, timetable
+
+
+@receiver(pre_save, sender=Class)
+def remember_class_day(sender, instance, **kwargs):
+    """
+    Keep the day a class is moved away from so its snapshot can be dropped.
+    Instances loaded from the database already know it; only a class saved
+    by primary key without being loaded is looked up.
+    """
+    if hasattr(instance, '_loaded_date_time'):
+        previous = instance._loaded_date_time
+    elif instance.pk:
+        previous = Class.objects.filter(pk=instance.pk).values_list('date_time', flat=True).first()
+    else:
+        previous = None
+    instance._timetable_previous_day = timetable.class_day(previous) if previous else None
+
+
+@receiver(post_save, sender=Class)
+def refresh_timetable_for_class(sender, instance, **kwargs):
+    previous_day = getattr(instance, '_timetable_previous_day', None)
+    instance._loaded_date_time = instance.date_time
+    transaction.on_commit(lambda: timetable.refresh_class(instance.pk, previous_day))
+    transaction.on_commit(lambda: seat_feed.publish_seats([instance.pk]))
+
+
+@receiver(post_delete, sender=Class)
+def drop_class_from_timetable(sender, instance, **kwargs):
+    class_id, day = instance.pk, timetable.class_day(instance.date_time)
+    transaction.on_commit(lambda: timetable.refresh_class(class_id, day))
+    transaction.on_commit(lambda: seat_feed.publish_seats([class_id]))
+
+
+@receiver(bookings_changed)
+def refresh_timetable_for_bookings(sender, class_ids, **kwargs):
+    for class_id in set(class_ids):
+        transaction.on_commit(lambda class_id=class_id: timetable.refresh_class(class_id))
+    transaction.on_commit(lambda: seat_feed.publish_seats(class_ids))
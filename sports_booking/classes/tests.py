@@ -1,9 +1,10 @@
 from django.test import TestCase
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.test import APIClient
 from rest_framework import status
 from users.models import User
-from classes.models import Class
+from classes.models import Class, ClassSeries
 from datetime import timedelta
 
 
@@ -150,3 +151,597 @@ class ClassViewTest(BaseTestCase):
         self.assertEqual(Class.objects.count(), 1)
 
 
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class ClassAsyncViewTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.async_client = AsyncClient()
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.trainer)}"}
+
+    async def test_list_classes_matches_sync_contract(self):
+        response = await self.async_client.get("/api/classes/async/",
+                                               headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]["name"], "Yoga Class")
+        self.assertEqual(set(data[0]), set(ClassSerializer.Meta.fields))
+
+    async def test_list_classes_search_and_filter(self):
+        response = await self.async_client.get("/api/classes/async/?search=pilates",
+                                               headers=self.headers)
+        self.assertEqual(response.json(), [])
+        response = await self.async_client.get(
+            f"/api/classes/async/?trainer={self.trainer.id}&search=yoga", headers=self.headers)
+        self.assertEqual(len(response.json()), 1)
+
+    async def test_retrieve_class_detail(self):
+        response = await self.async_client.get(
+            f"/api/classes/async/{self.class_instance.id}/", headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["id"], self.class_instance.id)
+        response = await self.async_client.get("/api/classes/async/0/",
+                                               headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_list_classes_unauthenticated(self):
+        response = await AsyncClient().get("/api/classes/async/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+from django.core.cache import cache
+from bookings.models import Booking
+from classes import timetable
+
+
+class TimetableTest(BaseTestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.day = timetable.class_day(self.class_instance.date_time)
+
+    def get_day(self, response):
+        return next(day for day in response.data["days"] if day["date"] == self.day)
+
+    def test_timetable_lists_classes_with_free_seats(self):
+        response = self.client.get(f"/api/classes/timetable/?week={self.day}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["days"]), 7)
+        entry = self.get_day(response)["classes"][0]
+        self.assertEqual(entry["name"], "Yoga Class")
+        self.assertEqual(entry["trainer_name"], "trainer")
+        self.assertEqual(entry["free_seats"], 10)
+
+    def test_warm_timetable_read_skips_database(self):
+        self.client.get(f"/api/classes/timetable/?week={self.day}")
+        with self.assertNumQueries(0):
+            response = self.client.get(f"/api/classes/timetable/?week={self.day}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_booking_refreshes_snapshot(self):
+        self.client.get(f"/api/classes/timetable/?week={self.day}")
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(user=self.other_user,
+                                   sports_class=self.class_instance,
+                                   status=Booking.STATUS_CONFIRMED)
+        response = self.client.get(f"/api/classes/timetable/?week={self.day}")
+        self.assertEqual(self.get_day(response)["classes"][0]["free_seats"], 9)
+
+    def test_moved_class_leaves_previous_day(self):
+        self.client.get(f"/api/classes/timetable/?week={self.day}")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_instance.date_time += timedelta(days=1)
+            self.class_instance.save()
+        response = self.client.get(f"/api/classes/timetable/?week={self.day}")
+        self.assertEqual(self.get_day(response)["classes"], [])
+        next_day = response.data["days"][1]
+        self.assertEqual(next_day["classes"][0]["id"], self.class_instance.id)
+
+    def test_build_racing_a_write_is_not_served(self):
+        version = cache.get(timetable.VERSION_KEY % self.day.isoformat())
+        stale = timetable.snapshot_queryset().first()
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(user=self.other_user, sports_class=self.class_instance,
+                                   status=Booking.STATUS_CONFIRMED)
+        # A reader that queried before the booking stores its rows afterwards.
+        cache.set(timetable.CACHE_KEY % self.day.isoformat(), (version, [timetable.to_row(stale)]))
+        response = self.client.get(f"/api/classes/timetable/?week={self.day}")
+        self.assertEqual(self.get_day(response)["classes"][0]["free_seats"], 9)
+
+    def test_saving_a_loaded_class_skips_lookup(self):
+        sports_class = Class.objects.get(pk=self.class_instance.pk)
+        sports_class.name = "Evening Yoga"
+        with self.assertNumQueries(1):
+            sports_class.save(update_fields=["name"])
+
+    def test_invalid_week(self):
+        response = self.client.get("/api/classes/timetable/?week=soon")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+from unittest.mock import patch
+
+
+class TrainerOverlapTest(BaseTestCase):
+    def class_data(self, name, start, duration=60):
+        return {"name": name, "description": "Class", "date_time": start,
+                "duration": duration, "max_participants": 10}
+
+    def test_create_overlapping_class_rejected(self):
+        data = self.class_data("Pilates Class",
+                               self.class_instance.date_time + timedelta(minutes=30))
+        response = self.client.post("/api/classes/", data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("This trainer already has a class at this time.",
+                      response.data["non_field_errors"])
+
+    def test_update_into_overlap_rejected(self):
+        other = Class.objects.create(name="Pilates Class", description="",
+                                     date_time=self.class_instance.date_time + timedelta(hours=2),
+                                     duration=60, max_participants=10,
+                                     trainer=self.trainer)
+        data = self.class_data("Pilates Class",
+                               self.class_instance.date_time + timedelta(minutes=15))
+        response = self.client.put(f"/api/classes/{other.id}/", data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_constraint_violation_maps_to_400(self):
+        data = self.class_data("Pilates Class", self.class_instance.date_time)
+        with patch.object(ClassSerializer, "validate", lambda self, attrs: attrs):
+            response = self.client.post("/api/classes/", data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("This trainer already has a class at this time.",
+                      response.data["non_field_errors"])
+
+    def test_bulk_create_validates_in_one_query(self):
+        start = self.class_instance.date_time + timedelta(hours=2)
+        data = [self.class_data(f"Class {i}", start + timedelta(hours=i)) for i in range(5)]
+        with self.assertNumQueries(5):
+            # overlap lookup, series lookup, savepoint, bulk insert, savepoint release
+            response = self.client.post("/api/classes/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(Class.objects.filter(trainer=self.trainer).count(), 6)
+        self.assertIsNotNone(Class.objects.get(name="Class 0").time_span)
+
+    def test_bulk_create_rejects_overlaps(self):
+        start = self.class_instance.date_time + timedelta(hours=2)
+        data = [self.class_data("A", start), self.class_data("B", start + timedelta(minutes=30))]
+        response = self.client.post("/api/classes/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        data = [self.class_data("A", start),
+                self.class_data("B", self.class_instance.date_time + timedelta(minutes=59))]
+        response = self.client.post("/api/classes/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Class.objects.count(), 1)
+
+    def test_time_span_follows_queryset_update(self):
+        start = self.class_instance.date_time + timedelta(hours=3)
+        Class.objects.filter(pk=self.class_instance.pk).update(date_time=start, duration=45)
+        self.class_instance.refresh_from_db()
+        self.assertEqual(self.class_instance.time_span, Class.span_for(start, 45))
+
+        Class.objects.filter(pk=self.class_instance.pk).update(canceled_at=timezone.now())
+        self.class_instance.refresh_from_db()
+        self.assertIsNone(self.class_instance.time_span)
+
+        Class.objects.filter(pk=self.class_instance.pk).update(canceled_at=None)
+        self.class_instance.refresh_from_db()
+        self.assertEqual(self.class_instance.time_span, Class.span_for(start, 45))
+
+
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+import psycopg
+from django.db import connection as db_connection
+from django.test import override_settings
+from classes import seat_feed
+
+
+@override_settings(SEAT_FEED_BROKER="classes.seat_feed.InProcessBroker")
+class SeatFeedTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.trainer)}"}
+
+    def book(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(user=self.trainer, sports_class=self.class_instance, status="confirmed")
+
+    async def test_broker_keeps_latest_message(self):
+        broker = seat_feed.InProcessBroker()
+        queue = broker.subscribe(1)
+        broker.publish(1, {"free_seats": 3})
+        broker.publish(1, {"free_seats": 2})
+        broker.publish(2, {"free_seats": 9})
+        self.assertEqual(await asyncio.wait_for(queue.get(), 1), {"free_seats": 2})
+        self.assertTrue(queue.empty())
+        broker.unsubscribe(1, queue)
+        self.assertFalse(broker.has_subscribers(1))
+
+    async def test_booking_change_is_published(self):
+        queue = seat_feed.get_broker().subscribe(self.class_instance.id)
+        try:
+            await sync_to_async(self.book)()
+            message = await asyncio.wait_for(queue.get(), 1)
+        finally:
+            seat_feed.get_broker().unsubscribe(self.class_instance.id, queue)
+        self.assertEqual(message, {"class_id": self.class_instance.id, "free_seats": 9})
+
+    async def test_stream_sends_current_seats_first(self):
+        response = await AsyncClient().get(
+            f"/api/classes/{self.class_instance.id}/seats/stream/", headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = response.streaming_content
+        first = (await anext(events)).decode()
+        await events.aclose()
+        self.assertTrue(first.startswith("event: seats\n"))
+        data = json.loads(first.split("data: ")[1])
+        self.assertEqual(data, {"class_id": self.class_instance.id, "free_seats": 10})
+
+    async def test_stream_missing_class(self):
+        response = await AsyncClient().get("/api/classes/0/seats/stream/", headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_stream_ends_when_class_is_deleted(self):
+        response = await AsyncClient().get(
+            f"/api/classes/{self.class_instance.id}/seats/stream/", headers=self.headers)
+        events = response.streaming_content
+        await anext(events)
+
+        def delete():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.class_instance.delete()
+        await sync_to_async(delete)()
+        with self.assertRaises(StopAsyncIteration):
+            await asyncio.wait_for(anext(events), 1)
+
+    def test_stream_is_not_served_over_wsgi(self):
+        response = self.client.get(f"/api/classes/{self.class_instance.id}/seats/stream/", headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+
+class PostgresBrokerTest(BaseTestCase):
+    def test_publish_notifies(self):
+        with CaptureQueriesContext(db_connection) as queries:
+            seat_feed.PostgresBroker().publish(1, {"free_seats": 3})
+        self.assertIn("pg_notify", queries.captured_queries[0]["sql"])
+
+    def test_unwatched_classes_are_not_published(self):
+        self.assertFalse(seat_feed.PostgresBroker().has_subscribers(self.class_instance.id))
+        with CaptureQueriesContext(db_connection) as queries:
+            seat_feed.publish_seats([self.class_instance.id])
+        self.assertEqual(queries.captured_queries, [])
+
+    async def test_relays_notifications_from_other_processes(self):
+        broker = seat_feed.PostgresBroker()
+        queue = broker.subscribe(7)
+        self.assertTrue(broker.has_subscribers(7))
+        payload = json.dumps({"class_id": 7, "message": {"free_seats": 4}})
+
+        def notify():
+            with psycopg.connect(**db_connection.get_connection_params(), autocommit=True) as sender:
+                sender.execute("SELECT pg_notify(%s, %s)", [broker.channel, payload])
+
+        for _ in range(50):
+            # Keep notifying until the listener thread has connected.
+            await sync_to_async(notify)()
+            try:
+                message = await asyncio.wait_for(queue.get(), 0.1)
+                break
+            except asyncio.TimeoutError:
+                continue
+        listener = broker._listener
+        broker.unsubscribe(7, queue)
+        await sync_to_async(listener.join)(5)
+        self.assertFalse(listener.is_alive())
+        self.assertEqual(message, {"free_seats": 4})
+
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class SparseFieldsTest(BaseTestCase):
+    def test_fields_trim_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/classes/?fields=id,name")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{"id": self.class_instance.id, "name": "Yoga Class"}])
+        select = next(query["sql"] for query in queries if "classes_class" in query["sql"])
+        self.assertNotIn("description", select)
+
+    def test_expand_trainer_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/classes/{self.class_instance.id}/?expand=trainer")
+        self.assertEqual(response.data["trainer"]["username"], "trainer")
+        self.assertNotIn("email", response.data["trainer"])
+
+    async def test_async_list_supports_fields_and_expand(self):
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.trainer)}"}
+        response = await AsyncClient().get("/api/classes/async/?fields=id,trainer&expand=trainer",
+                                           headers=headers)
+        self.assertEqual(response.json(), [{
+            "id": self.class_instance.id,
+            "trainer": {"id": self.trainer.id, "username": "trainer", "role": self.trainer.role, "bio": None},
+        }])
+
+    def test_fields_ignored_on_write(self):
+        data = {"name": "Pilates", "description": "Core", "duration": 45, "max_participants": 5,
+                "date_time": self.class_instance.date_time + timedelta(hours=3)}
+        response = self.client.post("/api/classes/?fields=id", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["name"], "Pilates")
+
+
+class ClassSeriesTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        tomorrow = timezone.localtime(timezone.now() + timedelta(days=1))
+        self.series = ClassSeries.objects.create(
+            name="Weekly Spin", description="Spin", trainer=self.trainer, duration=45, max_participants=12,
+            starts_at=tomorrow.replace(hour=18, minute=0, second=0, microsecond=0), interval_days=7,
+        )
+        self.start = timezone.localdate(self.series.starts_at)
+
+    def occurrences(self, start, days=14):
+        return self.client.get(f"/api/classes/occurrences/?start={start.isoformat()}&days={days}")
+
+    def test_listing_merges_classes_and_virtual_occurrences(self):
+        response = self.occurrences(self.start)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        virtual = [item for item in response.data if item["series"] == self.series.id]
+        self.assertEqual([item["occurrence"] for item in virtual], [f"{self.series.id}:0", f"{self.series.id}:1"])
+        self.assertTrue(all(item["id"] is None for item in virtual))
+        self.assertEqual(timezone.localtime(parse_datetime(virtual[1]["date_time"])).hour, 18)
+        self.assertFalse(Class.objects.filter(series=self.series).exists())
+
+    def test_listing_cost_does_not_grow_with_series_length(self):
+        far = self.start + timedelta(days=7 * 520)
+        with self.assertNumQueries(3):
+            response = self.occurrences(far, days=7)
+        self.assertEqual([item["occurrence"] for item in response.data], [f"{self.series.id}:520"])
+
+    def test_ends_on_limits_occurrences(self):
+        self.series.ends_on = self.start + timedelta(days=7)
+        self.series.save()
+        response = self.occurrences(self.start, days=31)
+        self.assertEqual(len([item for item in response.data if item["series"]]), 2)
+        response = self.client.get(f"/api/classes/series/{self.series.id}/occurrences/2/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_trainer_edit_materializes_occurrence_once(self):
+        url = f"/api/classes/series/{self.series.id}/occurrences/1/"
+        response = self.client.patch(url, {"max_participants": 20})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.patch(url, {"name": "Spin Special"})
+        obj = Class.objects.get(series=self.series)
+        self.assertEqual((obj.series_index, obj.max_participants, obj.name), (1, 20, "Spin Special"))
+
+        listed = [item for item in self.occurrences(self.start).data if item["series"] == self.series.id]
+        self.assertEqual([item["id"] for item in listed], [None, obj.id])
+
+        self.client.force_authenticate(user=self.other_user)
+        self.assertEqual(self.client.patch(url, {"name": "Mine"}).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_schedule_is_locked_once_materialized(self):
+        self.series.materialize(0)
+        response = self.client.patch(f"/api/classes/series/{self.series.id}/", {"interval_days": 14})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(f"/api/classes/series/{self.series.id}/", {"name": "Renamed"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_class_must_not_overlap_virtual_occurrences(self):
+        data = {"name": "Boxing", "description": "Boxing", "duration": 60, "max_participants": 8,
+                "date_time": self.series.occurrence_start(3) - timedelta(minutes=30)}
+        response = self.client.post("/api/classes/", data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("This trainer already has a class at this time.", str(response.data))
+        response = self.client.post("/api/classes/", [data], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Once moved away, the materialized occurrence no longer holds the slot.
+        self.client.patch(f"/api/classes/series/{self.series.id}/occurrences/3/",
+                          {"date_time": self.series.occurrence_start(3) + timedelta(hours=2)})
+        response = self.client.post("/api/classes/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_series_must_not_overlap_other_series(self):
+        data = {"name": "Fortnightly Row", "description": "Row", "duration": 30, "max_participants": 6,
+                "starts_at": self.series.occurrence_start(1) + timedelta(days=1, minutes=15), "interval_days": 13}
+        # Every 13 days from the day after an occurrence lands on the weekly slot; every 14 never does.
+        response = self.client.post("/api/classes/series/", data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post("/api/classes/series/", {**data, "interval_days": 14})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_series_must_not_overlap_existing_classes(self):
+        Class.objects.create(name="Boxing", description="Boxing", duration=60, max_participants=8,
+                             trainer=self.trainer, date_time=self.series.occurrence_start(2) + timedelta(minutes=50))
+        data = {"name": "Weekly Row", "description": "Row", "starts_at": self.series.starts_at + timedelta(minutes=30),
+                "duration": 30, "max_participants": 6, "interval_days": 7}
+        response = self.client.post("/api/classes/series/", data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("This trainer already has a class at this time.", str(response.data))
+
+        response = self.client.patch(f"/api/classes/series/{self.series.id}/", {"duration": 50})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(f"/api/classes/series/{self.series.id}/", {"duration": 60})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(f"/api/classes/series/{self.series.id}/",
+                                     {"ends_on": self.start + timedelta(days=7), "duration": 60})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+from django.core import mail
+from django.test import override_settings
+from bookings.models import Notification
+from bookings.notifications import send_class_notices
+
+
+class ClassCancellationTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.members = [User.objects.create_user(username=f"member{i}", email=f"member{i}@example.com",
+                                                 password="password") for i in range(12)]
+        Booking.objects.bulk_create(
+            [Booking(user=user, sports_class=self.class_instance, venue_id=self.class_instance.venue_id,
+                     status=Booking.STATUS_CONFIRMED) for user in self.members[:10]]
+            + [Booking(user=user, sports_class=self.class_instance, venue_id=self.class_instance.venue_id,
+                       status=Booking.STATUS_CANCELED) for user in self.members[10:]]
+        )
+        self.url = f"/api/classes/{self.class_instance.id}/cancel/"
+
+    def cancel(self):
+        with patch("classes.views.send_class_cancellation.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url)
+        return response, delay
+
+    @override_settings(NOTIFICATION_DIGEST_BATCH=4)
+    def test_cancel_notifies_active_bookings_in_one_job(self):
+        with CaptureQueriesContext(connection) as queries:
+            response, delay = self.cancel()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["bookings_canceled"], 10)
+        self.assertEqual(len([q for q in queries.captured_queries if "UPDATE" in q["sql"]]), 2)
+        delay.assert_called_once_with(self.class_instance.id)
+
+        self.class_instance.refresh_from_db()
+        self.assertIsNotNone(self.class_instance.canceled_at)
+        self.assertIsNone(self.class_instance.time_span)
+        self.assertFalse(self.class_instance.bookings.exclude(status=Booking.STATUS_CANCELED).exists())
+        self.assertEqual(set(Notification.objects.values_list("user_id", flat=True)),
+                         {user.id for user in self.members[:10]})
+
+        with patch("bookings.notifications.get_connection", wraps=mail.get_connection) as get_connection:
+            self.assertEqual(send_class_notices(self.class_instance.id), 10)
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertIn("Class Canceled", mail.outbox[0].subject)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_cancel_rules(self):
+        self.client.force_authenticate(user=self.other_user)
+        self.assertEqual(self.cancel()[0].status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.trainer)
+        self.assertEqual(self.cancel()[0].status_code, status.HTTP_200_OK)
+        response, delay = self.cancel()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        delay.assert_not_called()
+
+        started = Class.objects.create(name="Spin", description="Spin", duration=60, max_participants=10,
+                                       date_time=timezone.now() - timedelta(minutes=5), trainer=self.trainer)
+        response = self.client.post(f"/api/classes/{started.id}/cancel/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_canceled_class_frees_slot_and_rejects_bookings(self):
+        self.cancel()
+        response = self.client.post("/api/classes/", {
+            "name": "Replacement", "description": "Same slot", "date_time": self.class_instance.date_time,
+            "duration": 60, "max_participants": 10,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.post("/api/bookings/", {"sports_class": self.class_instance.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("This class has been canceled.", str(response.data))
+
+    def test_delete_requires_cancel_first(self):
+        url = f"/api/classes/{self.class_instance.id}/"
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_409_CONFLICT)
+        self.cancel()
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_409_CONFLICT)
+        send_class_notices(self.class_instance.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len([q for q in queries.captured_queries if "DELETE" in q["sql"]]), 1)
+        self.assertFalse(Class.objects.filter(pk=self.class_instance.id).exists())
+        self.assertFalse(Booking.objects.filter(sports_class_id=self.class_instance.id).exists())
+
+    def test_broker_outage_sends_notices_in_process(self):
+        from kombu.exceptions import OperationalError
+        with patch("bookings.tasks.send_class_cancellation.delay", side_effect=OperationalError("refused")), \
+                self.assertLogs("sports_booking.celery", "ERROR"), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertEqual(self.client.delete(f"/api/classes/{self.class_instance.id}/").status_code,
+                         status.HTTP_204_NO_CONTENT)
+
+    def test_failed_notice_is_requeued_once(self):
+        self.cancel()
+        with patch("bookings.notifications.send", side_effect=[None, OSError("down")] + [None] * 8), \
+                self.assertLogs("bookings.notifications", "ERROR"):
+            self.assertEqual(send_class_notices(self.class_instance.id), 9)
+        self.assertEqual(Notification.objects.count(), 1)
+
+
+from classes.models import DEFAULT_VENUE_ID, Venue
+
+
+class VenueTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.venue = Venue.objects.create(name="Riverside", slug="riverside")
+        self.start = self.class_instance.date_time + timedelta(hours=2)
+
+    def class_data(self, name, date_time, **extra):
+        return {"name": name, "description": name, "date_time": date_time, "duration": 60,
+                "max_participants": 10, **extra}
+
+    def test_venue_list_and_staff_only_create(self):
+        response = self.client.get("/api/venues/")
+        self.assertEqual([venue["slug"] for venue in response.data], ["main", "riverside"])
+        response = self.client.post("/api/venues/", {"name": "Harbour", "slug": "harbour"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.trainer.is_staff = True
+        self.trainer.save()
+        response = self.client.post("/api/venues/", {"name": "Harbour", "slug": "harbour"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_classes_default_to_the_main_venue(self):
+        self.assertEqual(self.class_instance.venue_id, DEFAULT_VENUE_ID)
+        response = self.client.post("/api/classes/", self.class_data("Spin", self.start, venue=self.venue.id))
+        self.assertEqual(response.data["venue"], self.venue.id)
+
+        response = self.client.patch(f"/api/classes/{response.data['id']}/", {"venue": DEFAULT_VENUE_ID})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_venue_scoped_routes_and_filters(self):
+        response = self.client.post("/api/venues/riverside/classes/",
+                                    [self.class_data("Spin", self.start), self.class_data("Swim", self.start
+                                                                                          + timedelta(hours=2))],
+                                    format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual({item["venue"] for item in response.data}, {self.venue.id})
+
+        response = self.client.get("/api/venues/riverside/classes/")
+        self.assertEqual([item["name"] for item in response.data], ["Spin", "Swim"])
+        response = self.client.get(f"/api/classes/?venue={DEFAULT_VENUE_ID}")
+        self.assertEqual([item["name"] for item in response.data], ["Yoga Class"])
+        self.assertEqual(self.client.get("/api/venues/nowhere/classes/").status_code, status.HTTP_404_NOT_FOUND)
+
+        start = timezone.localdate(self.class_instance.date_time)
+        response = self.client.get(f"/api/classes/occurrences/?start={start.isoformat()}&venue={self.venue.id}")
+        self.assertEqual([(item["name"], item["venue"]) for item in response.data],
+                         [("Spin", self.venue.id), ("Swim", self.venue.id)])
+
+    def test_series_occurrences_keep_the_venue(self):
+        series = ClassSeries.objects.create(
+            name="Weekly Spin", description="Spin", trainer=self.trainer, duration=45, max_participants=12,
+            starts_at=self.start + timedelta(days=1), venue=self.venue,
+        )
+        self.assertEqual(series.occurrence(0).venue_id, self.venue.id)
+        self.assertEqual(series.materialize(0).venue, self.venue)
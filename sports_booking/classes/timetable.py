@@ -0,0 +1,92 @@
+import uuid
+from datetime import datetime, time, timedelta
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework.fields import DateTimeField
+from .models import Class
+
+CACHE_KEY = 'timetable:%s'
+# Every write to a day stores a new version; a cached day is only served while
+# it was built under the current one. A changed class is not patched into the
+# cached day: the next read rebuilds the whole day with one query. The versions
+# are only shared between workers through a shared cache (REDIS_CACHE_URL).
+VERSION_KEY = 'timetable:%s:version'
+CACHE_TIMEOUT = 7 * 24 * 3600
+
+# Snapshot rows are positional tuples to keep cached days small.
+FIELDS = ('id', 'name', 'date_time', 'duration', 'trainer', 'trainer_name', 'free_seats')
+
+_date_time_field = DateTimeField()
+
+
+def class_day(date_time):
+    return timezone.localtime(date_time).date()
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def snapshot_queryset():
+    return Class.objects.filter(canceled_at__isnull=True).select_related('trainer').annotate(
+        confirmed_count=Count('bookings', filter=Q(bookings__status='confirmed'))
+    ).order_by('date_time', 'id')
+
+
+def free_seats(obj):
+    """ Seats left on a class from snapshot_queryset() """
+    return max(obj.max_participants - obj.confirmed_count, 0)
+
+
+def to_row(obj):
+    return (
+        obj.id,
+        obj.name,
+        _date_time_field.to_representation(obj.date_time),
+        obj.duration,
+        obj.trainer_id,
+        obj.trainer.username,
+        free_seats(obj),
+    )
+
+
+def build_day(day, version=None):
+    """
+    Build and cache the snapshot of every class starting on the given day,
+    tagged with the day's version as read before the query
+    """
+    start, end = day_bounds(day)
+    rows = [to_row(obj) for obj in snapshot_queryset().filter(date_time__gte=start, date_time__lt=end)]
+    cache.set(CACHE_KEY % day.isoformat(), (version, rows), CACHE_TIMEOUT)
+    return rows
+
+
+def get_days(start, days=7):
+    """ Return {day: rows} for consecutive days, building only the missing or outdated ones """
+    wanted = [start + timedelta(days=offset) for offset in range(days)]
+    keys = {day: (CACHE_KEY % day.isoformat(), VERSION_KEY % day.isoformat()) for day in wanted}
+    cached = cache.get_many([key for pair in keys.values() for key in pair])
+    snapshot = {}
+    for day, (key, version_key) in keys.items():
+        version, entry = cached.get(version_key), cached.get(key)
+        snapshot[day] = entry[1] if entry and entry[0] == version else build_day(day, version)
+    return snapshot
+
+
+def invalidate_days(days):
+    """
+    Mark cached days outdated so the next read rebuilds them. A new version is
+    one plain write, so concurrent writers can't lose each other's changes,
+    and a build that queried before it can't be served afterwards.
+    """
+    cache.set_many({VERSION_KEY % day.isoformat(): uuid.uuid4().hex for day in days}, CACHE_TIMEOUT)
+
+
+def refresh_class(class_id, previous_day=None):
+    """ Outdate the cached day(s) holding a single class after it changed """
+    date_time = Class.objects.filter(pk=class_id).values_list('date_time', flat=True).first()
+    days = {previous_day, class_day(date_time) if date_time else None} - {None}
+    if days:
+        invalidate_days(days)
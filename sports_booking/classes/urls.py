@@ -1,7 +1,19 @@
 from django.urls import path
-from .views import ClassListCreateView, ClassDetailView
+from .views import (
+    ClassListCreateView, ClassDetailView, ClassCancelView, TimetableView, class_list_async, class_detail_async,
+    class_seat_feed, ClassSeriesListCreateView, ClassSeriesDetailView, SeriesOccurrenceView, OccurrenceListView
+)
 
 urlpatterns = [
     path('', ClassListCreateView.as_view(), name='class-list-create'),
     path('<int:pk>/', ClassDetailView.as_view(), name='class-detail'),
+    path('<int:pk>/cancel/', ClassCancelView.as_view(), name='class-cancel'),
+    path('timetable/', TimetableView.as_view(), name='class-timetable'),
+    path('occurrences/', OccurrenceListView.as_view(), name='class-occurrences'),
+    path('series/', ClassSeriesListCreateView.as_view(), name='class-series-list-create'),
+    path('series/<int:pk>/', ClassSeriesDetailView.as_view(), name='class-series-detail'),
+    path('series/<int:pk>/occurrences/<int:index>/', SeriesOccurrenceView.as_view(), name='class-series-occurrence'),
+    path('<int:pk>/seats/stream/', class_seat_feed, name='class-seat-feed'),
+    path('async/', class_list_async, name='class-list-async'),
+    path('async/<int:pk>/', class_detail_async, name='class-detail-async'),
 ]
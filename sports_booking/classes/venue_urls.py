@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import VenueListCreateView, VenueClassListCreateView
+
+urlpatterns = [
+    path('', VenueListCreateView.as_view(), name='venue-list-create'),
+    path('<slug:venue>/classes/', VenueClassListCreateView.as_view(), name='venue-class-list-create'),
+]
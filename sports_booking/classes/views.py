@@ -1,22 +1,57 @@
-from rest_framework import generics, permissions, filters
+import asyncio
+from datetime import date, timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.views.decorators.http import require_GET
+from rest_framework import generics, permissions, filters, status
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
-from .models import Class
-from .serializers import ClassSerializer
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.views import APIView
+from bookings.models import Booking, Notification
+from bookings.signals import bookings_changed
+from bookings.tasks import send_class_cancellation
+from .constraints import trainer_overlap_as_validation_error
+from .models import Class, ClassSeries, Venue
+from .occurrences import occurrences_between
+from .serializers import (
+    ClassSerializer, ClassSeriesSerializer, OccurrenceSerializer, OccurrenceWindowSerializer, VenueSerializer
+)
+from . import seat_feed, timetable
+from django_filters.filterset import filterset_factory
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from sports_booking.celery import enqueue
+from sports_booking.async_views import async_authenticated, json_response
+from sports_booking.sparse_fields import SparseFieldsViewMixin, requested_fields
+from sports_booking.throttling import WriteScopeMixin
 
 
-class ClassListCreateView(generics.ListCreateAPIView):
+class ClassListCreateView(WriteScopeMixin, SparseFieldsViewMixin, generics.ListCreateAPIView):
     queryset = Class.objects.all()
     serializer_class = ClassSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['trainer', 'date_time']
+    filterset_fields = ['trainer', 'venue', 'date_time']
     search_fields = ['name', 'description']
     permission_classes = [IsAuthenticated]
 
+    def get_serializer(self, *args, **kwargs):
+        # A list body creates a batch of classes in one request.
+        if isinstance(kwargs.get('data'), list):
+            kwargs['many'] = True
+        return super().get_serializer(*args, **kwargs)
 
-class ClassDetailView(generics.RetrieveUpdateDestroyAPIView):
+    def perform_create(self, serializer):
+        with trainer_overlap_as_validation_error():
+            serializer.save(trainer=self.request.user)
+
+
+class ClassDetailView(WriteScopeMixin, SparseFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Class.objects.all()
     serializer_class = ClassSerializer
     permission_classes = [IsAuthenticated]
@@ -26,3 +61,273 @@ class ClassDetailView(generics.RetrieveUpdateDestroyAPIView):
         if self.request.method in ['PUT', 'DELETE'] and obj.trainer != self.request.user:
             raise PermissionDenied("You do not have permission to modify this class.")
         return obj
+
+    def perform_update(self, serializer):
+        with trainer_overlap_as_validation_error():
+            serializer.save()
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Delete the class with its bookings and queued notifications in one
+        statement, without loading them. Attendees of an upcoming class are
+        told through the cancel endpoint first; the class row stays locked from
+        that check to the delete, so a booking can't slip in between.
+        """
+        sports_class = self.get_object()
+        with transaction.atomic(), connection.cursor() as cursor:
+            sports_class = generics.get_object_or_404(Class.objects.select_for_update(), pk=sports_class.pk)
+            if sports_class.date_time > timezone.now() and (
+                sports_class.bookings.filter(status__in=[Booking.STATUS_PENDING, Booking.STATUS_CONFIRMED]).exists()
+                or Notification.objects.filter(sports_class=sports_class).exists()
+            ):
+                return Response({"detail": "This class still has bookings or unsent notices; cancel it first."},
+                                status=status.HTTP_409_CONFLICT)
+            cursor.execute(
+                f'WITH notifications AS (DELETE FROM {Notification._meta.db_table} WHERE sports_class_id = %s), '
+                f'bookings AS (DELETE FROM {Booking._meta.db_table} WHERE sports_class_id = %s) '
+                f'DELETE FROM {Class._meta.db_table} WHERE id = %s',
+                [sports_class.pk] * 3,
+            )
+            # The raw delete skips the post_delete signals that update the timetable.
+            day = timetable.class_day(sports_class.date_time)
+            transaction.on_commit(lambda: timetable.refresh_class(sports_class.pk, day))
+            transaction.on_commit(lambda: seat_feed.publish_seats([sports_class.pk]))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ClassCancelView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'booking_write'
+
+    def post(self, request, pk):
+        """
+        Cancel an upcoming class: mark it canceled, cancel its active bookings
+        and queue a notice for each of their users in one statement, and hand
+        the notices to one background job once committed.
+        """
+        sports_class = generics.get_object_or_404(Class, pk=pk)
+        if sports_class.trainer_id != request.user.pk:
+            raise PermissionDenied("Only the trainer of this class can cancel it.")
+        if sports_class.date_time <= timezone.now():
+            raise ValidationError("A class that has started can't be canceled.")
+
+        now = timezone.now()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {Class._meta.db_table} SET canceled_at = %s, time_span = NULL '
+                'WHERE id = %s AND canceled_at IS NULL',
+                [now, sports_class.pk],
+            )
+            if cursor.rowcount == 0:
+                raise ValidationError("This class is already canceled.")
+            cursor.execute(
+                f'WITH canceled AS (UPDATE {Booking._meta.db_table} SET status = %s '
+                'WHERE sports_class_id = %s AND status IN (%s, %s) RETURNING user_id), '
+                f'queued AS (INSERT INTO {Notification._meta.db_table} (user_id, sports_class_id, kind, created_at) '
+                'SELECT user_id, %s, %s, %s FROM canceled) '
+                'SELECT count(*) FROM canceled',
+                [Booking.STATUS_CANCELED, sports_class.pk, Booking.STATUS_PENDING, Booking.STATUS_CONFIRMED,
+                 sports_class.pk, Notification.KIND_CLASS_CANCELED, now],
+            )
+            canceled = cursor.fetchone()[0]
+            bookings_changed.send(sender=Booking, class_ids=[sports_class.pk])
+            day = timetable.class_day(sports_class.date_time)
+            transaction.on_commit(lambda: timetable.refresh_class(sports_class.pk, day))
+            if canceled:
+                transaction.on_commit(lambda: enqueue(send_class_cancellation, sports_class.pk))
+        return Response({"canceled_at": now, "bookings_canceled": canceled}, status=status.HTTP_200_OK)
+
+
+class VenueListCreateView(WriteScopeMixin, generics.ListCreateAPIView):
+    queryset = Venue.objects.order_by('name')
+    serializer_class = VenueSerializer
+
+    def get_permissions(self):
+        return [IsAdminUser()] if self.request.method == 'POST' else [IsAuthenticated()]
+
+
+class VenueScopedMixin:
+    """ Limits a list view to the venue named by the `venue` slug in its URL """
+
+    @cached_property
+    def venue(self):
+        return generics.get_object_or_404(Venue, slug=self.kwargs['venue'])
+
+    def get_queryset(self):
+        return super().get_queryset().filter(venue=self.venue)
+
+
+class VenueClassListCreateView(VenueScopedMixin, ClassListCreateView):
+    def perform_create(self, serializer):
+        with trainer_overlap_as_validation_error():
+            serializer.save(trainer=self.request.user, venue=self.venue)
+
+
+class TimetableView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'read'
+
+    def get(self, request):
+        """ Serve the precomputed week grid starting at ?week= (defaults to this Monday) """
+        week = request.query_params.get('week')
+        if week:
+            try:
+                start = date.fromisoformat(week)
+            except ValueError:
+                raise ValidationError({"week": "Use the YYYY-MM-DD format."})
+        else:
+            today = timezone.localdate()
+            start = today - timedelta(days=today.weekday())
+
+        days = timetable.get_days(start)
+        return Response({
+            "start": start,
+            "days": [
+                {"date": day, "classes": [dict(zip(timetable.FIELDS, row)) for row in rows]}
+                for day, rows in days.items()
+            ],
+        })
+
+
+class ClassSeriesListCreateView(WriteScopeMixin, generics.ListCreateAPIView):
+    queryset = ClassSeries.objects.all()
+    serializer_class = ClassSeriesSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['trainer']
+    permission_classes = [IsAuthenticated]
+
+    def perform_create(self, serializer):
+        serializer.save(trainer=self.request.user)
+
+
+class ClassSeriesDetailView(WriteScopeMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = ClassSeries.objects.all()
+    serializer_class = ClassSeriesSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        obj = super().get_object()
+        if self.request.method in ['PUT', 'PATCH', 'DELETE'] and obj.trainer != self.request.user:
+            raise PermissionDenied("You do not have permission to modify this class series.")
+        return obj
+
+
+class SeriesOccurrenceView(WriteScopeMixin, APIView):
+    """ One occurrence of a series; editing it turns it into a real class """
+    permission_classes = [IsAuthenticated]
+
+    def get_series(self, pk, index):
+        series = generics.get_object_or_404(ClassSeries, pk=pk)
+        if not series.has_occurrence(index):
+            raise NotFound("This series has no such occurrence.")
+        return series
+
+    def get(self, request, pk, index):
+        series = self.get_series(pk, index)
+        obj = series.occurrences.filter(series_index=index).first() or series.occurrence(index)
+        return Response(OccurrenceSerializer(obj, context={'request': request}).data)
+
+    def put(self, request, pk, index):
+        return self.update(request, pk, index, partial=False)
+
+    def patch(self, request, pk, index):
+        return self.update(request, pk, index, partial=True)
+
+    def update(self, request, pk, index, partial):
+        series = self.get_series(pk, index)
+        if series.trainer != request.user:
+            raise PermissionDenied("You do not have permission to modify this class.")
+        with trainer_overlap_as_validation_error():
+            obj = series.materialize(index)
+            serializer = ClassSerializer(obj, data=request.data, partial=partial, context={'request': request})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        return Response(OccurrenceSerializer(obj, context={'request': request}).data)
+
+
+class OccurrenceListView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'read'
+
+    def get(self, request):
+        """ Classes and virtual series occurrences starting in the ?start= / ?days= window """
+        window = OccurrenceWindowSerializer(data=request.query_params)
+        window.is_valid(raise_exception=True)
+        start = window.validated_data.get('start') or timezone.localdate()
+        window_start, _ = timetable.day_bounds(start)
+        window_end, _ = timetable.day_bounds(start + timedelta(days=window.validated_data['days']))
+        items = occurrences_between(window_start, window_end, window.validated_data.get('trainer'),
+                                    window.validated_data.get('venue'))
+        return Response(OccurrenceSerializer(items, many=True, context={'request': request}).data)
+
+
+ClassFilterSet = filterset_factory(Class, fields=ClassListCreateView.filterset_fields)
+
+
+def search_classes(queryset, search):
+    """ Match every search term against name or description, like SearchFilter """
+    for term in search.replace(',', ' ').split():
+        queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+    return queryset
+
+
+@require_GET
+@async_authenticated
+async def class_list_async(request):
+    """ Async counterpart of ClassListCreateView.get for the ASGI app """
+    filterset = ClassFilterSet(request.GET, queryset=Class.objects.all())
+    if not await sync_to_async(filterset.is_valid)():
+        return json_response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+    queryset = search_classes(filterset.qs, request.GET.get('search', ''))
+    queryset = ClassSerializer.sparse_queryset(queryset, *requested_fields(request))
+    classes = [obj async for obj in queryset.aiterator()]
+    return json_response(ClassSerializer(classes, many=True, context={'request': request}).data)
+
+
+@require_GET
+@async_authenticated
+async def class_detail_async(request, pk):
+    """ Async counterpart of ClassDetailView.get for the ASGI app """
+    try:
+        obj = await ClassSerializer.sparse_queryset(Class.objects.all(), *requested_fields(request)).aget(pk=pk)
+    except Class.DoesNotExist:
+        return json_response({'detail': 'No Class matches the given query.'},
+                             status=status.HTTP_404_NOT_FOUND)
+    return json_response(ClassSerializer(obj, context={'request': request}).data)
+
+
+@require_GET
+@async_authenticated
+async def class_seat_feed(request, pk):
+    """
+    Server-sent events with the free seats of a class whenever they change,
+    until the class is deleted. Only served by the ASGI app: a stream would
+    hold a WSGI worker for as long as the client stays connected.
+    """
+    if not isinstance(request, ASGIRequest):
+        return json_response({'detail': 'The seat feed is only served over ASGI.'},
+                             status=status.HTTP_501_NOT_IMPLEMENTED)
+    if not await Class.objects.filter(pk=pk).aexists():
+        return json_response({'detail': 'No Class matches the given query.'},
+                             status=status.HTTP_404_NOT_FOUND)
+
+    async def events():
+        broker = seat_feed.get_broker()
+        queue = broker.subscribe(pk)
+        try:
+            message = (await sync_to_async(seat_feed.seat_messages)([pk])).get(pk)
+            while message is not None:
+                yield seat_feed.format_event(message)
+                while True:
+                    try:
+                        message = await asyncio.wait_for(queue.get(), settings.SEAT_FEED_HEARTBEAT)
+                        break
+                    except asyncio.TimeoutError:
+                        yield ': keep-alive\n\n'
+        finally:
+            broker.unsubscribe(pk, queue)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
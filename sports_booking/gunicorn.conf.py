@@ -0,0 +1,8 @@
+import os
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    """ Drop the metric files of a dead worker from the multiprocess directory """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from reports import triggers
+
+
+def parse_day(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = ("Recompute the occupancy rollups from bookings, for a range of days or for everything. "
+            "Run a full rebuild after changing TIME_ZONE: it also moves the day boundary.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_day, help="First local day YYYY-MM-DD (default: all days)")
+        parser.add_argument('--end', type=parse_day, help="Last local day YYYY-MM-DD, inclusive")
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if (start is None) != (end is None):
+            raise CommandError("Give both --start and --end, or neither for a full rebuild.")
+        if start is not None and end < start:
+            raise CommandError("--end is before --start.")
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Also picks up a changed TIME_ZONE for the day boundaries.
+            triggers.install(cursor)
+            classes, trainer_days = triggers.rebuild(cursor, start, end and end + timedelta(days=1))
+        self.stdout.write(f"Rebuilt {classes} class and {trainer_days} trainer-day rollups")
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('classes', '0007_class_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassOccupancy',
+            fields=[
+                ('capacity', models.IntegerField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+                ('confirmed', models.IntegerField(default=0)),
+                ('canceled', models.IntegerField(default=0)),
+                ('no_show', models.IntegerField(default=0)),
+                ('sports_class', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='occupancy', serialize=False, to='classes.class')),
+                ('date_time', models.DateTimeField()),
+                ('day', models.DateField(help_text='Local day the class starts on')),
+                ('trainer', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'trainer'], name='class_occupancy_day_idx'), models.Index(fields=['trainer', 'day'], name='class_occupancy_trainer_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrainerDayOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('capacity', models.IntegerField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+                ('confirmed', models.IntegerField(default=0)),
+                ('canceled', models.IntegerField(default=0)),
+                ('no_show', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+                ('classes', models.IntegerField(default=0)),
+                ('trainer', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='trainer_day_occupancy_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('trainer', 'day'), name='unique_trainer_day_occupancy')],
+            },
+        ),
+    ]
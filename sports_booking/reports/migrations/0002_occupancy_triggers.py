@@ -0,0 +1,187 @@
+from django.conf import settings
+from django.db import migrations
+
+# The rollup functions and triggers as they were when this migration was written,
+# with table names and statuses spelled out so later model changes can't alter
+# what it installs. reports/triggers.py holds the current copy, which
+# `manage.py rebuild_occupancy` reinstalls.
+
+# Local days follow TIME_ZONE as it is at migrate time. After changing TIME_ZONE,
+# run `manage.py rebuild_occupancy` to reinstall this function and recompute days.
+LOCAL_DAY = """
+CREATE OR REPLACE FUNCTION reports_local_day(ts timestamptz) RETURNS date
+LANGUAGE sql IMMUTABLE AS $$ SELECT (ts AT TIME ZONE {time_zone})::date $$;
+"""
+
+FUNCTIONS = """
+-- Add (sign 1) or take out (sign -1) whole classes from their trainer days.
+CREATE OR REPLACE FUNCTION reports_shift_trainer_days(class_ids bigint[], sign integer) RETURNS void
+LANGUAGE sql AS $$
+    INSERT INTO reports_trainerdayoccupancy AS t (trainer_id, day, classes, capacity, pending, confirmed, canceled, no_show)
+    SELECT trainer_id, day, sign * count(*), sign * sum(capacity), sign * sum(pending),
+           sign * sum(confirmed), sign * sum(canceled), sign * sum(no_show)
+    FROM reports_classoccupancy WHERE sports_class_id = ANY(class_ids)
+    GROUP BY trainer_id, day
+    ON CONFLICT (trainer_id, day) DO UPDATE SET
+        classes = t.classes + EXCLUDED.classes, capacity = t.capacity + EXCLUDED.capacity,
+        pending = t.pending + EXCLUDED.pending, confirmed = t.confirmed + EXCLUDED.confirmed,
+        canceled = t.canceled + EXCLUDED.canceled, no_show = t.no_show + EXCLUDED.no_show;
+    DELETE FROM reports_trainerdayoccupancy t USING reports_classoccupancy o
+    WHERE o.sports_class_id = ANY(class_ids) AND t.trainer_id = o.trainer_id AND t.day = o.day
+      AND t.classes <= 0;
+$$;
+
+-- Apply (class, status, count) booking deltas to the class and trainer day rollups.
+CREATE OR REPLACE FUNCTION reports_apply_booking_deltas(class_ids bigint[], statuses text[], counts bigint[])
+RETURNS void LANGUAGE sql AS $$
+    WITH delta AS (
+        SELECT class_id,
+               coalesce(sum(n) FILTER (WHERE status = 'pending'), 0)::integer AS pending,
+               coalesce(sum(n) FILTER (WHERE status = 'confirmed'), 0)::integer AS confirmed,
+               coalesce(sum(n) FILTER (WHERE status = 'canceled'), 0)::integer AS canceled,
+               coalesce(sum(n) FILTER (WHERE status = 'no_show'), 0)::integer AS no_show
+        FROM unnest(class_ids, statuses, counts) AS d (class_id, status, n)
+        GROUP BY class_id
+    ), touched AS (
+        UPDATE reports_classoccupancy o SET
+            pending = o.pending + d.pending, confirmed = o.confirmed + d.confirmed,
+            canceled = o.canceled + d.canceled, no_show = o.no_show + d.no_show
+        FROM delta d WHERE o.sports_class_id = d.class_id
+        RETURNING o.trainer_id, o.day, d.pending, d.confirmed, d.canceled, d.no_show
+    )
+    UPDATE reports_trainerdayoccupancy t SET
+        pending = t.pending + s.pending, confirmed = t.confirmed + s.confirmed,
+        canceled = t.canceled + s.canceled, no_show = t.no_show + s.no_show
+    FROM (
+        SELECT trainer_id, day, sum(pending) AS pending, sum(confirmed) AS confirmed,
+               sum(canceled) AS canceled, sum(no_show) AS no_show
+        FROM touched GROUP BY trainer_id, day
+    ) s
+    WHERE t.trainer_id = s.trainer_id AND t.day = s.day;
+$$;
+
+CREATE OR REPLACE FUNCTION reports_booking_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    class_ids bigint[];
+    statuses text[];
+    counts bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(sports_class_id), array_agg(status), array_agg(n) INTO class_ids, statuses, counts
+        FROM (SELECT sports_class_id, status, count(*) AS n FROM new_rows GROUP BY 1, 2) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(sports_class_id), array_agg(status), array_agg(n) INTO class_ids, statuses, counts
+        FROM (SELECT sports_class_id, status, -count(*) AS n FROM old_rows GROUP BY 1, 2) d;
+    ELSE
+        SELECT array_agg(sports_class_id), array_agg(status), array_agg(n) INTO class_ids, statuses, counts
+        FROM (
+            SELECT sports_class_id, status, sum(n) AS n FROM (
+                SELECT sports_class_id, status, 1 AS n FROM new_rows
+                UNION ALL
+                SELECT sports_class_id, status, -1 FROM old_rows
+            ) moves GROUP BY 1, 2 HAVING sum(n) <> 0
+        ) d;
+    END IF;
+    IF class_ids IS NOT NULL THEN
+        PERFORM reports_apply_booking_deltas(class_ids, statuses, counts);
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION reports_class_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    class_ids bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO reports_classoccupancy (sports_class_id, trainer_id, date_time, day, capacity,
+                                       pending, confirmed, canceled, no_show)
+        SELECT id, trainer_id, date_time, reports_local_day(date_time), max_participants, 0, 0, 0, 0
+        FROM new_rows;
+        PERFORM reports_shift_trainer_days(ARRAY(SELECT id FROM new_rows), 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        class_ids := ARRAY(SELECT id FROM old_rows);
+        PERFORM reports_shift_trainer_days(class_ids, -1);
+        DELETE FROM reports_classoccupancy WHERE sports_class_id = ANY(class_ids);
+    ELSE
+        -- Only classes that moved to another trainer or day, or changed size.
+        class_ids := ARRAY(
+            SELECT n.id FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.trainer_id, n.date_time, n.max_participants)
+                  IS DISTINCT FROM (o.trainer_id, o.date_time, o.max_participants)
+        );
+        IF cardinality(class_ids) > 0 THEN
+            PERFORM reports_shift_trainer_days(class_ids, -1);
+            UPDATE reports_classoccupancy c SET
+                trainer_id = n.trainer_id, date_time = n.date_time,
+                day = reports_local_day(n.date_time), capacity = n.max_participants
+            FROM new_rows n WHERE c.sports_class_id = n.id AND n.id = ANY(class_ids);
+            PERFORM reports_shift_trainer_days(class_ids, 1);
+        END IF;
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+TRIGGERS = """
+CREATE TRIGGER reports_booking_insert AFTER INSERT ON bookings_booking REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reports_booking_changed();
+CREATE TRIGGER reports_booking_update AFTER UPDATE ON bookings_booking REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reports_booking_changed();
+CREATE TRIGGER reports_booking_delete AFTER DELETE ON bookings_booking REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reports_booking_changed();
+CREATE TRIGGER reports_class_insert AFTER INSERT ON classes_class REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reports_class_changed();
+CREATE TRIGGER reports_class_update AFTER UPDATE ON classes_class REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reports_class_changed();
+CREATE TRIGGER reports_class_delete AFTER DELETE ON classes_class REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reports_class_changed();
+"""
+
+# Backfill from the bookings that already exist.
+BACKFILL = """
+INSERT INTO reports_classoccupancy (sports_class_id, trainer_id, date_time, day, capacity,
+                                    pending, confirmed, canceled, no_show)
+SELECT c.id, c.trainer_id, c.date_time, reports_local_day(c.date_time), c.max_participants,
+       count(b.id) FILTER (WHERE b.status = 'pending'), count(b.id) FILTER (WHERE b.status = 'confirmed'),
+       count(b.id) FILTER (WHERE b.status = 'canceled'), count(b.id) FILTER (WHERE b.status = 'no_show')
+FROM classes_class c
+LEFT JOIN bookings_booking b ON b.sports_class_id = c.id
+GROUP BY c.id;
+
+INSERT INTO reports_trainerdayoccupancy (trainer_id, day, classes, capacity, pending, confirmed, canceled, no_show)
+SELECT trainer_id, day, count(*), sum(capacity), sum(pending), sum(confirmed), sum(canceled), sum(no_show)
+FROM reports_classoccupancy
+GROUP BY trainer_id, day;
+"""
+
+UNINSTALL = """
+DROP TRIGGER IF EXISTS reports_booking_insert ON bookings_booking;
+DROP TRIGGER IF EXISTS reports_booking_update ON bookings_booking;
+DROP TRIGGER IF EXISTS reports_booking_delete ON bookings_booking;
+DROP TRIGGER IF EXISTS reports_class_insert ON classes_class;
+DROP TRIGGER IF EXISTS reports_class_update ON classes_class;
+DROP TRIGGER IF EXISTS reports_class_delete ON classes_class;
+DROP FUNCTION IF EXISTS reports_class_changed();
+DROP FUNCTION IF EXISTS reports_booking_changed();
+DROP FUNCTION IF EXISTS reports_apply_booking_deltas(bigint[], text[], bigint[]);
+DROP FUNCTION IF EXISTS reports_shift_trainer_days(bigint[], integer);
+DROP FUNCTION IF EXISTS reports_local_day(timestamptz);
+"""
+
+
+def install_local_day(apps, schema_editor):
+    time_zone = "'%s'" % settings.TIME_ZONE.replace("'", "''")
+    schema_editor.execute(LOCAL_DAY.format(time_zone=time_zone))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+        ('bookings', '0009_notification'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_local_day, migrations.RunPython.noop),
+        migrations.RunSQL(FUNCTIONS + TRIGGERS + BACKFILL, UNINSTALL),
+    ]
@@ -0,0 +1,51 @@
+from django.db import models
+from classes.models import Class
+from users.models import User
+
+# Rows in these tables are written only by the database triggers in
+# reports/triggers.py and by `manage.py rebuild_occupancy`, never by the ORM.
+
+
+class OccupancyCounts(models.Model):
+    """ Seats offered and bookings per status """
+    COUNT_FIELDS = ('capacity', 'pending', 'confirmed', 'canceled', 'no_show')
+
+    capacity = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    confirmed = models.IntegerField(default=0)
+    canceled = models.IntegerField(default=0)
+    no_show = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ClassOccupancy(OccupancyCounts):
+    """ Booking counts of one class """
+    # No database FKs: the triggers remove a class's row when the class goes.
+    sports_class = models.OneToOneField(Class, on_delete=models.DO_NOTHING, db_constraint=False,
+                                        primary_key=True, related_name='occupancy')
+    trainer = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    date_time = models.DateTimeField()
+    day = models.DateField(help_text="Local day the class starts on")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['day', 'trainer'], name='class_occupancy_day_idx'),
+            models.Index(fields=['trainer', 'day'], name='class_occupancy_trainer_idx'),
+        ]
+
+
+class TrainerDayOccupancy(OccupancyCounts):
+    """ Classes, seats and booking counts of one trainer on one local day """
+    trainer = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    day = models.DateField()
+    classes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trainer', 'day'], name='unique_trainer_day_occupancy'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='trainer_day_occupancy_day_idx'),
+        ]
@@ -0,0 +1,43 @@
+from rest_framework import serializers
+from .models import ClassOccupancy, OccupancyCounts, TrainerDayOccupancy
+
+MAX_REPORT_DAYS = 366
+
+
+class ReportWindowSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    days = serializers.IntegerField(min_value=1, max_value=MAX_REPORT_DAYS, default=7)
+    trainer = serializers.IntegerField(required=False)
+
+
+class UtilizationMixin:
+    """ Adds confirmed bookings per seat offered """
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['utilization'] = round(data['confirmed'] / data['capacity'], 3) if data['capacity'] else None
+        return data
+
+
+class ClassOccupancySerializer(UtilizationMixin, serializers.ModelSerializer):
+    name = serializers.CharField(source='sports_class.name')
+
+    class Meta:
+        model = ClassOccupancy
+        fields = ('sports_class', 'name', 'date_time', 'day', 'trainer', *OccupancyCounts.COUNT_FIELDS)
+
+
+class TrainerDayOccupancySerializer(UtilizationMixin, serializers.ModelSerializer):
+    class Meta:
+        model = TrainerDayOccupancy
+        fields = ('trainer', 'day', 'classes', *OccupancyCounts.COUNT_FIELDS)
+
+
+class OccupancyTotalsSerializer(UtilizationMixin, serializers.Serializer):
+    day = serializers.DateField(required=False)
+    hour = serializers.IntegerField(required=False)
+    classes = serializers.IntegerField()
+    capacity = serializers.IntegerField()
+    pending = serializers.IntegerField()
+    confirmed = serializers.IntegerField()
+    canceled = serializers.IntegerField()
+    no_show = serializers.IntegerField()
@@ -0,0 +1,160 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db.models import Count, Q
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from bookings.models import Booking
+from classes.models import Class
+from classes.timetable import day_bounds
+from users.models import User
+from reports.models import ClassOccupancy, TrainerDayOccupancy
+
+
+class OccupancyTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trainer = User.objects.create_user(username="trainer", email="trainer@example.com",
+                                                password="password", role=User.TRAINER)
+        self.users = [User.objects.create_user(username=f"member{i}", email=f"member{i}@example.com",
+                                               password="password") for i in range(4)]
+        self.day = timezone.localdate() + timedelta(days=3)
+        self.morning = self.add_class("Yoga", hours=9)
+        self.evening = self.add_class("Spin", hours=18)
+
+    def add_class(self, name, hours, day=None, trainer=None):
+        return Class.objects.create(name=name, description=name, duration=60, max_participants=10,
+                                    date_time=day_bounds(day or self.day)[0] + timedelta(hours=hours),
+                                    trainer=trainer or self.trainer)
+
+    def book(self, sports_class, users, booking_status=Booking.STATUS_PENDING):
+        return [Booking.objects.create(user=user, sports_class=sports_class, status=booking_status)
+                for user in users]
+
+    def assertRollupsMatchBookings(self):
+        live = {
+            row["id"]: row for row in Class.objects.annotate(
+                pending=Count("bookings", filter=Q(bookings__status=Booking.STATUS_PENDING)),
+                confirmed=Count("bookings", filter=Q(bookings__status=Booking.STATUS_CONFIRMED)),
+                canceled=Count("bookings", filter=Q(bookings__status=Booking.STATUS_CANCELED)),
+                no_show=Count("bookings", filter=Q(bookings__status=Booking.STATUS_NO_SHOW)),
+            ).values("id", "trainer_id", "max_participants", "pending", "confirmed", "canceled", "no_show")
+        }
+        rollups = {
+            row.pop("sports_class_id"): row for row in ClassOccupancy.objects.values(
+                "sports_class_id", "trainer_id", "capacity", "pending", "confirmed", "canceled", "no_show")
+        }
+        self.assertEqual(rollups, {
+            pk: {"trainer_id": row["trainer_id"], "capacity": row["max_participants"], "pending": row["pending"],
+                 "confirmed": row["confirmed"], "canceled": row["canceled"], "no_show": row["no_show"]}
+            for pk, row in live.items()
+        })
+        days = {}
+        for row in ClassOccupancy.objects.values():
+            totals = days.setdefault((row["trainer_id"], row["day"]), {"classes": 0, "capacity": 0, "pending": 0,
+                                                                      "confirmed": 0, "canceled": 0, "no_show": 0})
+            totals["classes"] += 1
+            for field in ("capacity", "pending", "confirmed", "canceled", "no_show"):
+                totals[field] += row[field]
+        self.assertEqual({(row.pop("trainer_id"), row.pop("day")): row for row in TrainerDayOccupancy.objects.values(
+            "trainer_id", "day", "classes", "capacity", "pending", "confirmed", "canceled", "no_show")}, days)
+
+
+class OccupancyRollupTest(OccupancyTestCase):
+    def test_rollups_follow_booking_transitions(self):
+        bookings = self.book(self.morning, self.users)
+        self.book(self.evening, self.users[:2], Booking.STATUS_CONFIRMED)
+        self.assertRollupsMatchBookings()
+
+        self.client.force_authenticate(user=self.users[0])
+        self.client.delete(f"/api/bookings/{bookings[0].id}/cancel/")
+        self.client.force_authenticate(user=self.trainer)
+        self.client.post("/api/bookings/check-in/", {"class_id": self.morning.id, "status": Booking.STATUS_CONFIRMED,
+                                                     "booking_ids": [b.id for b in bookings[1:3]]}, format="json")
+        Booking.objects.filter(pk=bookings[3].pk).update(sports_class=self.evening)
+        Booking.objects.filter(sports_class=self.evening, user=self.users[0]).delete()
+        self.assertRollupsMatchBookings()
+
+        morning = ClassOccupancy.objects.get(sports_class=self.morning)
+        self.assertEqual((morning.pending, morning.confirmed, morning.canceled), (0, 2, 1))
+        day = TrainerDayOccupancy.objects.get(trainer=self.trainer, day=self.day)
+        self.assertEqual((day.classes, day.capacity, day.confirmed), (2, 20, 3))
+
+    def test_rollups_follow_class_changes(self):
+        self.book(self.morning, self.users[:3], Booking.STATUS_CONFIRMED)
+        self.morning.date_time += timedelta(days=1)
+        self.morning.max_participants = 12
+        self.morning.save()
+        self.assertRollupsMatchBookings()
+        self.assertEqual(TrainerDayOccupancy.objects.get(day=self.day + timedelta(days=1)).confirmed, 3)
+
+        self.evening.delete()
+        self.assertFalse(TrainerDayOccupancy.objects.filter(day=self.day).exists())
+        self.morning.delete()
+        self.assertFalse(ClassOccupancy.objects.exists())
+        self.assertFalse(TrainerDayOccupancy.objects.exists())
+
+    def test_rebuild(self):
+        self.book(self.morning, self.users, Booking.STATUS_CONFIRMED)
+        later = self.add_class("Boxing", hours=9, day=self.day + timedelta(days=7))
+        self.book(later, self.users[:1])
+        ClassOccupancy.objects.update(confirmed=0, pending=0)
+        TrainerDayOccupancy.objects.all().delete()
+
+        call_command("rebuild_occupancy", start=self.day, end=self.day, stdout=StringIO())
+        self.assertEqual(ClassOccupancy.objects.get(sports_class=self.morning).confirmed, 4)
+        self.assertEqual(ClassOccupancy.objects.get(sports_class=later).pending, 0)
+        self.assertFalse(TrainerDayOccupancy.objects.filter(day=later.date_time.date()).exists())
+
+        out = StringIO()
+        call_command("rebuild_occupancy", stdout=out)
+        self.assertIn("Rebuilt 3 class and 2 trainer-day rollups", out.getvalue())
+        self.assertRollupsMatchBookings()
+
+
+class OccupancyReportTest(OccupancyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.book(self.morning, self.users[:3], Booking.STATUS_CONFIRMED)
+        self.book(self.evening, self.users[3:], Booking.STATUS_CANCELED)
+        self.other_trainer = User.objects.create_user(username="other", email="other@example.com",
+                                                      password="password", role=User.TRAINER)
+        self.add_class("Pilates", hours=9, trainer=self.other_trainer)
+        self.staff = User.objects.create_user(username="staff", email="staff@example.com",
+                                              password="password", is_staff=True)
+        self.window = f"start={self.day.isoformat()}&days=1"
+
+    def test_trainer_sees_own_classes(self):
+        self.client.force_authenticate(user=self.trainer)
+        response = self.client.get(f"/api/reports/occupancy/classes/?{self.window}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(row["name"], row["confirmed"], row["canceled"], row["utilization"])
+                          for row in response.data], [("Yoga", 3, 0, 0.3), ("Spin", 0, 1, 0.0)])
+        response = self.client.get(f"/api/reports/occupancy/trainers/?{self.window}&trainer={self.other_trainer.id}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.users[0])
+        response = self.client.get(f"/api/reports/occupancy/daily/?{self.window}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_staff_totals(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(f"/api/reports/occupancy/daily/?{self.window}")
+        self.assertEqual(response.data, [{"day": self.day.isoformat(), "classes": 3, "capacity": 30, "pending": 0,
+                                          "confirmed": 3, "canceled": 1, "no_show": 0, "utilization": 0.1}])
+        response = self.client.get(f"/api/reports/occupancy/hourly/?{self.window}")
+        self.assertEqual([(row["hour"], row["classes"], row["confirmed"]) for row in response.data],
+                         [(9, 2, 3), (18, 1, 0)])
+        response = self.client.get(f"/api/reports/occupancy/trainers/?{self.window}&trainer={self.trainer.id}")
+        self.assertEqual([(row["classes"], row["confirmed"]) for row in response.data], [(2, 3)])
+
+    def test_report_cost_does_not_depend_on_bookings(self):
+        self.client.force_authenticate(user=self.staff)
+        more = [User.objects.create_user(username=f"extra{i}", email=f"extra{i}@example.com", password="password")
+                for i in range(20)]
+        self.book(self.evening, more)
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/reports/occupancy/classes/?{self.window}")
+        self.assertEqual(sum(row["pending"] for row in response.data), 20)
@@ -0,0 +1,219 @@
+from django.conf import settings
+from bookings.models import Booking
+from classes.models import Class
+from classes.timetable import day_bounds
+from .models import ClassOccupancy, TrainerDayOccupancy
+
+# Statement-level triggers with transition tables, so a bulk UPDATE, a COPY or a
+# cascade delete adjusts each rollup row once per statement, not once per booking.
+# Counts only ever move by deltas, which keeps concurrent writers from
+# overwriting each other's changes. Migration 0002 installed a frozen copy of
+# this SQL; a change here also needs a migration, or a rebuild_occupancy run.
+
+TABLES = {
+    'booking': Booking._meta.db_table,
+    'class': Class._meta.db_table,
+    'class_occupancy': ClassOccupancy._meta.db_table,
+    'trainer_day': TrainerDayOccupancy._meta.db_table,
+}
+STATUSES = {
+    'pending': Booking.STATUS_PENDING,
+    'confirmed': Booking.STATUS_CONFIRMED,
+    'canceled': Booking.STATUS_CANCELED,
+    'no_show': Booking.STATUS_NO_SHOW,
+}
+
+FUNCTIONS = """
+CREATE OR REPLACE FUNCTION reports_local_day(ts timestamptz) RETURNS date
+LANGUAGE sql IMMUTABLE AS $$ SELECT (ts AT TIME ZONE {time_zone})::date $$;
+
+-- Add (sign 1) or take out (sign -1) whole classes from their trainer days.
+CREATE OR REPLACE FUNCTION reports_shift_trainer_days(class_ids bigint[], sign integer) RETURNS void
+LANGUAGE sql AS $$
+    INSERT INTO {trainer_day} AS t (trainer_id, day, classes, capacity, pending, confirmed, canceled, no_show)
+    SELECT trainer_id, day, sign * count(*), sign * sum(capacity), sign * sum(pending),
+           sign * sum(confirmed), sign * sum(canceled), sign * sum(no_show)
+    FROM {class_occupancy} WHERE sports_class_id = ANY(class_ids)
+    GROUP BY trainer_id, day
+    ON CONFLICT (trainer_id, day) DO UPDATE SET
+        classes = t.classes + EXCLUDED.classes, capacity = t.capacity + EXCLUDED.capacity,
+        pending = t.pending + EXCLUDED.pending, confirmed = t.confirmed + EXCLUDED.confirmed,
+        canceled = t.canceled + EXCLUDED.canceled, no_show = t.no_show + EXCLUDED.no_show;
+    DELETE FROM {trainer_day} t USING {class_occupancy} o
+    WHERE o.sports_class_id = ANY(class_ids) AND t.trainer_id = o.trainer_id AND t.day = o.day
+      AND t.classes <= 0;
+$$;
+
+-- Apply (class, status, count) booking deltas to the class and trainer day rollups.
+CREATE OR REPLACE FUNCTION reports_apply_booking_deltas(class_ids bigint[], statuses text[], counts bigint[])
+RETURNS void LANGUAGE sql AS $$
+    WITH delta AS (
+        SELECT class_id,
+               coalesce(sum(n) FILTER (WHERE status = '{pending}'), 0)::integer AS pending,
+               coalesce(sum(n) FILTER (WHERE status = '{confirmed}'), 0)::integer AS confirmed,
+               coalesce(sum(n) FILTER (WHERE status = '{canceled}'), 0)::integer AS canceled,
+               coalesce(sum(n) FILTER (WHERE status = '{no_show}'), 0)::integer AS no_show
+        FROM unnest(class_ids, statuses, counts) AS d (class_id, status, n)
+        GROUP BY class_id
+    ), touched AS (
+        UPDATE {class_occupancy} o SET
+            pending = o.pending + d.pending, confirmed = o.confirmed + d.confirmed,
+            canceled = o.canceled + d.canceled, no_show = o.no_show + d.no_show
+        FROM delta d WHERE o.sports_class_id = d.class_id
+        RETURNING o.trainer_id, o.day, d.pending, d.confirmed, d.canceled, d.no_show
+    )
+    UPDATE {trainer_day} t SET
+        pending = t.pending + s.pending, confirmed = t.confirmed + s.confirmed,
+        canceled = t.canceled + s.canceled, no_show = t.no_show + s.no_show
+    FROM (
+        SELECT trainer_id, day, sum(pending) AS pending, sum(confirmed) AS confirmed,
+               sum(canceled) AS canceled, sum(no_show) AS no_show
+        FROM touched GROUP BY trainer_id, day
+    ) s
+    WHERE t.trainer_id = s.trainer_id AND t.day = s.day;
+$$;
+
+CREATE OR REPLACE FUNCTION reports_booking_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    class_ids bigint[];
+    statuses text[];
+    counts bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(sports_class_id), array_agg(status), array_agg(n) INTO class_ids, statuses, counts
+        FROM (SELECT sports_class_id, status, count(*) AS n FROM new_rows GROUP BY 1, 2) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(sports_class_id), array_agg(status), array_agg(n) INTO class_ids, statuses, counts
+        FROM (SELECT sports_class_id, status, -count(*) AS n FROM old_rows GROUP BY 1, 2) d;
+    ELSE
+        SELECT array_agg(sports_class_id), array_agg(status), array_agg(n) INTO class_ids, statuses, counts
+        FROM (
+            SELECT sports_class_id, status, sum(n) AS n FROM (
+                SELECT sports_class_id, status, 1 AS n FROM new_rows
+                UNION ALL
+                SELECT sports_class_id, status, -1 FROM old_rows
+            ) moves GROUP BY 1, 2 HAVING sum(n) <> 0
+        ) d;
+    END IF;
+    IF class_ids IS NOT NULL THEN
+        PERFORM reports_apply_booking_deltas(class_ids, statuses, counts);
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION reports_class_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    class_ids bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO {class_occupancy} (sports_class_id, trainer_id, date_time, day, capacity,
+                                       pending, confirmed, canceled, no_show)
+        SELECT id, trainer_id, date_time, reports_local_day(date_time), max_participants, 0, 0, 0, 0
+        FROM new_rows;
+        PERFORM reports_shift_trainer_days(ARRAY(SELECT id FROM new_rows), 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        class_ids := ARRAY(SELECT id FROM old_rows);
+        PERFORM reports_shift_trainer_days(class_ids, -1);
+        DELETE FROM {class_occupancy} WHERE sports_class_id = ANY(class_ids);
+    ELSE
+        -- Only classes that moved to another trainer or day, or changed size.
+        class_ids := ARRAY(
+            SELECT n.id FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.trainer_id, n.date_time, n.max_participants)
+                  IS DISTINCT FROM (o.trainer_id, o.date_time, o.max_participants)
+        );
+        IF cardinality(class_ids) > 0 THEN
+            PERFORM reports_shift_trainer_days(class_ids, -1);
+            UPDATE {class_occupancy} c SET
+                trainer_id = n.trainer_id, date_time = n.date_time,
+                day = reports_local_day(n.date_time), capacity = n.max_participants
+            FROM new_rows n WHERE c.sports_class_id = n.id AND n.id = ANY(class_ids);
+            PERFORM reports_shift_trainer_days(class_ids, 1);
+        END IF;
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+TRIGGERS = [
+    ('reports_booking_insert', 'INSERT', '{booking}', 'NEW TABLE AS new_rows', 'reports_booking_changed'),
+    ('reports_booking_update', 'UPDATE', '{booking}', 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+     'reports_booking_changed'),
+    ('reports_booking_delete', 'DELETE', '{booking}', 'OLD TABLE AS old_rows', 'reports_booking_changed'),
+    ('reports_class_insert', 'INSERT', '{class}', 'NEW TABLE AS new_rows', 'reports_class_changed'),
+    ('reports_class_update', 'UPDATE', '{class}', 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+     'reports_class_changed'),
+    ('reports_class_delete', 'DELETE', '{class}', 'OLD TABLE AS old_rows', 'reports_class_changed'),
+]
+
+FUNCTION_NAMES = [
+    'reports_class_changed()', 'reports_booking_changed()',
+    'reports_apply_booking_deltas(bigint[], text[], bigint[])', 'reports_shift_trainer_days(bigint[], integer)',
+    'reports_local_day(timestamptz)',
+]
+
+
+def install(cursor):
+    """ Create or replace the rollup functions and triggers; the day boundary follows TIME_ZONE """
+    time_zone = "'%s'" % settings.TIME_ZONE.replace("'", "''")
+    cursor.execute(FUNCTIONS.format(time_zone=time_zone, **TABLES, **STATUSES))
+    for name, event, table, referencing, function in TRIGGERS:
+        table = table.format(**TABLES)
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name} ON {table}')
+        cursor.execute(f'CREATE TRIGGER {name} AFTER {event} ON {table} REFERENCING {referencing} '
+                       f'FOR EACH STATEMENT EXECUTE FUNCTION {function}()')
+
+
+def uninstall(cursor):
+    for name, _, table, _, _ in TRIGGERS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name} ON {table.format(**TABLES)}')
+    for function in FUNCTION_NAMES:
+        cursor.execute(f'DROP FUNCTION IF EXISTS {function}')
+
+
+def set_enabled(cursor, enabled):
+    """ Switch the rollup triggers on or off, around a bulk load that is followed by rebuild() """
+    action = 'ENABLE' if enabled else 'DISABLE'
+    # Deferred foreign key checks still queued on the tables would block ALTER TABLE.
+    cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    for name, _, table, _, _ in TRIGGERS:
+        cursor.execute(f'ALTER TABLE {table.format(**TABLES)} {action} TRIGGER {name}')
+    cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+def rebuild(cursor, start=None, end=None):
+    """
+    Recompute the rollups from bookings, for classes starting on local days in
+    [start, end) or for everything. Class and booking writes wait until the
+    surrounding transaction commits. Returns the number of class and trainer
+    day rows written.
+    """
+    cursor.execute(f'LOCK TABLE {TABLES["class"]}, {TABLES["booking"]} IN SHARE MODE')
+    if start is None:
+        cursor.execute(f'TRUNCATE {TABLES["class_occupancy"]}, {TABLES["trainer_day"]}')
+        days, classes, params, class_params = '', '', [], []
+    else:
+        days, params = 'WHERE day >= %s AND day < %s', [start, end]
+        classes, class_params = 'WHERE c.date_time >= %s AND c.date_time < %s', [day_bounds(start)[0],
+                                                                                day_bounds(end)[0]]
+        cursor.execute(f'DELETE FROM {TABLES["class_occupancy"]} {days}', params)
+        cursor.execute(f'DELETE FROM {TABLES["trainer_day"]} {days}', params)
+    cursor.execute(f"""
+        INSERT INTO {TABLES["class_occupancy"]} (sports_class_id, trainer_id, date_time, day, capacity,
+                                                 pending, confirmed, canceled, no_show)
+        SELECT c.id, c.trainer_id, c.date_time, reports_local_day(c.date_time), c.max_participants,
+               count(b.id) FILTER (WHERE b.status = %s), count(b.id) FILTER (WHERE b.status = %s),
+               count(b.id) FILTER (WHERE b.status = %s), count(b.id) FILTER (WHERE b.status = %s)
+        FROM {TABLES["class"]} c
+        LEFT JOIN {TABLES["booking"]} b ON b.sports_class_id = c.id
+        {classes}
+        GROUP BY c.id
+    """, [*STATUSES.values(), *class_params])
+    classes_written = cursor.rowcount
+    cursor.execute(f"""
+        INSERT INTO {TABLES["trainer_day"]} (trainer_id, day, classes, capacity, pending, confirmed, canceled, no_show)
+        SELECT trainer_id, day, count(*), sum(capacity), sum(pending), sum(confirmed), sum(canceled), sum(no_show)
+        FROM {TABLES["class_occupancy"]} {days}
+        GROUP BY trainer_id, day
+    """, params)
+    return classes_written, cursor.rowcount
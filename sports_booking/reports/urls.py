@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import ClassOccupancyReportView, DailyReportView, HourlyReportView, TrainerDayReportView
+
+urlpatterns = [
+    path('occupancy/classes/', ClassOccupancyReportView.as_view(), name='report-class-occupancy'),
+    path('occupancy/trainers/', TrainerDayReportView.as_view(), name='report-trainer-occupancy'),
+    path('occupancy/daily/', DailyReportView.as_view(), name='report-daily-occupancy'),
+    path('occupancy/hourly/', HourlyReportView.as_view(), name='report-hourly-occupancy'),
+]
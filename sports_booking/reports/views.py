@@ -0,0 +1,79 @@
+from datetime import timedelta
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
+from rest_framework import generics
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import IsAuthenticated
+from .models import ClassOccupancy, OccupancyCounts, TrainerDayOccupancy
+from .serializers import (
+    ClassOccupancySerializer, OccupancyTotalsSerializer, ReportWindowSerializer, TrainerDayOccupancySerializer
+)
+
+COUNT_SUMS = {field: Sum(field) for field in OccupancyCounts.COUNT_FIELDS}
+
+
+class OccupancyReportView(generics.ListAPIView):
+    """
+    Reports over ?start= (default today) and ?days= local days, read from the
+    rollup tables only. Staff may pick any ?trainer=, trainers see their own.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'read'
+    model = None
+
+    def get_queryset(self):
+        window = ReportWindowSerializer(data=self.request.query_params)
+        window.is_valid(raise_exception=True)
+        start = window.validated_data.get('start') or timezone.localdate()
+        end = start + timedelta(days=window.validated_data['days'])
+        queryset = self.model.objects.filter(day__gte=start, day__lt=end)
+        trainer = self.report_trainer(window.validated_data.get('trainer'))
+        return queryset if trainer is None else queryset.filter(trainer_id=trainer)
+
+    def report_trainer(self, requested):
+        user = self.request.user
+        if user.is_staff:
+            return requested
+        if not user.is_trainer() or requested not in (None, user.pk):
+            raise PermissionDenied("Reports are available to staff and to trainers for their own classes.")
+        return user.pk
+
+
+class ClassOccupancyReportView(OccupancyReportView):
+    """ One row per class """
+    model = ClassOccupancy
+    serializer_class = ClassOccupancySerializer
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('sports_class').order_by('date_time', 'sports_class_id')
+
+
+class TrainerDayReportView(OccupancyReportView):
+    """ One row per trainer and day """
+    model = TrainerDayOccupancy
+    serializer_class = TrainerDayOccupancySerializer
+
+    def get_queryset(self):
+        return super().get_queryset().order_by('day', 'trainer_id')
+
+
+class DailyReportView(OccupancyReportView):
+    """ Totals per day """
+    model = TrainerDayOccupancy
+    serializer_class = OccupancyTotalsSerializer
+
+    def get_queryset(self):
+        return super().get_queryset().values('day').annotate(classes=Sum('classes'), **COUNT_SUMS).order_by('day')
+
+
+class HourlyReportView(OccupancyReportView):
+    """ Totals per local hour of day that classes start in """
+    model = ClassOccupancy
+    serializer_class = OccupancyTotalsSerializer
+
+    def get_queryset(self):
+        return (
+            super().get_queryset().annotate(hour=ExtractHour('date_time')).values('hour')
+            .annotate(classes=Count('pk'), **COUNT_SUMS).order_by('hour')
+        )
@@ -0,0 +1,52 @@
+import json
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset):
+    """ The planner's row estimate for a queryset, or None if it isn't available """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            # Unfiltered: the table's statistics, kept up to date by autovacuum. A
+            # partitioned table has none of its own; its partitions' add up.
+            cursor.execute(
+                'SELECT sum(reltuples)::bigint, bool_and(reltuples >= 0) FROM pg_class '
+                "WHERE relkind <> 'p' AND (oid = %s::regclass "
+                'OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass))',
+                [queryset.model._meta.db_table] * 2,
+            )
+            total, analyzed = cursor.fetchone()
+            return total if analyzed else None
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """ Counts exactly up to ADMIN_EXACT_COUNT_LIMIT rows and estimates beyond that """
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for tables too big to count: no full result count,
+    estimated page counts and no "show all" link.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_max_show_all = 0
+    list_per_page = 50
@@ -0,0 +1,71 @@
+import hashlib
+import logging
+from functools import lru_cache
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.shortcuts import render
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+logger = logging.getLogger(__name__)
+
+TITLE = 'Sports Class Booking API'
+
+# drf_yasg is only imported by build_schema(), i.e. by the build_openapi command or
+# the first docs request when no prebuilt spec exists, never at URL loading.
+
+
+def build_schema():
+    """ Introspect every endpoint and return the OpenAPI spec as JSON bytes """
+    from drf_yasg import openapi
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    info = openapi.Info(
+        title=TITLE,
+        default_version='v1',
+        description="API documentation for the Sports Class Booking Platform",
+        contact=openapi.Contact(email="support@example.com"),
+        license=openapi.License(name="BSD License"),
+    )
+    schema = OpenAPISchemaGenerator(info).get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+@lru_cache(maxsize=None)
+def load_schema():
+    """ The prebuilt spec from OPENAPI_SCHEMA_PATH, read once per process, and its ETag """
+    try:
+        with open(settings.OPENAPI_SCHEMA_PATH, 'rb') as spec:
+            content = spec.read()
+    except FileNotFoundError:
+        logger.warning("%s is missing, generating the OpenAPI spec in-process; "
+                       "run `manage.py build_openapi` at deploy time.", settings.OPENAPI_SCHEMA_PATH)
+        content = build_schema()
+    return content, f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+@require_GET
+def schema_json(request):
+    content, etag = load_schema()
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.OPENAPI_SCHEMA_MAX_AGE}'
+    return response
+
+
+def _docs_page(template):
+    @require_GET
+    def view(request):
+        # drf_yasg served the spec itself under ?format=openapi; keep that URL working.
+        if request.GET.get('format') == 'openapi':
+            return schema_json(request)
+        return render(request, template, {'title': TITLE, 'schema_url': reverse('schema-json')})
+    return view
+
+
+swagger_ui = _docs_page('sports_booking/swagger_ui.html')
+redoc = _docs_page('sports_booking/redoc.html')
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class SportsBookingConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'sports_booking'
+
+    def ready(self):
+        from . import checks, db  # noqa: F401
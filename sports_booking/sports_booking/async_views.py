@@ -0,0 +1,43 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+def json_renderer():
+    """ The configured DRF renderer for application/json """
+    return next(renderer for renderer in api_settings.DEFAULT_RENDERER_CLASSES if renderer.format == 'json')
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    """ Render data exactly like the DRF JSON renderer would """
+    response = HttpResponse(json_renderer()().render(data), status=status,
+                            content_type='application/json')
+    for key, value in (headers or {}).items():
+        response[key] = value
+    return response
+
+
+def async_authenticated(view):
+    """ Authenticate an async view with the JWT header, DRF style """
+    authenticator = JWTAuthentication()
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = await sync_to_async(authenticator.authenticate)(request)
+            if result is None:
+                raise NotAuthenticated()
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return json_response(
+                data, status=exc.status_code,
+                headers={'WWW-Authenticate': authenticator.authenticate_header(request)},
+            )
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+
+    return wrapper
@@ -1,25 +1,47 @@
-# from __future__ import absolute_import, unicode_literals
-# import os
-# import django
-# from celery import Celery
-# from django.conf import settings
-#
-# # Set the default Django settings module for the 'celery' program.
-# os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sports_booking.settings')
-#
-# # Ensure Django is fully set up before starting Celery
-# django.setup()
-#
-# # Initialize Celery app
-# app = Celery('sports_booking')
-#
-# # Load configuration from Django settings
-# app.config_from_object('django.conf:settings', namespace='CELERY')
-#
-# # Auto-discover tasks from all installed apps
-# app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
-#
-# # Optional: Add a test task to confirm Celery is working
-# @app.task(bind=True)
-# def debug_task(self):
-#     print(f'Request: {self.request!r}')
+import logging
+import os
+from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
+from kombu.exceptions import OperationalError
+from prometheus_client import multiprocess, start_http_server
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sports_booking.settings')
+
+app = Celery('sports_booking')
+# CELERY_* settings; without CELERY_BROKER_URL tasks run in-process (see settings).
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(task, *args):
+    """
+    Queue a task, or run it in this process if the broker can't be reached, so
+    a request never fails, or loses its emails, because the broker is down.
+    """
+    try:
+        return task.delay(*args)
+    except OperationalError:
+        logger.exception("Broker unavailable, running %s in-process", task.name)
+        return task.apply(args)
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    """
+    Serve the task metrics of the worker on CELERY_METRICS_PORT. Pool processes
+    are forked after this, so with PROMETHEUS_MULTIPROC_DIR set their samples
+    are collected from that directory by the main process.
+    """
+    port = os.getenv('CELERY_METRICS_PORT')
+    if port:
+        from .metrics import collecting_registry
+        start_http_server(int(port), registry=collecting_registry())
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    """ Drop the metric files of a pool process that exited """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
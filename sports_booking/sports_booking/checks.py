@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Timetable day versions, throttle buckets and seat feed subscriber marks
+    live in the default cache, so every worker has to see the same one. A
+    per-process cache serves stale timetables, multiplies the rate limits by
+    the number of workers and keeps the seat feed from seeing other workers'
+    changes.
+    """
+    if settings.CACHES['default']['BACKEND'] in LOCAL_CACHES:
+        return [Error(
+            'The default cache is local to each process.',
+            hint='Set REDIS_CACHE_URL so that all workers share one cache.',
+            id='sports_booking.E001',
+        )]
+    return []
@@ -0,0 +1,47 @@
+import threading
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_lock = threading.Lock()
+_connections_created = {}
+
+
+@receiver(connection_created)
+def count_connection_created(sender, connection, **kwargs):
+    """ Count new database connections opened by this process, per alias """
+    with _lock:
+        _connections_created[connection.alias] = _connections_created.get(connection.alias, 0) + 1
+
+
+def pool_stats(alias='default'):
+    """ Return connection pool statistics for the given database alias """
+    connection = connections[alias]
+    settings_dict = connection.settings_dict
+    pool = getattr(connection, 'pool', None)
+    if pool is None:
+        return {
+            'alias': alias,
+            'pooled': False,
+            'conn_max_age': settings_dict.get('CONN_MAX_AGE'),
+            'health_checks': settings_dict.get('CONN_HEALTH_CHECKS'),
+            'in_use': int(connection.connection is not None),
+            'waiting': 0,
+            'created': _connections_created.get(alias, 0),
+        }
+
+    stats = pool.get_stats()
+    return {
+        'alias': alias,
+        'pooled': True,
+        'min_size': stats.get('pool_min'),
+        'max_size': stats.get('pool_max'),
+        'size': stats.get('pool_size', 0),
+        'available': stats.get('pool_available', 0),
+        'in_use': stats.get('pool_size', 0) - stats.get('pool_available', 0),
+        'waiting': stats.get('requests_waiting', 0),
+        'created': stats.get('connections_num', 0),
+        'errors': stats.get('connections_errors', 0),
+        'timeouts': stats.get('requests_errors', 0),
+    }
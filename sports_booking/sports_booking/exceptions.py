@@ -0,0 +1,36 @@
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.views import exception_handler as drf_exception_handler
+from .hashers import PasswordHashingBusy
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins right now, please retry shortly.'
+    default_code = 'password_hashing_busy'
+
+
+RETRY_AFTER = '1'
+
+
+def exception_handler(exc, context):
+    """ DRF's handler, plus a 503 for sign-ins turned away by the password hash cap """
+    if isinstance(exc, PasswordHashingBusy):
+        response = drf_exception_handler(HashingUnavailable(), context)
+        response['Retry-After'] = RETRY_AFTER
+        return response
+    return drf_exception_handler(exc, context)
+
+
+class PasswordHashingBusyMiddleware(MiddlewareMixin):
+    """ The same 503 for sign-ins outside the API, such as the admin login """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, PasswordHashingBusy):
+            return None
+        response = HttpResponse(HashingUnavailable.default_detail, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                content_type='text/plain')
+        response['Retry-After'] = RETRY_AFTER
+        return response
@@ -0,0 +1,64 @@
+import threading
+from functools import lru_cache
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_holder = threading.local()
+
+
+class PasswordHashingBusy(Exception):
+    """ No hash slot freed up within PASSWORD_HASH_WAIT; the API answers 503 """
+
+
+@lru_cache(maxsize=None)
+def hash_slots():
+    """ Process-wide cap on concurrent hash work, sized by PASSWORD_HASH_CONCURRENCY """
+    return threading.BoundedSemaphore(settings.PASSWORD_HASH_CONCURRENCY)
+
+
+class BoundedHasherMixin:
+    """
+    Run encode/verify under hash_slots() so a burst of sign-ups or token
+    requests can only keep PASSWORD_HASH_CONCURRENCY threads busy hashing.
+    Requests that wait longer than PASSWORD_HASH_WAIT seconds for a slot raise
+    PasswordHashingBusy instead of queueing behind the burst; the API turns it
+    into a 503 through sports_booking.exceptions.
+    """
+
+    def _bounded(self, func, *args):
+        if getattr(_holder, 'slot', False):
+            # verify() calls encode(); the slot is already held by this thread.
+            return func(*args)
+        slots = hash_slots()
+        if not slots.acquire(timeout=settings.PASSWORD_HASH_WAIT):
+            raise PasswordHashingBusy()
+        _holder.slot = True
+        try:
+            return func(*args)
+        finally:
+            _holder.slot = False
+            slots.release()
+
+    def encode(self, password, salt, *args):
+        return self._bounded(super().encode, password, salt, *args)
+
+    def verify(self, password, encoded):
+        return self._bounded(super().verify, password, encoded)
+
+
+# Cost parameters are read from settings on every use, so changing them makes
+# must_update() true for older hashes and they are upgraded on the next login.
+
+class Argon2PasswordHasher(BoundedHasherMixin, hashers.Argon2PasswordHasher):
+    time_cost = property(lambda self: settings.ARGON2_TIME_COST)
+    memory_cost = property(lambda self: settings.ARGON2_MEMORY_COST)
+    parallelism = property(lambda self: settings.ARGON2_PARALLELISM)
+
+
+class ScryptPasswordHasher(BoundedHasherMixin, hashers.ScryptPasswordHasher):
+    work_factor = property(lambda self: settings.SCRYPT_WORK_FACTOR)
+
+
+class PBKDF2PasswordHasher(BoundedHasherMixin, hashers.PBKDF2PasswordHasher):
+    iterations = property(lambda self: settings.PBKDF2_ITERATIONS)
+
@@ -0,0 +1,92 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+# A request still running after this long is taken to have died with its worker.
+LOCK_TIMEOUT = 30
+MAX_KEY_LENGTH = 255
+
+
+def idempotent(handler):
+    """
+    Replay the first response of a view handler for repeated `Idempotency-Key` headers.
+
+    Responses are stored per user, path and key for IDEMPOTENCY_KEY_TTL seconds.
+    The key is claimed by a unique insert, so only one worker runs the handler.
+    A duplicate arriving while the first request is still running gets a 409,
+    and reusing a key with a different payload gets a 422.
+    """
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return handler(view, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"detail": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        lookup = {'user': request.user, 'path': request.path, 'key': key}
+        fingerprint = _fingerprint(request)
+        stored = IdempotencyKey.objects.filter(**lookup).first()
+        if stored is not None:
+            if not _expired(stored):
+                return _replay(stored, fingerprint)
+            stored.delete()
+
+        try:
+            with transaction.atomic():
+                claim = IdempotencyKey.objects.create(fingerprint=fingerprint, **lookup)
+        except IntegrityError:
+            # Another worker claimed the key between the lookup and the insert.
+            return _replay(IdempotencyKey.objects.filter(**lookup).first(), fingerprint)
+
+        kept = False
+        try:
+            try:
+                response = handler(view, request, *args, **kwargs)
+            except Exception as exc:
+                response = view.handle_exception(exc)
+            if response.status_code < 500:
+                IdempotencyKey.objects.filter(pk=claim.pk).update(status=response.status_code, data=response.data)
+                kept = True
+            return response
+        finally:
+            if not kept:
+                claim.delete()
+
+    return wrapper
+
+
+def _fingerprint(request):
+    data = dict(request.data.lists()) if hasattr(request.data, 'lists') else request.data
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _expired(stored):
+    age = timezone.now() - stored.created_at
+    if stored.status is None:
+        return age > timedelta(seconds=LOCK_TIMEOUT)
+    return age > timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def _replay(stored, fingerprint):
+    if stored is None or stored.status is None:
+        return Response({"detail": "A request with this Idempotency-Key is already in progress."},
+                        status=status.HTTP_409_CONFLICT)
+    if stored.fingerprint != fingerprint:
+        return Response({"detail": "Idempotency-Key was already used with a different payload."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    return Response(stored.data, status=stored.status, headers={'Idempotent-Replayed': 'true'})
+
+
+def purge_expired_keys():
+    """ Delete stored responses older than IDEMPOTENCY_KEY_TTL """
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    return IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()[0]
@@ -0,0 +1,46 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, get_hashers_by_algorithm
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Measure password hashes per second, overall and per core, for the configured hashers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('algorithms', nargs='*',
+                            help="Hasher algorithms to measure (default: all in PASSWORD_HASHERS)")
+        parser.add_argument('--hashes', type=int, default=50, help="Hashes per worker")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Threads hashing at once (bounded by PASSWORD_HASH_CONCURRENCY)")
+
+    def handle(self, *args, **options):
+        algorithms = options['algorithms'] or list(get_hashers_by_algorithm())
+        for algorithm in algorithms:
+            try:
+                hasher = get_hasher(algorithm)
+            except ValueError as exc:
+                raise CommandError(exc)
+            self.report(hasher, options['workers'], *self.run(hasher, options['workers'], options['hashes']))
+
+    def run(self, hasher, workers, hashes):
+        def work(_):
+            salt = hasher.salt()
+            for _ in range(hashes):
+                hasher.encode('correct horse battery staple', salt)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(work, range(workers)))
+        return time.perf_counter() - start, workers * hashes
+
+    def report(self, hasher, workers, elapsed, count):
+        cores = min(workers, os.cpu_count() or 1, settings.PASSWORD_HASH_CONCURRENCY)
+        summary = hasher.safe_summary(hasher.encode('x', hasher.salt()))
+        params = {str(key): value for key, value in summary.items() if str(key) not in ('algorithm', 'salt', 'hash')}
+        self.stdout.write(
+            f"{hasher.algorithm} {params}: {count / elapsed:.1f} hashes/s, "
+            f"{count / elapsed / cores:.1f} per core, {elapsed / count * cores * 1000:.1f} ms per hash"
+        )
@@ -0,0 +1,66 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import AccessToken
+from users.models import User
+
+SYNC_PATHS = ['/api/classes/', '/api/bookings/']
+ASYNC_PATHS = ['/api/classes/async/', '/api/bookings/async/']
+
+
+class Command(BaseCommand):
+    help = "Compare the WSGI and ASGI class/booking listing endpoints under concurrent load"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="User to authenticate the requests as")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint")
+        parser.add_argument('--workers', type=int, default=4, help="Threads emulating WSGI workers")
+        parser.add_argument('--concurrency', type=int, default=100, help="In-flight requests on the ASGI path")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist.")
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+        for sync_path, async_path in zip(SYNC_PATHS, ASYNC_PATHS):
+            self.report('WSGI', sync_path, *self.run_wsgi(sync_path, headers, options))
+            self.report('ASGI', async_path, *asyncio.run(self.run_asgi(async_path, headers, options)))
+
+    def run_wsgi(self, path, headers, options):
+        def fetch(_):
+            client = Client()
+            start = time.perf_counter()
+            client.get(path, headers=headers)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            latencies = list(executor.map(fetch, range(options['requests'])))
+        return time.perf_counter() - start, latencies
+
+    async def run_asgi(self, path, headers, options):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def fetch():
+            async with semaphore:
+                start = time.perf_counter()
+                await client.get(path, headers=headers)
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(fetch() for _ in range(options['requests'])))
+        return time.perf_counter() - start, latencies
+
+    def report(self, label, path, elapsed, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f"{label} {path}: {len(latencies) / elapsed:.1f} req/s, "
+            f"p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms"
+        )
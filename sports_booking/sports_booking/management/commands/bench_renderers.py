@@ -0,0 +1,64 @@
+import io
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from bookings.models import Booking
+from bookings.serializers import BookingSerializer
+from classes.models import Class
+from classes.serializers import ClassSerializer
+from sports_booking.renderers import MessagePackParser, MessagePackRenderer, ORJSONParser, ORJSONRenderer
+
+FORMATS = [
+    ('json', JSONRenderer, JSONParser),
+    ('orjson', ORJSONRenderer, ORJSONParser),
+    ('msgpack', MessagePackRenderer, MessagePackParser),
+]
+
+
+class Command(BaseCommand):
+    help = "Compare render/parse time and size of the API renderers on class and booking list payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="Objects per payload")
+        parser.add_argument('--iterations', type=int, default=50, help="Renders per format and payload")
+
+    def handle(self, *args, **options):
+        for name, data in self.payloads(options['rows']).items():
+            for label, renderer_class, parser_class in FORMATS:
+                self.report(name, label, renderer_class(), parser_class(), data, options['iterations'])
+
+    def payloads(self, rows):
+        """ Serialized lists built from unsaved objects, so no database rows are needed """
+        now = timezone.now()
+        classes = [
+            Class(id=i, name=f'Class {i}', description='Benchmark class', date_time=now + timedelta(hours=i),
+                  duration=60, max_participants=20, trainer_id=i % 50 + 1)
+            for i in range(1, rows + 1)
+        ]
+        bookings = [
+            Booking(id=i, user_id=i % 500 + 1, sports_class_id=i, status=Booking.STATUS_CONFIRMED,
+                    created_at=now, confirmed_at=now)
+            for i in range(1, rows + 1)
+        ]
+        return {
+            'classes': ClassSerializer(classes, many=True).data,
+            'bookings': BookingSerializer(bookings, many=True).data,
+        }
+
+    def report(self, name, label, renderer, parser, data, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            body = renderer.render(data)
+        render_ms = (time.perf_counter() - start) * 1000 / iterations
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            parser.parse(io.BytesIO(body))
+        parse_ms = (time.perf_counter() - start) * 1000 / iterations
+
+        self.stdout.write(
+            f"{name} {label}: render {render_ms:.2f} ms, parse {parse_ms:.2f} ms, {len(body) / 1024:.1f} KiB"
+        )
@@ -0,0 +1,56 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter: the work a worker does before serving its first request.
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+if {eager_docs}:
+    import drf_yasg.views, drf_yasg.generators, drf_yasg.codecs
+print(json.dumps({{
+    'seconds': time.perf_counter() - start,
+    'maxrss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+    'docs_loaded': 'drf_yasg.views' in sys.modules,
+}}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure worker cold start (Django setup plus URLconf import) in fresh interpreters"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per measurement")
+        parser.add_argument('--compare-eager-docs', action='store_true',
+                            help="Also measure with the drf_yasg modules imported up front, as before")
+
+    def handle(self, *args, **options):
+        self.report('startup', self.measure(options['runs'], eager_docs=False))
+        if options['compare_eager_docs']:
+            self.report('startup + eager docs', self.measure(options['runs'], eager_docs=True))
+
+    def measure(self, runs, eager_docs):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE',
+                                                                      'sports_booking.settings')}
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-c', PROBE.format(eager_docs=eager_docs)],
+                                    cwd=settings.BASE_DIR, env=env, check=True, capture_output=True, text=True)
+            samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+        return samples
+
+    def report(self, label, samples):
+        self.stdout.write(
+            f"{label}: median {statistics.median(s['seconds'] for s in samples) * 1000:.0f} ms, "
+            f"max RSS {max(s['maxrss_kib'] for s in samples) / 1024:.1f} MiB, "
+            f"{samples[0]['modules']} modules, docs loaded: {samples[0]['docs_loaded']}"
+        )
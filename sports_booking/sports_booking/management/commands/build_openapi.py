@@ -0,0 +1,19 @@
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sports_booking.api_docs import build_schema
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI spec once and write it to OPENAPI_SCHEMA_PATH for the docs views"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.OPENAPI_SCHEMA_PATH,
+                            help="File to write (default: OPENAPI_SCHEMA_PATH)")
+
+    def handle(self, *args, **options):
+        content = build_schema()
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_bytes(content)
+        self.stdout.write(f"Wrote {len(content) / 1024:.1f} KiB OpenAPI spec to {output}")
@@ -0,0 +1,254 @@
+import itertools
+import random
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from bookings.models import Booking
+from classes import timetable
+from classes.models import DEFAULT_VENUE_ID, Class, Venue
+from reports import triggers
+from users.models import User
+
+SPORTS = ['Yoga', 'Pilates', 'Spin', 'HIIT', 'Boxing', 'Swim', 'CrossFit', 'Barre', 'Zumba', 'Climbing']
+LEVELS = ['Intro', 'Open', 'Intermediate', 'Advanced']
+DURATIONS = ([30, 45, 60, 90, 120], [1, 2, 5, 2, 1])
+CAPACITIES = ([8, 10, 12, 15, 20, 30], [1, 2, 3, 3, 2, 1])
+# Status weights for bookings of classes that are still ahead / already over.
+UPCOMING_STATUSES = ([Booking.STATUS_CONFIRMED, Booking.STATUS_PENDING, Booking.STATUS_CANCELED], [65, 20, 15])
+PAST_STATUSES = ([Booking.STATUS_CONFIRMED, Booking.STATUS_NO_SHOW, Booking.STATUS_CANCELED], [75, 10, 15])
+# Class popularity follows a Zipf-like curve: a few hot classes fill up, most stay quiet.
+POPULARITY_SKEW = 0.8
+# Random values are drawn this many rows at a time; part of what makes a seed reproducible.
+CHUNK = 10_000
+# Random users tried for a booking before scanning for one who can still take it.
+USER_ATTEMPTS = 20
+ACTIVE_STATUSES = {Booking.STATUS_PENDING, Booking.STATUS_CONFIRMED}
+# A fixed reference day, so the same seed gives the same data whenever it runs.
+DEFAULT_START = date(2026, 1, 5)
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic dataset of users, trainers, classes and bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000, help="Regular users")
+        parser.add_argument('--trainers', type=int, default=200, help="Trainers")
+        parser.add_argument('--classes', type=int, default=20_000, help="Classes, spread across trainers")
+        parser.add_argument('--bookings', type=int, default=200_000, help="Bookings")
+        parser.add_argument('--venues', type=int, default=1,
+                            help="Venues to spread trainers over; 1 keeps everything in the default venue")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same data")
+        parser.add_argument('--start', type=lambda value: datetime.strptime(value, '%Y-%m-%d').date(),
+                            default=DEFAULT_START,
+                            help=f"Reference day YYYY-MM-DD (default {DEFAULT_START}); pass today for current data")
+        parser.add_argument('--past-days', type=int, default=30, help="Days of classes before --start")
+        parser.add_argument('--future-days', type=int, default=60, help="Days of classes after --start")
+        parser.add_argument('--batch-size', type=int, default=10_000, help="Rows per bulk_create batch")
+        parser.add_argument('--method', choices=['auto', 'copy', 'bulk'], default='auto',
+                            help="COPY (PostgreSQL) or bulk_create; auto picks COPY when available")
+        parser.add_argument('--password', default='password', help="Password of every generated user")
+
+    def handle(self, *args, **options):
+        if options['trainers'] < 1 or options['users'] < 1:
+            raise CommandError("At least one user and one trainer are needed.")
+        if options['venues'] < 1:
+            raise CommandError("At least one venue is needed.")
+        method = options['method']
+        if method == 'auto':
+            method = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+        elif method == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError("COPY is only available on PostgreSQL.")
+        self.method, self.batch_size = method, options['batch_size']
+
+        self.prefix = f"load{options['seed']}_"
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(f"Users prefixed '{self.prefix}' already exist; pick another --seed.")
+
+        rng = random.Random(options['seed'])
+        # Arithmetic in UTC, so DST changes can't make a trainer's slots overlap.
+        midnight = timezone.make_aware(datetime.combine(options['start'], datetime.min.time()))
+        self.origin = midnight.astimezone(dt_timezone.utc)
+        first = self.origin - timedelta(days=options['past_days'])
+        last = self.origin + timedelta(days=options['future_days'])
+
+        with transaction.atomic():
+            # The occupancy triggers would adjust the rollups once per COPY or batch;
+            # one rebuild of the loaded days afterwards is cheaper.
+            with connection.cursor() as cursor:
+                triggers.set_enabled(cursor, False)
+            user_ids, trainer_ids = self.load_users(rng, options)
+            venue_ids = self.load_venues(options['venues'])
+            classes = self.load_classes(rng, trainer_ids, venue_ids, first, last, options['classes'])
+            self.load_bookings(rng, user_ids, classes, options['bookings'])
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [User, Class, Booking]):
+                    cursor.execute(sql)
+                triggers.set_enabled(cursor, True)
+            call_command('rebuild_occupancy', start=timezone.localtime(first).date(),
+                         end=timezone.localtime(last).date(), stdout=self.stdout)
+
+        # Rows written this way bypass the signals that keep the timetable cache fresh.
+        days = (last - first).days + 1
+        timetable.invalidate_days([first.date() + timedelta(days=offset) for offset in range(days)])
+
+    def load_users(self, rng, options):
+        password = make_password(options['password'], salt=f"seedload{abs(options['seed'])}")
+        first_id = self.next_id(User)
+        total = options['trainers'] + options['users']
+
+        def rows():
+            for offset in range(total):
+                pk = first_id + offset
+                role = User.TRAINER if offset < options['trainers'] else User.USER
+                username = f'{self.prefix}{role}{offset}'
+                joined = self.origin - timedelta(seconds=rng.randrange(2 * 365 * 86400))
+                yield (pk, password, None, False, username, '', '', f'{username}@example.com',
+                       False, True, joined, role, None, User.DELIVERY_DIGEST)
+
+        self.write(User, ['id', 'password', 'last_login', 'is_superuser', 'username', 'first_name', 'last_name',
+                          'email', 'is_staff', 'is_active', 'date_joined', 'role', 'bio',
+                          'notification_delivery'], rows(), total)
+        trainer_ids = range(first_id, first_id + options['trainers'])
+        return range(first_id + options['trainers'], first_id + total), trainer_ids
+
+    def load_venues(self, count):
+        if count == 1:
+            return [DEFAULT_VENUE_ID]
+        # Created one by one so each gets its partition if bookings are partitioned.
+        return [Venue.objects.create(name=f'{self.prefix}venue {i}', slug=f'{self.prefix}venue-{i}').pk
+                for i in range(count)]
+
+    def load_classes(self, rng, trainer_ids, venue_ids, first, last, count):
+        """
+        Give each trainer an even share of the window, one slot per class, and
+        place each class at a random start inside its slot so no trainer has
+        overlapping classes. Trainers work at one venue each, round robin.
+        """
+        per_trainer = -(-count // len(trainer_ids))
+        # Whole minutes, so every start lands on a minute boundary inside its slot.
+        slot = timedelta(minutes=(last - first) // timedelta(minutes=1) // max(per_trainer, 1))
+        if count and slot < timedelta(minutes=max(DURATIONS[0])):
+            raise CommandError("Too many classes per trainer for the time window; "
+                               "add trainers or widen --past-days/--future-days.")
+        first_id = self.next_id(Class)
+        # (start, end, capacity, venue) per class, indexed by offset from first_id, for the bookings pass.
+        classes = []
+
+        def rows():
+            for offset in range(count):
+                trainer_id = trainer_ids[offset % len(trainer_ids)]
+                venue_id = venue_ids[offset % len(trainer_ids) % len(venue_ids)]
+                duration = rng.choices(*DURATIONS)[0]
+                capacity = rng.choices(*CAPACITIES)[0]
+                free_minutes = (slot - timedelta(minutes=duration)) // timedelta(minutes=1)
+                start = first + slot * (offset // len(trainer_ids)) + timedelta(minutes=rng.randint(0, free_minutes))
+                name = f'{rng.choice(SPORTS)} {rng.choice(LEVELS)}'
+                classes.append((start, start + timedelta(minutes=duration), capacity, venue_id))
+                yield (first_id + offset, name, f'{name} session', start, duration, capacity, trainer_id,
+                       venue_id, Class.span_for(start, duration))
+
+        self.write(Class, ['id', 'name', 'description', 'date_time', 'duration', 'max_participants',
+                           'trainer_id', 'venue_id', 'time_span'], rows(), count)
+        return first_id, classes
+
+    def load_bookings(self, rng, user_ids, classes, count):
+        """
+        Draw bookings by class popularity. A user books a class at most once
+        and never holds two pending or confirmed bookings that overlap; a draw
+        that breaks either rule goes to another user, and an active booking no
+        user can take is written as canceled.
+        """
+        first_class_id, class_rows = classes
+        if not class_rows:
+            return
+        if count > len(user_ids) * len(class_rows):
+            raise CommandError("More bookings than users times classes; every user books a class at most once.")
+        ranks = list(range(len(class_rows)))
+        rng.shuffle(ranks)
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) ** POPULARITY_SKEW for rank in ranks))
+        confirmed = [0] * len(class_rows)
+        booked = set()
+        # (start, end) of each user's pending and confirmed bookings.
+        active_spans = defaultdict(list)
+        first_id = self.next_id(Booking)
+
+        def can_book(user_id, index, active):
+            if (user_id, index) in booked:
+                return False
+            start, end = class_rows[index][:2]
+            return not active or all(end <= other_start or other_end <= start
+                                     for other_start, other_end in active_spans[user_id])
+
+        def pick_user(user_id, index, active):
+            for _ in range(USER_ATTEMPTS):
+                if can_book(user_id, index, active):
+                    return user_id
+                user_id = rng.choice(user_ids)
+            return next((other for other in user_ids if can_book(other, index, active)), None)
+
+        def rows():
+            for chunk_start in range(0, count, CHUNK):
+                size = min(CHUNK, count - chunk_start)
+                draws = zip(
+                    rng.choices(range(len(class_rows)), cum_weights=cum_weights, k=size),
+                    rng.choices(*UPCOMING_STATUSES, k=size),
+                    rng.choices(*PAST_STATUSES, k=size),
+                    rng.choices(user_ids, k=size),
+                    rng.choices(range(60, 14 * 24 * 60), k=size),
+                    rng.choices(range(30), k=size),
+                )
+                for offset, (index, upcoming, past, user_id, lead, confirm_delay) in enumerate(draws, chunk_start):
+                    status = past if class_rows[index][0] < self.origin else upcoming
+                    if status in (Booking.STATUS_CONFIRMED, Booking.STATUS_NO_SHOW) \
+                            and confirmed[index] >= class_rows[index][2]:
+                        status = Booking.STATUS_CANCELED
+                    picked = pick_user(user_id, index, status in ACTIVE_STATUSES)
+                    if picked is None and status in ACTIVE_STATUSES:
+                        status = Booking.STATUS_CANCELED
+                        picked = pick_user(user_id, index, False)
+                    while picked is None:
+                        # Every user has booked this class; move the booking to another one.
+                        index = rng.choices(range(len(class_rows)), cum_weights=cum_weights)[0]
+                        status = Booking.STATUS_CANCELED
+                        picked = pick_user(user_id, index, False)
+                    user_id = picked
+                    start, end, capacity, venue_id = class_rows[index]
+                    booked.add((user_id, index))
+                    if status in ACTIVE_STATUSES:
+                        active_spans[user_id].append((start, end))
+                    if status == Booking.STATUS_CONFIRMED:
+                        confirmed[index] += 1
+                    created_at = min(start - timedelta(minutes=lead), self.origin)
+                    confirmed_at = (created_at + timedelta(minutes=confirm_delay)
+                                    if status in (Booking.STATUS_CONFIRMED, Booking.STATUS_NO_SHOW) else None)
+                    yield (first_id + offset, user_id, first_class_id + index, venue_id, created_at, status,
+                           confirmed_at)
+
+        self.write(Booking, ['id', 'user_id', 'sports_class_id', 'venue_id', 'created_at', 'status', 'confirmed_at'],
+                   rows(), count)
+
+    def next_id(self, model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def write(self, model, attnames, rows, count):
+        started = time.perf_counter()
+        if self.method == 'copy':
+            columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in attnames)
+            with connection.cursor() as cursor:
+                with cursor.copy(f'COPY {model._meta.db_table} ({columns}) FROM STDIN') as copy:
+                    for row in rows:
+                        copy.write_row(row)
+        else:
+            while batch := list(itertools.islice(rows, self.batch_size)):
+                # bulk_create applies auto_now_add, so created_at becomes the load time here.
+                model.objects.bulk_create([model(**dict(zip(attnames, row))) for row in batch])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{model._meta.db_table}: {count} rows in {elapsed:.1f}s "
+                          f"({count / elapsed if elapsed else 0:.0f} rows/s, {self.method})")
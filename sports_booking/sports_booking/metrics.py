@@ -0,0 +1,103 @@
+import ipaddress
+import os
+import time
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+# Under gunicorn set PROMETHEUS_MULTIPROC_DIR so every worker writes its samples
+# to a shared directory that the /metrics view aggregates. Celery workers do the
+# same with their own directory and serve it on CELERY_METRICS_PORT (celery.py).
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency',
+    ['view', 'method', 'status'],
+)
+BOOKING_OUTCOMES = Counter(
+    'booking_attempts_total', 'Booking validation outcomes',
+    ['outcome'],
+)
+TASK_DURATION = Histogram(
+    'task_duration_seconds', 'Background task run time',
+    ['task'],
+)
+TASK_ROWS = Counter(
+    'task_rows_processed_total', 'Rows processed by background tasks',
+    ['task'],
+)
+EMAIL_LATENCY = Histogram(
+    'email_send_duration_seconds', 'Time spent sending email',
+    ['kind'],
+)
+
+
+def timed_task(func):
+    """ Record the run time of a background task under its function name """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with TASK_DURATION.labels(func.__name__).time():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class MetricsMiddleware:
+    """ Record request latency labelled by resolved URL name and status """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    def observe(self, request, response, start):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(time.perf_counter() - start)
+
+
+def scrape_allowed(request):
+    """ Scrapers come from METRICS_ALLOWED_NETWORKS or send METRICS_TOKEN as a bearer token """
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def collecting_registry():
+    """ The registry to expose: this process's, or every process's under PROMETHEUS_MULTIPROC_DIR """
+    if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """ Expose all metrics in the Prometheus text format """
+    if not scrape_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(collecting_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -35,16 +35,21 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'drf_yasg',
+    'sports_booking',
     'users',
     'classes',
     'bookings',
+    'reports',
     'django_filters',
 ]
 
 MIDDLEWARE = [
+    'sports_booking.metrics.MetricsMiddleware',
+    'sports_booking.slow_queries.SlowQueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'sports_booking.exceptions.PasswordHashingBusyMiddleware',
 ]
 
 ROOT_URLCONF = 'sports_booking.urls'
@@ -86,8 +92,53 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('POSTGRES_HOST'),
         'PORT': os.getenv('POSTGRES_PORT'),
+        # Persistent connections are reused across requests for CONN_MAX_AGE
+        # seconds and pinged before reuse when health checks are enabled.
+        'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': os.getenv('POSTGRES_CONN_HEALTH_CHECKS', 'True') == 'True',
+        'OPTIONS': {},
     }
 }
+
+# psycopg 3 connection pool. Pooling replaces persistent connections, so
+# CONN_MAX_AGE must be 0 while it is enabled.
+if os.getenv('POSTGRES_POOL', 'False') == 'True':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('POSTGRES_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('POSTGRES_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.getenv('POSTGRES_POOL_TIMEOUT', '30')),
+        'max_lifetime': float(os.getenv('POSTGRES_POOL_MAX_LIFETIME', '3600')),
+    }
+
+# Slow query log: statements slower than the threshold are logged as JSON, and
+# a sampled share of slow SELECTs also get EXPLAIN (ANALYZE, BUFFERS) output.
+SLOW_QUERY_LOG_ENABLED = os.getenv('SLOW_QUERY_LOG_ENABLED', 'False') == 'True'
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '200'))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', '0.01'))
+
+# /metrics answers only these networks (comma-separated CIDRs), or requests
+# carrying "Authorization: Bearer <METRICS_TOKEN>" when a token is set.
+METRICS_ALLOWED_NETWORKS = os.getenv('METRICS_ALLOWED_NETWORKS', '127.0.0.1/32,::1/128').split(',')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'sports_booking.slow_queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -109,11 +160,36 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# New passwords use PASSWORD_HASHER; the other hashers still verify older
+# hashes, which are rehashed with the preferred one on the next login.
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'argon2')
+_password_hashers = {
+    'argon2': 'sports_booking.hashers.Argon2PasswordHasher',
+    'scrypt': 'sports_booking.hashers.ScryptPasswordHasher',
+    'pbkdf2_sha256': 'sports_booking.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [_password_hashers.pop(PASSWORD_HASHER), *_password_hashers.values()]
+
+# Cost parameters; raising them upgrades stored hashes on login as well.
+# Argon2 defaults follow the OWASP minimum (19 MiB, 2 passes, 1 lane).
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', '2'))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', '19456'))
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', '1'))
+SCRYPT_WORK_FACTOR = int(os.getenv('SCRYPT_WORK_FACTOR', str(2 ** 14)))
+PBKDF2_ITERATIONS = int(os.getenv('PBKDF2_ITERATIONS', '1000000'))
+
+# Hash work allowed at once per process, and how long a request waits for a
+# slot before it gets a 503.
+PASSWORD_HASH_CONCURRENCY = int(os.getenv('PASSWORD_HASH_CONCURRENCY', str(os.cpu_count() or 1)))
+PASSWORD_HASH_WAIT = float(os.getenv('PASSWORD_HASH_WAIT', '5'))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
 LANGUAGE_CODE = 'en-us'
 
+# The occupancy rollups (reports app) group classes by local day in this zone.
+# After changing it, run `manage.py rebuild_occupancy` to recompute the days.
 TIME_ZONE = 'UTC'
 
 USE_I18N = True
@@ -136,14 +212,101 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'sports_booking.throttling.TokenBucketRateThrottle',
+    ],
+    'EXCEPTION_HANDLER': 'sports_booking.exceptions.exception_handler',
+    'DEFAULT_THROTTLE_RATES': {
+        'booking_write': os.getenv('THROTTLE_RATE_BOOKING_WRITE', '30/min'),
+        'write': os.getenv('THROTTLE_RATE_WRITE', '60/min'),
+        'auth': os.getenv('THROTTLE_RATE_AUTH', '10/min'),
+        'read': os.getenv('THROTTLE_RATE_READ', '300/min'),
+    },
 }
 
-# # Celery Configuration
-# CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://redis:6379/0')
-# CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://redis:6379/0')
-# CELERY_ACCEPT_CONTENT = ['json']
-# CELERY_TASK_SERIALIZER = 'json'
-# CELERY_RESULT_SERIALIZER = 'json'
-# CELERY_TIMEZONE = 'UTC'
+# orjson for JSON plus MessagePack for clients sending `Accept: application/msgpack`.
+if os.getenv('FAST_RENDERERS', 'False') == 'True':
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'sports_booking.renderers.ORJSONRenderer',
+        'sports_booking.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'sports_booking.renderers.ORJSONParser',
+        'sports_booking.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
+# Replayed responses for repeated Idempotency-Key headers are kept this long, in
+# the database so that every worker sees the same keys.
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', str(24 * 3600)))
+
+# Prebuilt OpenAPI spec written by `manage.py build_openapi` and served by /openapi.json.
+OPENAPI_SCHEMA_PATH = os.getenv('OPENAPI_SCHEMA_PATH', str(BASE_DIR / 'openapi.json'))
+OPENAPI_SCHEMA_MAX_AGE = int(os.getenv('OPENAPI_SCHEMA_MAX_AGE', '3600'))
+
+# Fan-out for the live seat feed. The Postgres broker carries changes made by any
+# process to the ASGI workers serving the feed; InProcessBroker only suits a
+# single process doing both.
+SEAT_FEED_BROKER = os.getenv('SEAT_FEED_BROKER', 'classes.seat_feed.PostgresBroker')
+SEAT_FEED_HEARTBEAT = int(os.getenv('SEAT_FEED_HEARTBEAT', '15'))
+
+# Booking, cancellation and reminder emails of a user are collected for this many
+# seconds and sent as one digest by the send_notification_digests task, which
+# handles this many users per transaction over one SMTP connection.
+NOTIFICATION_DIGEST_WINDOW = int(os.getenv('NOTIFICATION_DIGEST_WINDOW', '900'))
+NOTIFICATION_DIGEST_BATCH = int(os.getenv('NOTIFICATION_DIGEST_BATCH', '500'))
+
+# Forgot-password emails link here with ?uid=...&token=... for the reset form.
+PASSWORD_RESET_URL = os.getenv('PASSWORD_RESET_URL', 'http://localhost:8000/api/users/reset-password/')
+
+# Admin changelists above this many rows show the planner's row estimate
+# instead of running COUNT(*).
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv('ADMIN_EXACT_COUNT_LIMIT', '10000'))
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# Throttle buckets, timetable day versions and seat feed subscribers live in the
+# cache, so it has to be shared by all workers. The locmem fallback is for development and tests only;
+# `manage.py check --deploy` fails without REDIS_CACHE_URL.
+if os.getenv('REDIS_CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_CACHE_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Celery. Without a broker every task runs in-process as soon as it is queued,
+# so a single-container deployment (and the test suite) still sends its emails.
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', '')
+CELERY_TASK_ALWAYS_EAGER = not CELERY_BROKER_URL
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # Users on digest delivery get theirs once NOTIFICATION_DIGEST_WINDOW has passed.
+    'send-notification-digests': {
+        'task': 'bookings.tasks.send_notification_digests',
+        'schedule': 60.0,
+    },
+    # Forgot-password requests are only ever sent from here, never inside the request.
+    'send-password-resets': {
+        'task': 'users.tasks.send_password_resets',
+        'schedule': 10.0,
+    },
+    'purge-idempotency-keys': {
+        'task': 'sports_booking.tasks.purge_idempotency_keys',
+        'schedule': 3600.0,
+    },
+}
 
 
@@ -0,0 +1,90 @@
+import json
+import logging
+import random
+import time
+import traceback
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections, transaction
+
+logger = logging.getLogger('sports_booking.slow_queries')
+
+
+class SlowQueryLogger:
+    """
+    Execute wrapper that logs statements slower than SLOW_QUERY_THRESHOLD_MS as
+    JSON, and attaches `EXPLAIN (ANALYZE, BUFFERS)` output for a sampled share
+    of slow SELECTs on PostgreSQL.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+            self.log(sql, params, many, context['connection'], duration_ms)
+        return result
+
+    def log(self, sql, params, many, connection, duration_ms):
+        record = {
+            'event': 'slow_query',
+            'database': connection.alias,
+            'duration_ms': round(duration_ms, 3),
+            'sql': sql,
+            'params': None if many else params,
+            'view': self.view_name(),
+            'origin': self.origin(),
+        }
+        if (not many and connection.vendor == 'postgresql' and sql.lstrip()[:6].upper() == 'SELECT'
+                and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE):
+            record['explain'] = self.explain(sql, params, connection)
+        logger.warning(json.dumps(record, default=str))
+
+    def view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else None
+
+    def origin(self):
+        """ Return the innermost project frame that issued the query """
+        base_dir = str(settings.BASE_DIR)
+        for frame in reversed(traceback.extract_stack()):
+            if (frame.filename.startswith(base_dir) and frame.filename != __file__
+                    and 'site-packages' not in frame.filename):
+                return f'{frame.filename[len(base_dir) + 1:]}:{frame.lineno} in {frame.name}'
+        return None
+
+    def explain(self, sql, params, connection):
+        self.explaining = True
+        try:
+            # A savepoint keeps a failing EXPLAIN from breaking the caller's transaction.
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}', params)
+                return cursor.fetchone()[0]
+        except DatabaseError as exc:
+            return f'EXPLAIN failed: {exc}'
+        finally:
+            self.explaining = False
+
+
+class SlowQueryLogMiddleware:
+    """ Install SlowQueryLogger on every connection for the duration of a request """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_LOG_ENABLED:
+            # Removed from the middleware chain entirely when disabled.
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wrapper = SlowQueryLogger(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return self.get_response(request)
@@ -0,0 +1,131 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _split(value):
+    return [item for item in (value or '').replace(' ', '').split(',') if item]
+
+
+def requested_fields(request):
+    """
+    Return the `(fields, expand)` lists asked for by a read request.
+
+    Both are empty for writes, so a `?fields=` on a POST never drops writable
+    fields from validation.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return [], []
+    params = getattr(request, 'query_params', request.GET)
+    return _split(params.get('fields')), _split(params.get('expand'))
+
+
+def _expansions(expand):
+    """ Group dotted expands by their first segment: a.b,a.c,d -> {a: [b, c], d: []} """
+    grouped = {}
+    for path in expand:
+        name, _, rest = path.partition('.')
+        grouped.setdefault(name, [])
+        if rest:
+            grouped[name].append(rest)
+    return grouped
+
+
+class DynamicFieldsMixin:
+    """
+    ModelSerializer mixin for `?fields=` and `?expand=` on read requests.
+
+    `?fields=id,name` keeps only the listed fields. `?expand=trainer` swaps
+    a related primary key for the nested object, for names listed in
+    `Meta.expandable_fields` (field name -> dotted serializer path); dotted
+    expands such as `sports_class.trainer` are handed on to the nested
+    serializer. Pair it with SparseFieldsViewMixin so the queryset only
+    loads what is rendered.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if expand is None:
+            # Outermost serializer: read the request. Nested ones get theirs passed in.
+            fields, expand = requested_fields(self.context.get('request'))
+        self._expand = _expansions(expand)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name, nested_expand in self._expand.items():
+            if name in self.fields:
+                self.fields[name] = self.expanded_field(name, nested_expand)
+
+    @classmethod
+    def expandable_serializer(cls, name):
+        path = getattr(cls.Meta, 'expandable_fields', {}).get(name)
+        return import_string(path) if path else None
+
+    def expanded_field(self, name, nested_expand):
+        serializer_class = self.expandable_serializer(name)
+        if serializer_class is None:
+            return self.fields[name]
+        kwargs = {'read_only': True}
+        if self.fields[name].source != name:
+            kwargs['source'] = self.fields[name].source
+        if issubclass(serializer_class, DynamicFieldsMixin):
+            kwargs['expand'] = nested_expand
+        return serializer_class(**kwargs)
+
+    @classmethod
+    def sparse_queryset(cls, queryset, fields=(), expand=()):
+        """ Narrow a queryset to the columns and joins the given fields/expand render """
+        if not fields and not expand:
+            return queryset
+        columns, related = cls._load_plan(fields, _expansions(expand))
+        if related:
+            queryset = queryset.select_related(*related)
+        if columns is not None:
+            queryset = queryset.only(*columns)
+        return queryset
+
+    @classmethod
+    def _load_plan(cls, fields, expand):
+        """
+        Return `(columns, related)` for `.only()` and `.select_related()`.
+
+        `columns` is None when a rendered field isn't a plain model column,
+        since `.only()` would then trigger a query per row.
+        """
+        model = cls.Meta.model
+        serializer_fields = {name: field for name, field in cls().fields.items() if not field.write_only}
+        names = [name for name in fields if name in serializer_fields] if fields else list(serializer_fields)
+        columns, related = [model._meta.pk.name], []
+        for name in names:
+            source = serializer_fields[name].source
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                model_field = None
+            if model_field is None or not model_field.concrete or model_field.many_to_many:
+                columns = None
+                continue
+            if columns is not None:
+                columns.append(source)
+            nested = cls.expandable_serializer(name) if name in expand else None
+            if nested is None or not model_field.many_to_one:
+                continue
+            related.append(source)
+            nested_columns, nested_related = None, []
+            if issubclass(nested, DynamicFieldsMixin):
+                nested_columns, nested_related = nested._load_plan((), _expansions(expand[name]))
+            related += [f'{source}__{path}' for path in nested_related]
+            if columns is not None and nested_columns is not None:
+                columns += [f'{source}__{column}' for column in nested_columns]
+        return columns, related
+
+
+class SparseFieldsViewMixin:
+    """ Apply the serializer's sparse_queryset() to reads of a generic view """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, DynamicFieldsMixin):
+            queryset = serializer_class.sparse_queryset(queryset, *requested_fields(self.request))
+        return queryset
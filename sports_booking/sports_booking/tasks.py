@@ -0,0 +1,10 @@
+from celery import shared_task
+from .idempotency import purge_expired_keys
+from .metrics import timed_task
+
+
+@shared_task
+@timed_task
+def purge_idempotency_keys():
+    """ Drop stored Idempotency-Key responses once they can no longer be replayed """
+    return purge_expired_keys()
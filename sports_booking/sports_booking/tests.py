@@ -0,0 +1,511 @@
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from users.models import User
+from sports_booking.db import pool_stats
+
+
+class PoolStatsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username="admin",
+                                              email="admin@example.com",
+                                              password="password",
+                                              is_staff=True)
+        self.user = User.objects.create_user(username="testuser",
+                                             email="testuser@example.com",
+                                             password="password")
+
+    def test_pool_stats(self):
+        stats = pool_stats()
+        self.assertEqual(stats["pooled"],
+                         bool(connection.settings_dict["OPTIONS"].get("pool")))
+        self.assertGreaterEqual(stats["in_use"], 1)
+        self.assertEqual(stats["waiting"], 0)
+        self.assertGreaterEqual(stats["created"], 1)
+
+    def test_pool_stats_view_admin_only(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/db-pool/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get("/api/db-pool/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["alias"], "default")
+
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from django.core.cache import cache
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from sports_booking.throttling import TokenBucketRateThrottle
+
+
+class BurstView(APIView):
+    throttle_scope = "burst"
+    permission_classes = []
+
+    def get(self, request):
+        return Response({"ok": True})
+
+
+@patch.object(TokenBucketRateThrottle, "THROTTLE_RATES", {"burst": "2/min"})
+class TokenBucketThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.view = BurstView.as_view()
+
+    def test_bucket_allows_burst_then_throttles(self):
+        for _ in range(2):
+            response = self.view(self.factory.get("/"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.view(self.factory.get("/"))
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+        self.assertLessEqual(int(response["Retry-After"]), 30)
+
+    def test_buckets_are_per_client(self):
+        for _ in range(2):
+            self.view(self.factory.get("/", REMOTE_ADDR="10.0.0.1"))
+        response = self.view(self.factory.get("/", REMOTE_ADDR="10.0.0.2"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bucket_refills_over_time(self):
+        with patch.object(TokenBucketRateThrottle, "timer", return_value=1000.0):
+            for _ in range(2):
+                self.view(self.factory.get("/"))
+        with patch.object(TokenBucketRateThrottle, "timer", return_value=1030.0):
+            response = self.view(self.factory.get("/"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_concurrent_requests_share_the_bucket(self):
+        with ThreadPoolExecutor(8) as pool:
+            codes = list(pool.map(lambda _: self.view(self.factory.get("/")).status_code, range(16)))
+        self.assertEqual(codes.count(status.HTTP_200_OK), 2)
+
+    def test_writes_use_the_write_scope(self):
+        from classes.views import ClassListCreateView, VenueListCreateView
+        for view_class in (ClassListCreateView, VenueListCreateView):
+            for method, scope in (("get", "read"), ("post", "write")):
+                view = view_class()
+                view.request = getattr(self.factory, method)("/")
+                view.get_throttles()
+                self.assertEqual(view.throttle_scope, scope)
+
+
+from datetime import timedelta
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from django.test import override_settings
+from bookings.tasks import auto_cancel_bookings
+from bookings.models import Booking
+from classes.models import Class
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser",
+                                             email="testuser@example.com",
+                                             password="password")
+        self.client.force_authenticate(user=self.user)
+        self.sports_class = Class.objects.create(
+            name="Yoga Class",
+            description="A relaxing yoga session.",
+            date_time=timezone.now() + timedelta(hours=2),
+            duration=60,
+            max_participants=10,
+            trainer=self.user
+        )
+
+    def sample(self, name, labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_and_booking_outcome_metrics(self):
+        User.objects.filter(pk=self.user.pk).update(notification_delivery=User.DELIVERY_IMMEDIATE)
+        self.user.notification_delivery = User.DELIVERY_IMMEDIATE
+        labels = {"view": "booking-list-create", "method": "POST", "status": "201"}
+        requests_before = self.sample("http_request_duration_seconds_count", labels)
+        success_before = self.sample("booking_attempts_total", {"outcome": "success"})
+        duplicate_before = self.sample("booking_attempts_total", {"outcome": "duplicate"})
+
+        self.client.post("/api/bookings/", {"sports_class": self.sports_class.id})
+        self.client.post("/api/bookings/", {"sports_class": self.sports_class.id})
+
+        self.assertEqual(self.sample("http_request_duration_seconds_count", labels),
+                         requests_before + 1)
+        self.assertEqual(self.sample("booking_attempts_total", {"outcome": "success"}),
+                         success_before + 1)
+        self.assertEqual(self.sample("booking_attempts_total", {"outcome": "duplicate"}),
+                         duplicate_before + 1)
+        self.assertGreater(self.sample("email_send_duration_seconds_count",
+                                       {"kind": "booking_confirmation"}), 0)
+
+    def test_task_metrics(self):
+        Booking.objects.create(user=self.user, sports_class=self.sports_class)
+        runs_before = self.sample("task_duration_seconds_count",
+                                  {"task": "auto_cancel_bookings"})
+        rows_before = self.sample("task_rows_processed_total",
+                                  {"task": "auto_cancel_bookings"})
+        auto_cancel_bookings()
+        self.assertEqual(self.sample("task_duration_seconds_count",
+                                     {"task": "auto_cancel_bookings"}), runs_before + 1)
+        self.assertEqual(self.sample("task_rows_processed_total",
+                                     {"task": "auto_cancel_bookings"}), rows_before + 1)
+
+    def test_metrics_endpoint(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b"booking_attempts_total", response.content)
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_metrics_endpoint_is_restricted(self):
+        outside = {"REMOTE_ADDR": "203.0.113.7"}
+        self.assertEqual(self.client.get("/metrics", **outside).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong", **outside)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret", **outside)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+import json
+from django.test import RequestFactory, override_settings
+from django.urls import resolve
+from sports_booking.slow_queries import SlowQueryLogger
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1)
+class SlowQueryLogTest(TestCase):
+    def test_slow_query_is_logged_with_view_and_explain(self):
+        request = RequestFactory().get("/api/classes/")
+        request.resolver_match = resolve("/api/classes/")
+        with self.assertLogs("sports_booking.slow_queries", "WARNING") as logs:
+            with connection.execute_wrapper(SlowQueryLogger(request)):
+                list(User.objects.filter(username="nobody"))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["event"], "slow_query")
+        self.assertEqual(record["view"], "class-list-create")
+        self.assertIn("users_user", record["sql"])
+        self.assertTrue(record["origin"].startswith("sports_booking/tests.py"))
+        self.assertIn("Plan", record["explain"][0])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=10_000)
+    def test_fast_query_is_not_logged(self):
+        with self.assertNoLogs("sports_booking.slow_queries", "WARNING"):
+            with connection.execute_wrapper(SlowQueryLogger()):
+                list(User.objects.all())
+
+
+import msgpack
+from decimal import Decimal
+from rest_framework.renderers import JSONRenderer
+from classes.serializers import ClassSerializer
+from sports_booking.renderers import MessagePackParser, MessagePackRenderer, ORJSONParser, ORJSONRenderer
+
+# Views read the renderer/parser settings at import time, so patch the base class instead.
+fast_renderers = patch.multiple(APIView, renderer_classes=[ORJSONRenderer, MessagePackRenderer],
+                                parser_classes=[ORJSONParser, MessagePackParser])
+
+
+class RendererTest(TestCase):
+    def setUp(self):
+        self.trainer = User.objects.create_user(username="trainer", email="trainer@example.com",
+                                                password="password")
+        self.sports_class = Class.objects.create(name="Yoga", description="Class", trainer=self.trainer,
+                                                 date_time=timezone.now() + timedelta(days=1),
+                                                 duration=60, max_participants=10)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.trainer)
+
+    def test_orjson_matches_json_renderer(self):
+        data = {
+            "classes": ClassSerializer([self.sports_class], many=True).data,
+            "raw": timezone.now(),
+            "price": Decimal("9.50"),
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_msgpack_keeps_iso_datetimes(self):
+        data = ClassSerializer(self.sports_class).data
+        self.assertEqual(msgpack.unpackb(MessagePackRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+    @fast_renderers
+    def test_format_selected_by_accept_header(self):
+        response = self.client.get("/api/classes/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content)[0]["name"], "Yoga")
+
+        response = self.client.get("/api/classes/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.json()[0]["name"], "Yoga")
+
+    @fast_renderers
+    def test_msgpack_request_body(self):
+        body = msgpack.packb({"sports_class": self.sports_class.id})
+        response = self.client.post("/api/bookings/", body, content_type="application/msgpack",
+                                    HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(msgpack.unpackb(response.content)["sports_class"], self.sports_class.id)
+
+        response = self.client.post("/api/bookings/", b"\xc1", content_type="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+import threading
+from rest_framework.exceptions import APIException
+from sports_booking import hashers
+
+
+@override_settings(PBKDF2_ITERATIONS=1000)
+class PasswordHashingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        with override_settings(PASSWORD_HASHERS=["sports_booking.hashers.PBKDF2PasswordHasher"]):
+            self.user = User.objects.create_user(username="member", email="member@example.com",
+                                                 password="s3cret-pass")
+
+    def test_login_rehashes_with_preferred_hasher(self):
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        response = APIClient().post("/api/token/", {"username": "member", "password": "s3cret-pass"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("argon2$"))
+        self.assertTrue(self.user.check_password("s3cret-pass"))
+
+    @override_settings(PBKDF2_ITERATIONS=2000)
+    def test_raised_cost_is_applied_on_login(self):
+        with override_settings(PASSWORD_HASHERS=["sports_booking.hashers.PBKDF2PasswordHasher"]):
+            self.assertTrue(self.user.check_password("s3cret-pass"))
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$2000$"))
+
+    def test_single_slot_does_not_deadlock_verify(self):
+        with patch("sports_booking.hashers.hash_slots", return_value=threading.BoundedSemaphore(1)):
+            self.assertTrue(self.user.check_password("s3cret-pass"))
+
+    @override_settings(PASSWORD_HASH_WAIT=0)
+    def test_busy_hash_pool_returns_503(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with patch("sports_booking.hashers.hash_slots", return_value=slots):
+            response = APIClient().post("/api/token/", {"username": "member", "password": "s3cret-pass"})
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.data["detail"].code, "password_hashing_busy")
+        self.assertEqual(response["Retry-After"], "1")
+
+    @override_settings(PASSWORD_HASH_WAIT=0)
+    def test_busy_hash_pool_returns_503_on_admin_login(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with patch("sports_booking.hashers.hash_slots", return_value=slots):
+            response = Client().post("/admin/login/", {"username": "member", "password": "s3cret-pass"})
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+
+    @override_settings(PASSWORD_HASH_WAIT=0)
+    def test_busy_hash_pool_is_a_plain_error_outside_the_api(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with patch("sports_booking.hashers.hash_slots", return_value=slots), \
+                self.assertRaises(hashers.PasswordHashingBusy) as raised:
+            self.user.check_password("s3cret-pass")
+        self.assertNotIsInstance(raised.exception, APIException)
+
+
+from datetime import date
+from io import StringIO
+from django.core.management import call_command
+from django.db import transaction
+from django.core.management.base import CommandError
+from django.db.models import Count, Exists, F, OuterRef, Q
+from reports.models import ClassOccupancy
+
+
+class SeedLoadTest(TestCase):
+    options = {"users": 200, "trainers": 3, "classes": 40, "bookings": 400, "seed": 5,
+               "start": date(2026, 1, 5)}
+
+    def load(self, **options):
+        """ Run seed_load in a rolled back savepoint and return what it wrote """
+        with transaction.atomic():
+            call_command("seed_load", stdout=StringIO(), **{**self.options, **options})
+            snapshot = (
+                list(User.objects.filter(username__startswith="load").order_by("id")
+                     .values_list("username", "role", "date_joined")),
+                list(Class.objects.order_by("id")
+                     .values_list("name", "date_time", "duration", "max_participants", "trainer__username")),
+                list(Booking.objects.order_by("id")
+                     .values_list("user__username", "sports_class__name", "status", "confirmed_at")),
+            )
+            transaction.set_rollback(True)
+        return snapshot
+
+    def test_same_seed_same_data(self):
+        first = self.load()
+        self.assertEqual(len(first[2]), 400)
+        self.assertEqual(first, self.load())
+        self.assertNotEqual(first, self.load(seed=6))
+        self.assertEqual(first, self.load(method="bulk", batch_size=64))
+
+    def test_realistic_distributions(self):
+        with transaction.atomic():
+            call_command("seed_load", stdout=StringIO(), **self.options)
+            counts = sorted(Booking.objects.values("sports_class").annotate(n=Count("id")).values_list("n", flat=True))
+            self.assertGreater(counts[-1], 5 * counts[len(counts) // 2])
+            self.assertEqual(set(Booking.objects.values_list("status", flat=True)), {
+                Booking.STATUS_CONFIRMED, Booking.STATUS_PENDING, Booking.STATUS_CANCELED, Booking.STATUS_NO_SHOW})
+            for sports_class in Class.objects.annotate(
+                    confirmed=Count("bookings", filter=Q(bookings__status=Booking.STATUS_CONFIRMED))):
+                self.assertLessEqual(sports_class.confirmed, sports_class.max_participants)
+            self.assertFalse(Booking.objects.values("user", "sports_class").annotate(n=Count("id"))
+                             .filter(n__gt=1).exists())
+            active = [Booking.STATUS_PENDING, Booking.STATUS_CONFIRMED]
+            self.assertFalse(Booking.objects.filter(status__in=active).filter(Exists(
+                Booking.objects.filter(user=OuterRef("user"), status__in=active,
+                                       sports_class__time_span__overlap=OuterRef("sports_class__time_span"))
+                .exclude(pk=OuterRef("pk"))
+            )).exists())
+            transaction.set_rollback(True)
+
+    def test_venues(self):
+        with transaction.atomic():
+            call_command("seed_load", stdout=StringIO(), venues=3, **self.options)
+            self.assertEqual(Class.objects.values("venue").distinct().count(), 3)
+            self.assertFalse(Booking.objects.exclude(venue=F("sports_class__venue")).exists())
+            transaction.set_rollback(True)
+
+    def test_occupancy_is_rebuilt_after_the_load(self):
+        with transaction.atomic():
+            call_command("seed_load", stdout=StringIO(), **self.options)
+            expected = Class.objects.annotate(
+                confirmed=Count("bookings", filter=Q(bookings__status=Booking.STATUS_CONFIRMED)))
+            self.assertEqual(dict(ClassOccupancy.objects.values_list("sports_class_id", "confirmed")),
+                             dict(expected.values_list("id", "confirmed")))
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT tgname FROM pg_trigger WHERE tgname LIKE 'reports_%%' AND tgenabled = 'D'")
+                self.assertEqual(cursor.fetchall(), [])
+            transaction.set_rollback(True)
+
+    def test_refuses_to_load_a_seed_twice(self):
+        call_command("seed_load", stdout=StringIO(), **self.options)
+        with self.assertRaises(CommandError):
+            call_command("seed_load", stdout=StringIO(), **self.options)
+
+
+import tempfile
+from pathlib import Path
+from sports_booking import api_docs
+
+
+class ApiDocsTest(TestCase):
+    def setUp(self):
+        self.spec_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.spec_dir.cleanup)
+        self.spec_path = Path(self.spec_dir.name) / "openapi.json"
+        settings_override = override_settings(OPENAPI_SCHEMA_PATH=str(self.spec_path))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        api_docs.load_schema.cache_clear()
+        self.addCleanup(api_docs.load_schema.cache_clear)
+
+    def test_build_openapi_writes_spec(self):
+        call_command("build_openapi", stdout=StringIO())
+        spec = json.loads(self.spec_path.read_bytes())
+        self.assertEqual(spec["info"]["title"], "Sports Class Booking API")
+        self.assertIn("/bookings/check-in/", spec["paths"])
+
+    def test_prebuilt_spec_is_served_with_etag(self):
+        self.spec_path.write_bytes(b'{"swagger": "2.0"}')
+        response = self.client.get("/openapi.json")
+        self.assertEqual(response.content, b'{"swagger": "2.0"}')
+        self.assertIn("max-age=", response["Cache-Control"])
+
+        response = self.client.get("/openapi.json", headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with patch("sports_booking.api_docs.build_schema") as build_schema:
+            self.assertEqual(self.client.get("/swagger/?format=openapi").content, b'{"swagger": "2.0"}')
+        build_schema.assert_not_called()
+
+    def test_docs_pages_point_at_spec(self):
+        for url in ("/swagger/", "/redoc/"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertContains(response, "/openapi.json")
+
+    def test_missing_spec_is_generated_once(self):
+        with self.assertLogs("sports_booking.api_docs", "WARNING"):
+            self.client.get("/openapi.json")
+        with patch("sports_booking.api_docs.build_schema") as build_schema:
+            self.assertEqual(self.client.get("/openapi.json").status_code, status.HTTP_200_OK)
+        build_schema.assert_not_called()
+
+from django.test import Client
+from sports_booking.admin import EstimatedCountPaginator, estimated_count
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    def setUp(self):
+        User.objects.bulk_create([User(username=f"user{i}", email=f"user{i}@example.com") for i in range(30)])
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {User._meta.db_table}")
+
+    def test_small_tables_are_counted_exactly(self):
+        paginator = EstimatedCountPaginator(User.objects.filter(username__startswith="user1").order_by("id"), 10)
+        self.assertEqual(paginator.count, 11)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=1)
+    def test_large_tables_use_the_planner_estimate(self):
+        self.assertEqual(estimated_count(User.objects.all()), 30)
+        self.assertGreater(estimated_count(User.objects.filter(username__startswith="user1")), 0)
+        paginator = EstimatedCountPaginator(User.objects.order_by("id"), 10)
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 30)
+            self.assertEqual(paginator.num_pages, 3)
+
+    def test_trainer_autocomplete_only_offers_trainers(self):
+        User.objects.filter(username="user3").update(role=User.TRAINER)
+        admin = User.objects.create_superuser(username="admin", email="admin@example.com", password="password")
+        client = Client()
+        client.force_login(admin)
+        response = client.get("/admin/autocomplete/", {"app_label": "classes", "model_name": "class",
+                                                       "field_name": "trainer", "term": "user"})
+        self.assertEqual([result["text"] for result in response.json()["results"]], ["user3"])
+
+
+from django.test import SimpleTestCase
+from sports_booking.checks import shared_cache_check
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_local_cache_fails_the_deploy_check(self):
+        self.assertEqual([error.id for error in shared_cache_check(None)], ["sports_booking.E001"])
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+                                           "LOCATION": "redis://redis:6379/1"}})
+    def test_shared_cache_passes(self):
+        self.assertEqual(shared_cache_check(None), [])
+
+
+import os
+from sports_booking.celery import start_metrics_server
+
+
+class CeleryMetricsTest(SimpleTestCase):
+    def test_worker_serves_task_metrics(self):
+        with patch.dict(os.environ, {"CELERY_METRICS_PORT": "9100"}), \
+                patch("sports_booking.celery.start_http_server") as start_http_server:
+            start_metrics_server()
+        start_http_server.assert_called_once_with(9100, registry=REGISTRY)
+
+    def test_metrics_server_is_opt_in(self):
+        with patch.dict(os.environ), patch("sports_booking.celery.start_http_server") as start_http_server:
+            os.environ.pop("CELERY_METRICS_PORT", None)
+            start_metrics_server()
+        start_http_server.assert_not_called()
@@ -0,0 +1,106 @@
+import math
+import threading
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+# Refill and take one token in a single step, so concurrent requests of one
+# client can't both spend the same token. Returns whether the request is
+# allowed and the tokens left, the latter as a string to keep the fraction.
+TAKE_TOKEN = """
+local capacity, fill_rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * fill_rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {allowed, tostring(tokens)}
+"""
+
+
+class TokenBucketRateThrottle(SimpleRateThrottle):
+    """
+    Token bucket throttle scoped by the view's `throttle_scope`.
+
+    Each user (or client IP for anonymous requests) owns a bucket per scope
+    that holds up to the scope's request count and refills continuously over
+    its period, so short bursts are allowed while the sustained rate is capped.
+    On Redis the bucket is a hash updated by one Lua script per request. Other
+    backends keep a `(tokens, timestamp)` entry updated under a process lock,
+    which is only enough for the per-process locmem cache.
+    """
+    _parsed_rates = {}
+    _lock = threading.Lock()
+
+    def __init__(self):
+        # The scope is only known once the view is available.
+        pass
+
+    def parse_rate(self, rate):
+        if rate not in self._parsed_rates:
+            self._parsed_rates[rate] = super().parse_rate(rate)
+        return self._parsed_rates[rate]
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None)
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.num_requests is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        self.now = self.timer()
+        self.fill_rate = self.num_requests / self.duration
+        if isinstance(self.cache, RedisCache):
+            allowed, self.tokens = self.take_token_redis()
+        else:
+            allowed, self.tokens = self.take_token_local()
+        return allowed
+
+    def take_token_redis(self):
+        client = self.cache._cache.get_client(self.key, write=True)
+        allowed, tokens = client.register_script(TAKE_TOKEN)(
+            keys=[self.cache.make_and_validate_key(self.key)],
+            args=[self.num_requests, self.fill_rate, self.now, math.ceil(self.duration)],
+        )
+        return bool(allowed), float(tokens)
+
+    def take_token_local(self):
+        with self._lock:
+            tokens, updated_at = self.cache.get(self.key, (self.num_requests, self.now))
+            tokens = min(self.num_requests, tokens + max(0, self.now - updated_at) * self.fill_rate)
+            if tokens < 1:
+                return False, tokens
+            self.cache.set(self.key, (tokens - 1, self.now), self.duration)
+            return True, tokens - 1
+
+    def wait(self):
+        """ Seconds until the bucket holds a whole token again """
+        return (1 - self.tokens) / self.fill_rate
+
+
+class WriteScopeMixin:
+    """ Throttles reads under `throttle_scope` and writes under `write_throttle_scope` """
+    throttle_scope = 'read'
+    write_throttle_scope = 'write'
+
+    def get_throttles(self):
+        if self.request.method not in SAFE_METHODS:
+            self.throttle_scope = self.write_throttle_scope
+        return super().get_throttles()
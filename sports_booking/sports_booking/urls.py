@@ -1,34 +1,27 @@
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-
-# Swagger schema view
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Sports Class Booking API",
-        default_version='v1',
-        description="API documentation for the Sports Class Booking Platform",
-        contact=openapi.Contact(email="support@example.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
+from users.views import ThrottledTokenObtainPairView, ThrottledTokenRefreshView
+from .api_docs import redoc, schema_json, swagger_ui
+from .views import DatabasePoolStatsView
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('users.urls')),
     path('api/classes/', include('classes.urls')),
     path('api/bookings/', include('bookings.urls')),
+    path('api/reports/', include('reports.urls')),
+    path('api/venues/', include('classes.venue_urls')),
+    path('api/venues/<slug:venue>/bookings/', include('bookings.venue_urls')),
+    path('api/db-pool/', DatabasePoolStatsView.as_view(), name='db-pool-stats'),
+    path('metrics', metrics_view, name='metrics'),
 
     # JWT Authentication
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/', ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/refresh/', ThrottledTokenRefreshView.as_view(), name='token_refresh'),
 
-    # Swagger documentation
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # Swagger documentation, served from the spec prebuilt by `manage.py build_openapi`
+    path('openapi.json', schema_json, name='schema-json'),
+    path('swagger/', swagger_ui, name='schema-swagger-ui'),
+    path('redoc/', redoc, name='schema-redoc'),
 ]
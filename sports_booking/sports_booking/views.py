@@ -0,0 +1,13 @@
+from django.db import connections
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .db import pool_stats
+
+
+class DatabasePoolStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """ Report connection pool usage for every configured database """
+        return Response([pool_stats(alias) for alias in connections])
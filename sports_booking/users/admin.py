@@ -1,3 +1,21 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from sports_booking.admin import LargeTableAdminMixin
+from .models import User
 
-# Register your models here.
+
+@admin.register(User)
+class UserAdmin(LargeTableAdminMixin, BaseUserAdmin):
+    list_display = ('id', 'username', 'email', 'role', 'is_staff', 'is_active')
+    list_filter = ('role',)
+    # Prefix match on the unique username index; an icontains search would scan the table.
+    search_fields = ('username__startswith',)
+    ordering = ('-id',)
+    fieldsets = BaseUserAdmin.fieldsets + (("Profile", {'fields': ('role', 'bio', 'notification_delivery')}),)
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        # The trainer pickers on classes and series only offer trainers.
+        if request.GET.get('field_name') == 'trainer':
+            queryset = queryset.filter(role=User.TRAINER)
+        return queryset, may_have_duplicates
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_user_role_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='notification_delivery',
+            field=models.CharField(choices=[('digest', 'Digest'), ('immediate', 'Immediate')], default='digest', help_text='Whether booking emails are batched into digests or sent as they happen', max_length=10),
+        ),
+    ]
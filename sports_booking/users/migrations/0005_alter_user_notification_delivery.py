@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_email_lower_uniq'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='notification_delivery',
+            field=models.CharField(choices=[('digest', 'Digest'), ('immediate', 'Immediate')], default='immediate', help_text='Whether booking emails are batched into digests or sent as they happen', max_length=10),
+        ),
+        # 0003 put every existing user on digests by default; digests are opt-in now.
+        migrations.RunSQL(
+            "UPDATE users_user SET notification_delivery = 'immediate'",
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_alter_user_notification_delivery'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='notification_delivery',
+            field=models.CharField(choices=[('digest', 'Digest'), ('immediate', 'Immediate')], default='digest', help_text='Whether booking emails are batched into digests or sent as they happen', max_length=10),
+        ),
+        # Digests are sent by the Celery beat schedule now, so they are the default
+        # again; this undoes the blanket switch to immediate made by 0005.
+        migrations.RunSQL(
+            "UPDATE users_user SET notification_delivery = 'digest'",
+            migrations.RunSQL.noop,
+        ),
+    ]
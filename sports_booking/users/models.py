@@ -1,5 +1,15 @@
-from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.contrib.auth.models import AbstractUser, Group, Permission, UserManager as BaseUserManager
 from django.db import models
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+
+
+class UserManager(BaseUserManager):
+    def get_by_email(self, email):
+        """ The user with this email, ignoring case, found through the lower(email) index """
+        return self.exclude(email='').alias(email_lower=Lower('email')).filter(
+            email_lower=Lower(Value(email))
+        ).first()
 
 
 class User(AbstractUser):
@@ -10,8 +20,19 @@ class User(AbstractUser):
         (USER, 'User'),
     ]
 
+    DELIVERY_DIGEST = 'digest'
+    DELIVERY_IMMEDIATE = 'immediate'
+    DELIVERY_CHOICES = [
+        (DELIVERY_DIGEST, 'Digest'),
+        (DELIVERY_IMMEDIATE, 'Immediate'),
+    ]
+
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default=USER)
     bio = models.TextField(null=True, blank=True)
+    notification_delivery = models.CharField(
+        max_length=10, choices=DELIVERY_CHOICES, default=DELIVERY_DIGEST,
+        help_text="Whether booking emails are batched into digests or sent as they happen",
+    )
 
     groups = models.ManyToManyField(
         Group,
@@ -24,5 +45,30 @@ class User(AbstractUser):
         blank=True,
     )
 
+    objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Admin changelist and trainer autocomplete: filtered by role, newest first.
+            models.Index(fields=['role', '-id'], name='user_role_idx'),
+        ]
+        constraints = [
+            # One account per address whatever its case; also the index behind get_by_email().
+            # Accounts without an email (createsuperuser, seed data) are left out.
+            models.UniqueConstraint(
+                Lower('email'), condition=~Q(email=''), name='user_email_lower_uniq',
+                violation_error_message="A user with that email already exists.",
+            ),
+        ]
+
     def is_trainer(self):
         return self.role == self.TRAINER
+
+
+class PasswordResetRequest(models.Model):
+    """ A forgot-password address waiting for the reset task, queued whether or not an account has it """
+    email = models.EmailField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.email
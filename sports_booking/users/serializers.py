@@ -1,15 +1,36 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
+from sports_booking.sparse_fields import DynamicFieldsMixin
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+def validate_unique_email(email, instance=None):
+    """ Reject an address another account already uses in any letter case """
+    if email:
+        owner = User.objects.get_by_email(email)
+        if owner is not None and owner != instance:
+            raise serializers.ValidationError("A user with that email already exists.")
+    return email
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'role', 'bio')
 
+    def validate_email(self, value):
+        return validate_unique_email(value, self.instance)
+
+class PublicUserSerializer(UserSerializer):
+    """ A user as other users see it, e.g. an expanded class trainer """
+    class Meta(UserSerializer.Meta):
+        fields = ('id', 'username', 'role', 'bio')
+
+class NotificationPreferenceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('notification_delivery',)
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
@@ -18,17 +39,21 @@ class RegisterSerializer(serializers.ModelSerializer):
         model = User
         fields = ('username', 'email', 'password', 'password2', 'role')
 
+    def validate_email(self, value):
+        return validate_unique_email(value)
+
     def validate(self, attrs):
         if attrs['password'] != attrs['password2']:
             raise serializers.ValidationError({"password": "Password fields didn't match."})
         return attrs
 
     def create(self, validated_data):
-        user = User.objects.create(
+        user = User(
             username=validated_data['username'],
             email=validated_data['email'],
             role=validated_data['role']
         )
+        # Hash before the INSERT so sign-up is a single write.
         user.set_password(validated_data['password'])
         user.save()
         return user
@@ -37,7 +62,8 @@ class ForgotPasswordSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
 class ResetPasswordSerializer(serializers.Serializer):
-    token = serializers.CharField()
+    # Also read from the emailed link's query string.
+    token = serializers.CharField(required=False)
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
 
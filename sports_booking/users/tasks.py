@@ -0,0 +1,58 @@
+import logging
+from smtplib import SMTPException
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from sports_booking.metrics import EMAIL_LATENCY, TASK_ROWS, timed_task
+from .models import PasswordResetRequest, User
+
+FROM_EMAIL = 'noreply@example.com'
+RESET_BATCH = 100
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+@timed_task
+def send_password_resets():
+    """
+    Work through the queued forgot-password requests, RESET_BATCH at a time.
+    Each batch is taken off the queue with SKIP LOCKED before it is sent, and
+    an address whose email fails is queued again for the next run.
+    """
+    sent = 0
+    while True:
+        with transaction.atomic():
+            batch = list(PasswordResetRequest.objects.select_for_update(skip_locked=True).order_by('id')[:RESET_BATCH])
+            PasswordResetRequest.objects.filter(pk__in=[request.pk for request in batch]).delete()
+        TASK_ROWS.labels('send_password_resets').inc(len(batch))
+        for email in dict.fromkeys(request.email for request in batch):
+            try:
+                sent += send_password_reset(email)
+            except (SMTPException, OSError):
+                logger.exception("Password reset email failed, requeued")
+                PasswordResetRequest.objects.create(email=email)
+        if len(batch) < RESET_BATCH:
+            return sent
+
+
+def send_password_reset(email):
+    """ Email a reset link to the account behind a forgot-password request, if there is one """
+    user = User.objects.get_by_email(email)
+    if user is None or not user.is_active:
+        return 0
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = default_token_generator.make_token(user)
+    reset_link = f"{settings.PASSWORD_RESET_URL}?uid={uid}&token={token}"
+    with EMAIL_LATENCY.labels('password_reset').time():
+        send_mail(
+            "Password Reset Request",
+            f"Click the link to reset your password: {reset_link}",
+            FROM_EMAIL,
+            [user.email],
+        )
+    return 1
@@ -1,7 +1,7 @@
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
-from users.models import User
+from users.models import PasswordResetRequest, User
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
@@ -112,6 +112,11 @@ class UserProfileViewTest(BaseUserTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["username"], "testuser")
 
+    def test_get_user_profile_sparse_fields(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/users/profile/?fields=id,username")
+        self.assertEqual(set(response.data), {"id", "username"})
+
     def test_update_user_profile(self):
         self.client.force_authenticate(user=self.user)
         data = {"bio": "This is a test bio."}
@@ -122,12 +127,13 @@ class UserProfileViewTest(BaseUserTestCase):
 
 
 class ForgotPasswordViewTest(BaseUserTestCase):
-    @patch("users.views.send_mail")
-    def test_forgot_password_email_sent(self, mock_send_mail):
-        data = {"email": "testuser@example.com"}
-        response = self.client.post("/forgot-password/", data)
+    def test_forgot_password_email_sent(self):
+        data = {"email": "TestUser@example.com"}
+        with self.assertNumQueries(1):
+            response = self.client.post("/api/users/forgot-password/", data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertTrue(mock_send_mail.called)
+        self.assertEqual(list(PasswordResetRequest.objects.values_list("email", flat=True)),
+                         ["TestUser@example.com"])
 
     def test_forgot_password_email_invalid(self):
         data = {"email": "nonexistent@example.com"}
@@ -153,3 +159,86 @@ class ResetPasswordViewTest(BaseUserTestCase):
         response = self.client.post(f"/reset-password/?uid=invaliduid", data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data["error"], "Invalid reset link")
+
+
+from django.core import mail
+from django.db import IntegrityError, connection
+from django.db.models import Value
+from django.db.models.functions import Lower
+from users.tasks import send_password_reset
+
+
+class EmailLookupTest(BaseUserTestCase):
+    def test_get_by_email_ignores_case(self):
+        self.assertEqual(User.objects.get_by_email("TESTUSER@Example.com"), self.user)
+        self.assertIsNone(User.objects.get_by_email("nobody@example.com"))
+        User.objects.create_user(username="noemail", password="password")
+        self.assertIsNone(User.objects.get_by_email(""))
+
+    def test_lookup_uses_lower_email_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        queryset = User.objects.exclude(email="").alias(email_lower=Lower("email")).filter(
+            email_lower=Lower(Value("testuser@example.com")))
+        self.assertIn("user_email_lower_uniq", queryset.explain())
+
+    def test_email_unique_ignoring_case(self):
+        User.objects.create_user(username="blank1", password="password")
+        User.objects.create_user(username="blank2", password="password")
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user(username="copy", email="TestUser@example.com", password="password")
+
+    def test_register_rejects_email_in_other_case(self):
+        response = self.client.post("/api/users/register/", {
+            "username": "copy", "email": "TESTUSER@example.com", "password": "a-Strong-pass-42",
+            "password2": "a-Strong-pass-42", "role": User.USER,
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.data)
+
+    def test_reset_task_sends_link_only_to_existing_users(self):
+        self.assertEqual(send_password_reset("nobody@example.com"), 0)
+        self.assertEqual(send_password_reset("TestUser@Example.com"), 1)
+        self.assertEqual(mail.outbox[0].to, ["testuser@example.com"])
+        token = default_token_generator.make_token(self.user)
+        self.assertIn(f"uid={urlsafe_base64_encode(force_bytes(self.user.pk))}&token={token}", mail.outbox[0].body)
+
+
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from users.tasks import send_password_resets
+
+
+class PasswordResetPipelineTest(BaseUserTestCase):
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_request_does_the_same_work_for_unknown_addresses(self):
+        queries = []
+        for email in ("testuser@example.com", "nobody@example.com"):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post("/api/users/forgot-password/", {"email": email})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            queries.append([query["sql"].split(" VALUES ")[0] for query in context.captured_queries])
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(send_password_resets(), 1)
+        self.assertEqual(mail.outbox[0].to, ["testuser@example.com"])
+        self.assertFalse(PasswordResetRequest.objects.exists())
+
+    def test_failed_email_is_requeued(self):
+        PasswordResetRequest.objects.create(email="testuser@example.com")
+        with patch("users.tasks.send_mail", side_effect=OSError("refused")), \
+                self.assertLogs("users.tasks", "ERROR"):
+            self.assertEqual(send_password_resets(), 0)
+        self.assertEqual(list(PasswordResetRequest.objects.values_list("email", flat=True)),
+                         ["testuser@example.com"])
+
+    def test_emailed_link_resets_password(self):
+        self.client.post("/api/users/forgot-password/", {"email": "testuser@example.com"})
+        send_password_resets()
+        link = next(line for line in mail.outbox[0].body.split() if "token=" in line)
+        self.assertEqual(self.client.get(link).status_code, status.HTTP_200_OK)
+        response = self.client.post(link, {"password": "a-Strong-pass-42", "password2": "a-Strong-pass-42"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("a-Strong-pass-42"))
+        self.assertEqual(self.client.get(link).status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,16 +1,17 @@
 from django.urls import path
 from .views import (
-    RegisterView, UserProfileView, ForgotPasswordView, ResetPasswordView
+    RegisterView, UserProfileView, NotificationPreferenceView, ForgotPasswordView, ResetPasswordView,
+    ThrottledTokenObtainPairView, ThrottledTokenRefreshView
 )
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('profile/', UserProfileView.as_view(), name='profile'),
+    path('profile/notifications/', NotificationPreferenceView.as_view(), name='notification-preference'),
     path('forgot-password/', ForgotPasswordView.as_view(), name='forgot-password'),
     path('reset-password/', ResetPasswordView.as_view(), name='reset-password'),
 
     # JWT Authentication
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/', ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/refresh/', ThrottledTokenRefreshView.as_view(), name='token_refresh'),
 ]
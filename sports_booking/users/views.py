@@ -2,13 +2,16 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.contrib.auth.tokens import default_token_generator
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode
+from django.utils.encoding import force_str
 from django.contrib.auth import get_user_model
 from .serializers import (
-    RegisterSerializer, UserSerializer, ForgotPasswordSerializer, ResetPasswordSerializer
+    RegisterSerializer, UserSerializer, NotificationPreferenceSerializer, ForgotPasswordSerializer,
+    ResetPasswordSerializer
 )
+from .models import PasswordResetRequest
 from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 User = get_user_model()
 
@@ -16,6 +19,7 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [AllowAny]
     serializer_class = RegisterSerializer
+    throttle_scope = 'auth'
 
 class UserProfileView(generics.RetrieveUpdateAPIView):
     queryset = User.objects.all()
@@ -25,46 +29,60 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+class NotificationPreferenceView(generics.RetrieveUpdateAPIView):
+    serializer_class = NotificationPreferenceSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        return self.request.user
+
 class ForgotPasswordView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'auth'
 
     def post(self, request):
+        """
+        Queue every well-formed address for the reset task without looking it
+        up. The response is one insert whether or not an account exists, and
+        the lookup and email never run inside the request, not even when tasks
+        run eagerly or the broker is down.
+        """
         serializer = ForgotPasswordSerializer(data=request.data)
         if serializer.is_valid():
-            email = serializer.validated_data['email']
-            user = User.objects.filter(email=email).first()
-            if user:
-                #basic
-                return Response({"message": "If the email exists, a reset link has been sent."})
-                # token = default_token_generator.make_token(user)
-                # uid = urlsafe_base64_encode(force_bytes(user.pk))
-                # reset_link = f"http://localhost:8000/reset-password/?uid={uid}&token={token}"
-                # send_mail(
-                #     "Password Reset Request",
-                #     f"Click the link to reset your password: {reset_link}",
-                #     "noreply@example.com",
-                #     [email],
-                #     fail_silently=False,
-                # )
+            PasswordResetRequest.objects.create(email=serializer.validated_data['email'])
             return Response({"message": "If the email exists, a reset link has been sent."})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class ResetPasswordView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'auth'
+
+    def link_user(self, request, token):
+        """ The user a ?uid= reset link is for, if the token is still valid """
+        try:
+            user = User.objects.get(pk=force_str(urlsafe_base64_decode(request.GET.get('uid'))))
+        except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+            return None
+        return user if token and default_token_generator.check_token(user, token) else None
+
+    def get(self, request):
+        """ The emailed ?uid=&token= link: check it before the new password is posted to it """
+        if self.link_user(request, request.GET.get('token')):
+            return Response({"message": "Post the new password to this link."})
+        return Response({"error": "Invalid reset link"}, status=status.HTTP_400_BAD_REQUEST)
 
     def post(self, request):
         serializer = ResetPasswordSerializer(data=request.data)
         if serializer.is_valid():
-            uid = request.GET.get('uid')
-            token = request.data['token']
-            password = serializer.validated_data['password']
-            try:
-                user_id = force_str(urlsafe_base64_decode(uid))
-                user = User.objects.get(pk=user_id)
-                if default_token_generator.check_token(user, token):
-                    user.set_password(password)
-                    user.save()
-                    return Response({"message": "Password reset successful"})
-            except (TypeError, ValueError, OverflowError, User.DoesNotExist):
-                pass
+            user = self.link_user(request, serializer.validated_data.get('token') or request.GET.get('token'))
+            if user:
+                user.set_password(serializer.validated_data['password'])
+                user.save(update_fields=['password'])
+                return Response({"message": "Password reset successful"})
         return Response({"error": "Invalid reset link"}, status=status.HTTP_400_BAD_REQUEST)
+
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    throttle_scope = 'auth'
+
+class ThrottledTokenRefreshView(TokenRefreshView):
+    throttle_scope = 'auth'